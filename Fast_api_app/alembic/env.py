@@ -13,7 +13,7 @@ if project_root not in sys.path:
 # Import config settings and DB metadata
 from config import settings
 from db.base import Base
-from models import user  # ✅ Import all models so Alembic can detect them
+import models  # ✅ Import all models (models/__init__.py) so Alembic can detect them
 
 # Alembic Config object
 config = context.config
@@ -28,6 +28,15 @@ if config.config_file_name is not None:
 # Set target metadata for auto-generating migrations
 target_metadata = Base.metadata
 
+# Search index objects are created with raw DDL (models/product_search.py), not mapped
+SEARCH_OBJECTS = {"search_vector", "ix_products_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and name.startswith("products_fts"):
+        return False
+    return name not in SEARCH_OBJECTS
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
@@ -37,6 +46,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -52,7 +62,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
         with context.begin_transaction():
             context.run_migrations()
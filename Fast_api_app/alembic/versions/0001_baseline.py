@@ -0,0 +1,89 @@
+"""Baseline schema (users, products, tokens, blacklisted_tokens)
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Databases created earlier by ``Base.metadata.create_all`` already have these
+tables; they are skipped here, so ``alembic upgrade head`` works on both.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_baseline'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_table('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(), nullable=False),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('hashed_password', sa.String(), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('is_admin', sa.Boolean(), nullable=True),
+            sa.Column('is_admin_approved', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if not _has_table('products'):
+        op.create_table(
+            'products',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('description', sa.String(), nullable=True),
+            sa.Column('price', sa.Integer(), nullable=False),
+            sa.Column('owner_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('deleted_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_by', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('deleted_by', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        )
+        op.create_index('ix_products_id', 'products', ['id'])
+
+    if not _has_table('tokens'):
+        op.create_table(
+            'tokens',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('access_token', sa.String(), nullable=False, unique=True),
+            sa.Column('refresh_token', sa.String(), nullable=False, unique=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_tokens_id', 'tokens', ['id'])
+
+    if not _has_table('blacklisted_tokens'):
+        op.create_table(
+            'blacklisted_tokens',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('token', sa.String(), nullable=False, unique=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_blacklisted_tokens_id', 'blacklisted_tokens', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('blacklisted_tokens')
+    op.drop_table('tokens')
+    op.drop_table('products')
+    op.drop_table('users')
@@ -0,0 +1,79 @@
+"""Composite / partial indexes matching the router query shapes
+
+Revision ID: 0002_query_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18 00:00:01
+
+- products: unique (name) WHERE deleted_at IS NULL replaces the
+  SELECT-then-INSERT name check in add_product, plus (owner_id, created_at, id)
+  and (created_at, id) for the owner/admin listings and keyset pages.
+- users: (is_admin_approved, created_at) and (created_at, id) for the admin
+  listings, (is_active) for get_all_active_users.
+- tokens: (user_id) for logout, (created_at) for expiry purges. The
+  access_token OR refresh_token lookup is served by the two unique indexes.
+- blacklisted_tokens: jti / expires_at columns used by stateless auth.
+
+The unique name index fails if live products already share a name;
+rename or soft-delete the duplicates first.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_query_indexes'
+down_revision: Union[str, Sequence[str], None] = '0001_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE = sa.text('deleted_at IS NULL')
+
+# name, table, columns, unique, partial (live rows only)
+INDEXES = [
+    ('uq_products_name_live', 'products', ['name'], True, True),
+    ('ix_products_owner_created_live', 'products', ['owner_id', 'created_at', 'id'], False, True),
+    ('ix_products_created_live', 'products', ['created_at', 'id'], False, True),
+    ('ix_users_approved_created_live', 'users', ['is_admin_approved', 'created_at'], False, True),
+    ('ix_users_created_live', 'users', ['created_at', 'id'], False, True),
+    ('ix_users_is_active', 'users', ['is_active'], False, False),
+    ('ix_tokens_user_id', 'tokens', ['user_id'], False, False),
+    ('ix_tokens_created_at', 'tokens', ['created_at'], False, False),
+    ('ix_blacklisted_tokens_jti', 'blacklisted_tokens', ['jti'], True, False),
+    ('ix_blacklisted_tokens_expires_at', 'blacklisted_tokens', ['expires_at'], False, False),
+]
+
+
+# create_all() at startup may already have made some of these
+def _columns(table: str) -> set:
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table: str) -> set:
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    blacklist_columns = _columns('blacklisted_tokens')
+    with op.batch_alter_table('blacklisted_tokens') as batch_op:
+        if 'jti' not in blacklist_columns:
+            batch_op.add_column(sa.Column('jti', sa.String(), nullable=True))
+        if 'expires_at' not in blacklist_columns:
+            batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    for name, table, columns, unique, partial in INDEXES:
+        if name in _indexes(table):
+            continue
+        where = {'postgresql_where': LIVE, 'sqlite_where': LIVE} if partial else {}
+        op.create_index(name, table, columns, unique=unique, **where)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    with op.batch_alter_table('blacklisted_tokens') as batch_op:
+        batch_op.drop_column('expires_at')
+        batch_op.drop_column('jti')
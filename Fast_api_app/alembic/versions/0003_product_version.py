@@ -0,0 +1,33 @@
+"""products.version for optimistic concurrency in update_product
+
+Revision ID: 0003_product_version
+Revises: 0002_query_indexes
+Create Date: 2026-10-18 00:00:02
+
+Existing rows start at version 1.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_product_version'
+down_revision: Union[str, Sequence[str], None] = '0002_query_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('products')}
+    if 'version' not in columns:
+        with op.batch_alter_table('products') as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default=sa.text('1')))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('version')
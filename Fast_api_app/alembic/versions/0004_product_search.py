@@ -0,0 +1,88 @@
+"""Full-text search index for products (name, description)
+
+Revision ID: 0004_product_search
+Revises: 0003_product_version
+Create Date: 2026-10-18 00:00:03
+
+- SQLite: FTS5 external content table products_fts, filled with the live
+  products and kept in sync by insert / update / delete triggers.
+- PostgreSQL: generated tsvector column search_vector (name weighted over
+  description) and a partial GIN index on live rows. Adding the stored
+  column rewrites the products table.
+
+Other backends use the in-process index of services/search_service.py.
+Same statements as models/product_search.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_product_search'
+down_revision: Union[str, Sequence[str], None] = '0003_product_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, description, content='products', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products WHEN new.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products WHEN old.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description, deleted_at ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "SELECT 'delete', old.id, old.name, old.description WHERE old.deleted_at IS NULL; "
+    "INSERT INTO products_fts(rowid, name, description) "
+    "SELECT new.id, new.name, new.description WHERE new.deleted_at IS NULL; END",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS products_fts_update",
+    "DROP TRIGGER IF EXISTS products_fts_delete",
+    "DROP TRIGGER IF EXISTS products_fts_insert",
+    "DROP TABLE IF EXISTS products_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector) "
+    "WHERE deleted_at IS NULL",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_products_search_vector",
+    "ALTER TABLE products DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        fresh = not sa.inspect(op.get_bind()).has_table('products_fts')
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+        if fresh:
+            op.execute(
+                "INSERT INTO products_fts(rowid, name, description) "
+                "SELECT id, name, description FROM products WHERE deleted_at IS NULL"
+            )
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_DOWNGRADE:
+            op.execute(statement)
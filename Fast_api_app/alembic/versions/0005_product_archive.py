@@ -0,0 +1,56 @@
+"""products_archive for long soft-deleted products, index on products.deleted_at
+
+Revision ID: 0005_product_archive
+Revises: 0004_product_search
+Create Date: 2026-10-18 00:00:04
+
+Filled by services/maintenance_service.py (ARCHIVE_DELETED_PRODUCTS_DAYS).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_product_archive'
+down_revision: Union[str, Sequence[str], None] = '0004_product_search'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DELETED = sa.text('deleted_at IS NOT NULL')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    # create_all() at startup may already have made both
+    if not inspector.has_table('products_archive'):
+        op.create_table(
+            'products_archive',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('description', sa.String(), nullable=True),
+            sa.Column('price', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('owner_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('deleted_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_by', sa.Integer(), nullable=True),
+            sa.Column('deleted_by', sa.Integer(), nullable=True),
+            sa.Column('archived_at', sa.DateTime(), nullable=False),
+        )
+        op.create_index('ix_products_archive_owner_id', 'products_archive', ['owner_id'])
+    if 'ix_products_deleted_at' not in {index['name'] for index in inspector.get_indexes('products')}:
+        op.create_index(
+            'ix_products_deleted_at', 'products', ['deleted_at'],
+            postgresql_where=DELETED, sqlite_where=DELETED,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_deleted_at', table_name='products')
+    op.drop_index('ix_products_archive_owner_id', table_name='products_archive')
+    op.drop_table('products_archive')
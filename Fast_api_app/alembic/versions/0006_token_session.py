@@ -0,0 +1,36 @@
+"""tokens.session_id, shared by the token pairs of one login and its refreshes
+
+Revision ID: 0006_token_session
+Revises: 0005_product_archive
+Create Date: 2026-10-18 00:00:05
+
+Rows from before stay NULL; reuse of such a refresh token revokes all of the user's sessions.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_token_session'
+down_revision: Union[str, Sequence[str], None] = '0005_product_archive'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'session_id' not in {column['name'] for column in inspector.get_columns('tokens')}:
+        with op.batch_alter_table('tokens') as batch_op:
+            batch_op.add_column(sa.Column('session_id', sa.String(), nullable=True))
+    if 'ix_tokens_session_id' not in {index['name'] for index in inspector.get_indexes('tokens')}:
+        op.create_index('ix_tokens_session_id', 'tokens', ['session_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tokens_session_id', table_name='tokens')
+    with op.batch_alter_table('tokens') as batch_op:
+        batch_op.drop_column('session_id')
@@ -0,0 +1,43 @@
+"""(updated_at, id) indexes for the /products/changes feed
+
+Revision ID: 0007_product_changes
+Revises: 0006_token_session
+Create Date: 2026-10-18 00:00:06
+
+Rows without updated_at (never updated through the app) get their created_at, or
+the migration time, so the feed sees them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_product_changes'
+down_revision: Union[str, Sequence[str], None] = '0006_token_session'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table
+INDEXES = [
+    ('ix_products_updated', 'products'),
+    ('ix_products_archive_updated', 'products_archive'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "UPDATE products SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL"
+    )
+    inspector = sa.inspect(op.get_bind())
+    for name, table in INDEXES:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, ['updated_at', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table in INDEXES:
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,40 @@
+"""(owner_id, updated_at, id) indexes for the per-owner /products/changes feed
+
+Revision ID: 0008_owner_changes_indexes
+Revises: 0007_product_changes
+Create Date: 2026-10-18 00:00:07
+
+Non-admin feeds filter on owner_id and order by (updated_at, id); with only the
+(updated_at, id) indexes they walked every changed row of every owner.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008_owner_changes_indexes'
+down_revision: Union[str, Sequence[str], None] = '0007_product_changes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table
+INDEXES = [
+    ('ix_products_owner_updated', 'products'),
+    ('ix_products_archive_owner_updated', 'products_archive'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for name, table in INDEXES:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, ['owner_id', 'updated_at', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table in INDEXES:
+        op.drop_index(name, table_name=table)
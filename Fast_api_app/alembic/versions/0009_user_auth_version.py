@@ -0,0 +1,33 @@
+"""users.auth_version, invalidates cached authentications on every worker
+
+Revision ID: 0009_user_auth_version
+Revises: 0008_owner_changes_indexes
+Create Date: 2026-10-18 00:00:08
+
+Existing rows start at version 0.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009_user_auth_version'
+down_revision: Union[str, Sequence[str], None] = '0008_owner_changes_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'auth_version' not in columns:
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.add_column(sa.Column('auth_version', sa.Integer(), nullable=False, server_default=sa.text('0')))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('auth_version')
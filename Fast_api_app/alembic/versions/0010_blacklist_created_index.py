@@ -0,0 +1,32 @@
+"""blacklisted_tokens.created_at index for the revocation filter sync
+
+Revision ID: 0010_blacklist_created_index
+Revises: 0009_user_auth_version
+Create Date: 2026-10-18 00:00:09
+
+Every worker re-reads the rows created in the last REVOCATION_SYNC_OVERLAP_SECONDS each
+REVOCATION_SYNC_SECONDS, by created_at instead of id.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010_blacklist_created_index'
+down_revision: Union[str, Sequence[str], None] = '0009_user_auth_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('blacklisted_tokens')}
+    if 'ix_blacklisted_tokens_created_at' not in indexes:
+        op.create_index('ix_blacklisted_tokens_created_at', 'blacklisted_tokens', ['created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_blacklisted_tokens_created_at', table_name='blacklisted_tokens')
@@ -0,0 +1,65 @@
+"""products.created_at and users.created_at NOT NULL
+
+Revision ID: 0011_created_at_not_null
+Revises: 0010_blacklist_created_index
+Create Date: 2026-10-18 00:00:10
+
+Keyset pages are ordered by (created_at, id) and their cursors are built from those
+columns: rows inserted without created_at get their updated_at, or the migration time.
+On SQLite the tables are recreated, which drops the products_fts triggers of 0004, so
+they are created again (same statements as models/product_search.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011_created_at_not_null'
+down_revision: Union[str, Sequence[str], None] = '0010_blacklist_created_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['products', 'users']
+
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products WHEN new.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products WHEN old.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description, deleted_at ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "SELECT 'delete', old.id, old.name, old.description WHERE old.deleted_at IS NULL; "
+    "INSERT INTO products_fts(rowid, name, description) "
+    "SELECT new.id, new.name, new.description WHERE new.deleted_at IS NULL; END",
+]
+
+
+def restore_search_triggers() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite' and sa.inspect(bind).has_table('products_fts'):
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            op.execute(statement)
+
+
+def set_created_at_nullable(nullable: bool) -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        column = next(column for column in inspector.get_columns(table) if column['name'] == 'created_at')
+        if column['nullable'] != nullable:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=nullable)
+    restore_search_triggers()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.execute(f"UPDATE {table} SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL")
+    set_created_at_nullable(False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    set_created_at_nullable(True)
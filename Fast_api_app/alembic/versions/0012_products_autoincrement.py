@@ -0,0 +1,69 @@
+"""SQLite: products ids are never reused (AUTOINCREMENT)
+
+Revision ID: 0012_products_autoincrement
+Revises: 0011_created_at_not_null
+Create Date: 2026-10-18 00:00:11
+
+Without AUTOINCREMENT SQLite gives a new row the highest id + 1, so after the maintenance
+job archived the newest products their ids came back, and archiving those again hit the
+products_archive primary key. The table is recreated with AUTOINCREMENT and its sequence
+starts above every id in products and products_archive. The recreate drops the
+products_fts triggers of 0004, they are created again (same statements as
+models/product_search.py). PostgreSQL sequences never go back, nothing to do there.
+Later batch recreates of products on SQLite need table_kwargs={'sqlite_autoincrement': True}.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012_products_autoincrement'
+down_revision: Union[str, Sequence[str], None] = '0011_created_at_not_null'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products WHEN new.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products WHEN old.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description, deleted_at ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "SELECT 'delete', old.id, old.name, old.description WHERE old.deleted_at IS NULL; "
+    "INSERT INTO products_fts(rowid, name, description) "
+    "SELECT new.id, new.name, new.description WHERE new.deleted_at IS NULL; END",
+]
+
+
+def has_autoincrement() -> bool:
+    sql = op.get_bind().execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'products'")).scalar()
+    return 'AUTOINCREMENT' in sql.upper()
+
+
+def recreate_products(autoincrement: bool) -> None:
+    with op.batch_alter_table('products', recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    if sa.inspect(op.get_bind()).has_table('products_fts'):
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    if not has_autoincrement():
+        recreate_products(True)
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'products'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'products', MAX("
+        "COALESCE((SELECT MAX(id) FROM products), 0), COALESCE((SELECT MAX(id) FROM products_archive), 0))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite' and has_autoincrement():
+        recreate_products(False)
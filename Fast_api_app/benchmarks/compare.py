@@ -0,0 +1,61 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Exits with status 1 when a scenario's p95/p99 latency grew, or its throughput
+dropped, by more than the threshold (a fraction, 0.10 = 10%).
+"""
+import sys
+import json
+import argparse
+
+# metric -> True when bigger is better
+METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+GATED = ("rps", "p95_ms", "p99_ms")
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> tuple[list[str], list[str]]:
+    lines, regressions = [], []
+    lines.append(f"{'scenario':16} {'metric':8} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for name, before in baseline["scenarios"].items():
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if metric in GATED and worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+            lines.append(f"{name:16} {metric:8} {old:>12} {new:>12} {change:>+8.1%}{flag}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name} errors: {before['errors']} -> {after['errors']}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    lines, regressions = compare(load(args.baseline), load(args.candidate), args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:")
+        print("\n".join(f"  {regression}" for regression in regressions))
+        return 1
+    print("\nNo regressions above threshold.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
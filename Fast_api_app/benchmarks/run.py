@@ -0,0 +1,191 @@
+"""Load test the real app in-process against a freshly seeded database.
+
+    python -m benchmarks.run --users 200 --products 20000 --tokens 500 \
+        --concurrency 16 --requests 500 --out bench.json
+
+The database at --database-url is dropped and recreated, never point it at real data.
+Compare two result files with ``python -m benchmarks.compare``.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+SCENARIOS = ["register", "login", "list_products", "get_product", "update_product", "delete_product"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], errors: int, wall: float) -> dict:
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+async def drive(client, make_request, total: int, concurrency: int) -> dict:
+    # fixed concurrency: `concurrency` workers pull request numbers until `total` is reached
+    latencies, errors, counter = [], 0, iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = make_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def build_scenarios(data: dict, rng: random.Random) -> dict:
+    from benchmarks.seed import BENCH_PASSWORD
+
+    # regular users with at least one product, admin (user id 1) is skipped
+    owners = [(user_id, token) for user_id, token in data["tokens"] if data["owned_products"].get(user_id) and user_id != 1]
+    usernames = data["usernames"][1:]
+    run_id = rng.randrange(10 ** 9)
+    deletable = [(user_id, token, product_id) for user_id, token in owners for product_id in data["owned_products"][user_id]]
+    rng.shuffle(deletable)
+
+    def auth(token):
+        return {"Authorization": f"Bearer {token}"}
+
+    def pick_owned():
+        user_id, token = rng.choice(owners)
+        return token, rng.choice(data["owned_products"][user_id])
+
+    def register(i):
+        return "POST", "/users/register", {"json": {
+            "username": f"bench{run_id}-{i}", "email": f"bench{run_id}-{i}@example.com", "password": BENCH_PASSWORD,
+        }}
+
+    def login(i):
+        return "POST", "/users/login", {"json": {"username": rng.choice(usernames), "password": BENCH_PASSWORD}}
+
+    def list_products(i):
+        _, token = rng.choice(owners)
+        return "GET", "/products/all_products", {"headers": auth(token)}
+
+    def get_product(i):
+        token, product_id = pick_owned()
+        return "GET", f"/products/get_product/{product_id}", {"headers": auth(token)}
+
+    def update_product(i):
+        token, product_id = pick_owned()
+        return "PUT", f"/products/update_product/{product_id}", {
+            "headers": auth(token), "json": {"name": f"renamed-{run_id}-{i}", "price": rng.randint(1, 10000)},
+        }
+
+    def delete_product(i):
+        # every request deletes a different product
+        _, token, product_id = deletable[i % len(deletable)]
+        return "DELETE", f"/products/delete_product/{product_id}", {"headers": auth(token)}
+
+    return {
+        "register": register,
+        "login": login,
+        "list_products": list_products,
+        "get_product": get_product,
+        "update_product": update_product,
+        "delete_product": delete_product,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> dict:
+    import httpx
+    from main import app
+    from db.session import engine
+    from benchmarks.seed import seed_database
+
+    rng = random.Random(args.seed)
+    data = seed_database(engine, args.users, args.products, args.tokens, seed=args.seed)
+    scenarios = build_scenarios(data, rng)
+
+    results = {}
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name in args.scenarios:
+                requests = min(args.requests, args.logins) if name in ("register", "login") else args.requests
+                results[name] = await drive(client, scenarios[name], requests, args.concurrency)
+                print(f"{name:16} {json.dumps(results[name])}")
+    finally:
+        await app.router.shutdown()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "database": args.database_url.split("://")[0],
+            "users": args.users,
+            "products": args.products,
+            "tokens": args.tokens,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--logins", type=int, default=100, help="cap for the bcrypt bound register/login scenarios")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    # the app reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("PROFILE_SAMPLE_RATE", "0")
+    # every request comes from one address, the per client rate limits would cap the run
+    os.environ.setdefault("ADMISSION_CONTROL", "false")
+    result = asyncio.run(run(args))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
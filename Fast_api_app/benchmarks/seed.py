@@ -0,0 +1,78 @@
+# Seed a benchmark database: N users, M products, K tokens
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from db.base import Base
+from models.user import User
+from models.products import Product
+from models.token import Token
+from services.password_service import hash_password
+from services.token_services import create_access_token, create_refresh_token
+
+BENCH_PASSWORD = "benchpass123"
+BATCH_SIZE = 5000
+
+
+def _batches(rows: list, size: int = BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed_database(engine, users: int, products: int, tokens: int, seed: int = 42) -> dict:
+    """Recreate every table and fill it. Returns what the scenarios need to know."""
+    rng = random.Random(seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    # bcrypt is slow on purpose, every seeded user shares one hash
+    hashed_password = hash_password(BENCH_PASSWORD)
+    started = datetime.utcnow() - timedelta(days=30)
+
+    with engine.begin() as conn:
+        user_rows = [{
+            "username": "admin" if i == 0 else f"user{i}",
+            "email": f"user{i}@example.com",
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "is_admin": i == 0,
+            "is_admin_approved": True,
+            "created_at": started + timedelta(seconds=i),
+            "updated_at": started + timedelta(seconds=i),
+        } for i in range(users)]
+        for batch in _batches(user_rows):
+            conn.execute(insert(User), batch)
+        user_ids = list(conn.scalars(select(User.id).order_by(User.id)))
+
+        product_rows = [{
+            "name": f"product-{i}",
+            "description": f"Benchmark product {i}",
+            "price": rng.randint(1, 10000),
+            "owner_id": user_ids[i % len(user_ids)],
+            "created_at": started + timedelta(seconds=i),
+            "updated_at": started + timedelta(seconds=i),
+        } for i in range(products)]
+        for batch in _batches(product_rows):
+            conn.execute(insert(Product), batch)
+
+        token_rows = []
+        for i in range(tokens):
+            user_id = user_ids[i % len(user_ids)]
+            claims = {"sub": user_rows[i % len(user_ids)]["username"], "user_id": user_id}
+            token_rows.append({
+                "user_id": user_id,
+                "access_token": create_access_token(dict(claims)),
+                "refresh_token": create_refresh_token(dict(claims)),
+                "created_at": datetime.utcnow(),
+            })
+        for batch in _batches(token_rows):
+            conn.execute(insert(Token), batch)
+
+        owned = {}
+        for product_id, owner_id in conn.execute(select(Product.id, Product.owner_id).order_by(Product.id)):
+            owned.setdefault(owner_id, []).append(product_id)
+
+    return {
+        "usernames": [row["username"] for row in user_rows],
+        "tokens": [(row["user_id"], row["access_token"]) for row in token_rows],
+        "owned_products": owned,
+    }
@@ -0,0 +1,145 @@
+"""Per-row cost of turning a page of result rows into a JSON body.
+
+    python -m benchmarks.serialization --rows 50 500 --repeat 200 --out serialization.json
+
+default: build_page + FastAPI's response_model path (validate the dict against ProductPage /
+UserPage, dump it back out, json.dumps in JSONResponse); this is what /all_products and
+/users/all do without FAST_JSON.
+fast:    build_page + FastJSONResponse (orjson) as with FAST_JSON=true, no model involved.
+
+Rows come from an in-memory SQLite database, so only serialization is measured.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine, insert
+
+PAGES = ["products", "users"]
+
+
+def seed(connection, count: int):
+    from models import Product, User
+
+    started = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    connection.execute(insert(User), [
+        {
+            "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x",
+            "is_active": True, "is_admin": False, "is_admin_approved": True,
+            "created_at": started + timedelta(seconds=i), "updated_at": started + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ])
+    connection.execute(insert(Product), [
+        {
+            "name": f"product {i}", "description": f"description of product {i} " * 4, "price": i * 7 % 1000,
+            "owner_id": i % count + 1, "created_at": started + timedelta(seconds=i), "updated_at": started + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ])
+
+
+def fetch_rows(connection, page: str, limit: int):
+    from models import Product, User
+    from crud.product_crud import PRODUCT_FIELDS
+    from crud.user_crud import USER_FIELDS
+    from utils.pagination import build_page_query
+
+    model, fields = (Product, PRODUCT_FIELDS) if page == "products" else (User, USER_FIELDS)
+    return connection.execute(build_page_query(model, fields, [], None, limit)).all(), fields
+
+
+def timed(function, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def measure(connection, page: str, limit: int, repeat: int) -> dict:
+    from schemas.product import ProductPage
+    from schemas.user import UserPage
+    from utils.pagination import build_page
+    from utils.serialization import FastJSONResponse
+
+    rows, fields = fetch_rows(connection, page, limit)
+    field = create_response_field(name=f"Response_{page}", type_=ProductPage if page == "products" else UserPage)
+    loop = asyncio.new_event_loop()
+
+    def default():
+        content = loop.run_until_complete(
+            serialize_response(field=field, response_content=build_page(rows, fields, limit), exclude_unset=True)
+        )
+        return JSONResponse(content).body
+
+    def fast():
+        return FastJSONResponse(build_page(rows, fields, limit)).body
+
+    try:
+        if json.loads(default()) != json.loads(fast()):
+            raise SystemExit(f"{page}: the two paths produce different bodies")
+        results = {}
+        for name, function in (("default", default), ("fast", fast)):
+            timed(function, max(repeat // 10, 1))  # warm up
+            per_row = [timing / len(rows) * 1e6 for timing in timed(function, repeat)]
+            results[name] = {
+                "us_per_row": round(statistics.median(per_row), 3),
+                "us_per_page": round(statistics.median(per_row) * len(rows), 1),
+            }
+    finally:
+        loop.close()
+    results["speedup"] = round(results["default"]["us_per_row"] / results["fast"]["us_per_row"], 2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 500], help="page sizes")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    # config.Settings requires DATABASE_URL, nothing here connects to it
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from db.base import Base
+    import models  # noqa: F401, registers the tables
+    from utils.serialization import orjson
+
+    if orjson is None:
+        raise SystemExit("orjson is not installed")
+
+    engine = create_engine("sqlite://")
+    results = {}
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        seed(connection, max(args.rows))
+        print(f"{'page':10} {'rows':>6} {'default us/row':>15} {'fast us/row':>12} {'speedup':>8}")
+        for page in args.pages:
+            for limit in args.rows:
+                result = measure(connection, page, limit, args.repeat)
+                results[f"{page}_{limit}"] = result
+                print(f"{page:10} {limit:>6} {result['default']['us_per_row']:>15} {result['fast']['us_per_row']:>12} {result['speedup']:>7}x")
+    engine.dispose()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "orjson": orjson.__version__, "repeat": args.repeat},
+                "pages": results,
+            }, f, indent=2)
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
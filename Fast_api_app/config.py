@@ -1,14 +1,29 @@
 # config.py
-from pydantic import BaseSettings
+from pydantic_settings import BaseSettings  # BaseSettings moved out of pydantic in v2
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 class Settings(BaseSettings):
-    DATABASE_URL = os.getenv("DATABASE_URL")
+    DATABASE_URL: str = os.getenv("DATABASE_URL")
+
+    # Connection pool, per engine and per worker process:
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below the server's max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30     # seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800     # seconds, reconnect before the server/proxy drops idle connections (-1 never)
+    DB_POOL_PRE_PING: bool = True   # test connections on checkout, drops ones killed by a failover
+
+    # Read replicas, comma separated; GET requests read from them (see db/routing.py)
+    REPLICA_DATABASE_URLS: str = ""
+    READ_YOUR_WRITES_SECONDS: float = 5   # a user's reads stay on the primary this long after their last write
+    REPLICA_MAX_LAG_SECONDS: float = 10   # replicas further behind are skipped until they catch up
+    REPLICA_HEALTH_INTERVAL: float = 5    # seconds between replica health / lag checks
 
     class Config:
         env_file = ".env"  # Optional: load from .env file
+        extra = "ignore"   # .env also holds settings read elsewhere (SECRET_KEY, ...)
 
 settings = Settings()
@@ -1,6 +1,19 @@
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterator, Optional
+from sqlalchemy import func, select, insert, update, tuple_, union_all
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.products import Product
-from schemas.product import ProductCreate
+from models.product_archive import ProductArchive
+from schemas.product import ProductCreate, ProductOut
+from db.session import SessionLocal, AsyncSessionLocal
+from utils.pagination import parse_fields, build_page_query, build_page, encode_cursor, decode_cursor
+
+PRODUCT_FIELDS = list(ProductOut.model_fields)
+EXPORT_BATCH_SIZE = 1000
 
 
 def create_product(db: Session, product: ProductCreate, owner_id: int) -> Product:
@@ -13,4 +26,231 @@ def create_product(db: Session, product: ProductCreate, owner_id: int) -> Produc
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
-    return db_product
\ No newline at end of file
+    return db_product
+
+async def create_product_async(db: AsyncSession, product: ProductCreate, owner_id: int) -> Product:
+    db_product = Product(
+        name=product.name,
+        description=product.description,
+        price=product.price,
+        owner_id=owner_id
+    )
+    db.add(db_product)
+    await db.commit()
+    await db.refresh(db_product)
+    return db_product
+
+
+# One keyset page of live products, owner_id=None lists every owner (admin)
+def get_products_page(db: Session, owner_id: Optional[int], limit: int, cursor: Optional[str] = None, fields: Optional[str] = None) -> dict:
+    selected = parse_fields(fields, PRODUCT_FIELDS)
+    filters = [Product.deleted_at.is_(None)]
+    if owner_id is not None:
+        filters.append(Product.owner_id == owner_id)
+    rows = db.execute(build_page_query(Product, selected, filters, cursor, limit)).all()
+    return build_page(rows, selected, limit)
+
+
+async def get_products_page_async(db: AsyncSession, owner_id: Optional[int], limit: int, cursor: Optional[str] = None, fields: Optional[str] = None) -> dict:
+    selected = parse_fields(fields, PRODUCT_FIELDS)
+    filters = [Product.deleted_at.is_(None)]
+    if owner_id is not None:
+        filters.append(Product.owner_id == owner_id)
+    rows = (await db.execute(build_page_query(Product, selected, filters, cursor, limit))).all()
+    return build_page(rows, selected, limit)
+
+
+# Changes feed: every product by (updated_at, id), live rows in full, soft-deleted and
+# archived ones as tombstones. Every write path sets updated_at. Rows newer than
+# CHANGES_SETTLE_SECONDS are held back, so a write whose transaction commits after a
+# later one's cannot land behind a cursor already handed out.
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", 2))
+CHANGE_FIELDS = ["id", "name", "description", "price", "owner_id", "version", "created_at", "updated_at", "deleted_at"]
+TOMBSTONE_FIELDS = ["id", "owner_id", "updated_at", "deleted_at"]
+
+
+def build_changes_query(owner_id: Optional[int], since: Optional[str], limit: int):
+    settled = datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+    after = decode_cursor(since) if since else None
+
+    def changes(model):
+        query = select(*[getattr(model, field) for field in CHANGE_FIELDS]).where(model.updated_at <= settled)
+        if after:
+            query = query.where(tuple_(model.updated_at, model.id) > after)
+        if owner_id is not None:
+            query = query.where(model.owner_id == owner_id)
+        return query.order_by(model.updated_at, model.id).limit(limit + 1)
+
+    # archived products keep their updated_at, consumers behind it still get their tombstone
+    merged = union_all(changes(Product).subquery().select(), changes(ProductArchive).subquery().select()).subquery()
+    return select(merged).order_by(merged.c.updated_at, merged.c.id).limit(limit + 1)
+
+
+def build_changes_page(rows: list, since: Optional[str], limit: int) -> dict:
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    data = []
+    for row in rows:
+        if row.deleted_at is None:
+            data.append({**dict(zip(CHANGE_FIELDS, row)), "deleted": False})
+        else:
+            data.append({**{field: getattr(row, field) for field in TOMBSTONE_FIELDS}, "deleted": True})
+    return {
+        "data": data,
+        # store it and send it back as since; unchanged when nothing new settled
+        "next_since": encode_cursor(rows[-1].updated_at, rows[-1].id) if rows else since,
+        "has_more": has_more,
+    }
+
+
+def get_product_changes(db: Session, owner_id: Optional[int], since: Optional[str], limit: int) -> dict:
+    rows = db.execute(build_changes_query(owner_id, since, limit)).all()
+    return build_changes_page(rows, since, limit)
+
+
+async def get_product_changes_async(db: AsyncSession, owner_id: Optional[int], since: Optional[str], limit: int) -> dict:
+    rows = (await db.execute(build_changes_query(owner_id, since, limit))).all()
+    return build_changes_page(rows, since, limit)
+
+
+# What a cached product response was built from, read before every cache hit. Every write
+# sets updated_at, on whichever worker it runs, so a different value means the entry is stale.
+# One product: its own updated_at (None once archived). A listing: the newest updated_at of
+# the owner's products (every product for admins), soft-deleted ones included.
+def build_product_version_query(product_id: int):
+    return select(Product.updated_at).where(Product.id == product_id)
+
+
+def build_products_version_query(owner_id: Optional[int]):
+    query = select(func.max(Product.updated_at))
+    if owner_id is not None:
+        query = query.where(Product.owner_id == owner_id)
+    return query
+
+
+# Partial update in one conditional UPDATE ... RETURNING, None when no row matched
+def build_update_query(product_id: int, changes: dict, user_id: int, owner_id: Optional[int], version: Optional[int]):
+    query = update(Product).where(Product.id == product_id, Product.deleted_at.is_(None))
+    if owner_id is not None:
+        query = query.where(Product.owner_id == owner_id)
+    if version is not None:
+        query = query.where(Product.version == version)
+    return query.values(
+        **changes, version=Product.version + 1, updated_by=user_id, updated_at=datetime.utcnow(),
+    ).returning(*[getattr(Product, field) for field in PRODUCT_FIELDS])
+
+
+def update_product_fields(db: Session, product_id: int, changes: dict, user_id: int, owner_id: Optional[int] = None, version: Optional[int] = None):
+    row = db.execute(build_update_query(product_id, changes, user_id, owner_id, version)).first()
+    db.commit()
+    return row
+
+
+async def update_product_fields_async(db: AsyncSession, product_id: int, changes: dict, user_id: int, owner_id: Optional[int] = None, version: Optional[int] = None):
+    row = (await db.execute(build_update_query(product_id, changes, user_id, owner_id, version))).first()
+    await db.commit()
+    return row
+
+
+# Only read after a failed conditional update, to tell 404 / 403 / 409 apart
+def build_product_state_query(product_id: int):
+    return select(Product.owner_id, Product.version).where(Product.id == product_id, Product.deleted_at.is_(None))
+
+
+def get_product_state(db: Session, product_id: int):
+    return db.execute(build_product_state_query(product_id)).first()
+
+
+async def get_product_state_async(db: AsyncSession, product_id: int):
+    return (await db.execute(build_product_state_query(product_id))).first()
+
+
+# Export reads live products in keyset batches of EXPORT_BATCH_SIZE rows by id: every batch is
+# an index range read, and no connection or read transaction is held while a batch is sent
+def build_export_query(owner_id: Optional[int], after_id: int):
+    query = select(*[getattr(Product, field) for field in PRODUCT_FIELDS]).where(Product.deleted_at.is_(None), Product.id > after_id)
+    if owner_id is not None:
+        query = query.where(Product.owner_id == owner_id)
+    return query.order_by(Product.id).limit(EXPORT_BATCH_SIZE)
+
+
+def iter_product_batches(owner_id: Optional[int]) -> Iterator[list]:
+    # own session: the response keeps streaming after the request's session is gone
+    db = SessionLocal()
+    try:
+        after_id = 0
+        while True:
+            batch = db.execute(build_export_query(owner_id, after_id)).all()
+            db.rollback()  # back to the pool until the next batch
+            if batch:
+                yield batch
+            if len(batch) < EXPORT_BATCH_SIZE:
+                return
+            after_id = batch[-1].id
+    finally:
+        db.close()
+
+
+async def iter_product_batches_async(owner_id: Optional[int]) -> AsyncIterator[list]:
+    async with AsyncSessionLocal() as db:
+        after_id = 0
+        while True:
+            batch = (await db.execute(build_export_query(owner_id, after_id))).all()
+            await db.rollback()
+            if batch:
+                yield batch
+            if len(batch) < EXPORT_BATCH_SIZE:
+                return
+            after_id = batch[-1].id
+
+
+# Bulk import: one multi-row INSERT per chunk, caller commits. The partial unique index on
+# live names decides, not a lookup before the insert: ON CONFLICT DO NOTHING skips rows whose
+# name another import or request took meanwhile, RETURNING tells which rows went in.
+INSERT_SKIPPING_CONFLICTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+DUPLICATE_NAME = "Product with this name already exists"
+
+
+def split_new_products(products: list, seen_names: set, owner_id: int) -> tuple[list[dict], list[dict], dict]:
+    # (values, rejected, row of each value's name); names repeated in the upload are rejected here
+    values, rejected, rows = [], [], {}
+    for row, product in products:
+        if product.name in seen_names:
+            rejected.append({"row": row, "name": product.name, "error": DUPLICATE_NAME})
+            continue
+        seen_names.add(product.name)
+        rows[product.name] = row
+        values.append({
+            "name": product.name,
+            "description": product.description,
+            "price": product.price,
+            "owner_id": owner_id,
+        })
+    return values, rejected, rows
+
+
+def build_bulk_insert_query(dialect: str):
+    dialect_insert = INSERT_SKIPPING_CONFLICTS.get(dialect)
+    if dialect_insert is None:
+        return insert(Product).returning(Product.name)  # a taken name fails the chunk
+    return dialect_insert(Product).on_conflict_do_nothing().returning(Product.name)
+
+
+def skipped_products(rows: dict, inserted_names: set) -> list[dict]:
+    return [{"row": row, "name": name, "error": DUPLICATE_NAME} for name, row in rows.items() if name not in inserted_names]
+
+
+def bulk_create_products(db: Session, products: list, owner_id: int, seen_names: set) -> tuple[int, list[dict]]:
+    values, rejected, rows = split_new_products(products, seen_names, owner_id)
+    if not values:
+        return 0, rejected
+    inserted_names = set(db.scalars(build_bulk_insert_query(db.get_bind().dialect.name), values))
+    return len(inserted_names), rejected + skipped_products(rows, inserted_names)
+
+
+async def bulk_create_products_async(db: AsyncSession, products: list, owner_id: int, seen_names: set) -> tuple[int, list[dict]]:
+    values, rejected, rows = split_new_products(products, seen_names, owner_id)
+    if not values:
+        return 0, rejected
+    inserted_names = set(await db.scalars(build_bulk_insert_query(db.get_bind().dialect.name), values))
+    return len(inserted_names), rejected + skipped_products(rows, inserted_names)
@@ -1,7 +1,14 @@
 # perform user CRUD operations
+from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
-from schemas.user import UserCreate
+from schemas.user import UserCreate, UserOut
+from services.token_services import evict_user_from_cache
+from utils.pagination import parse_fields, build_page_query, build_page
+
+USER_FIELDS = list(UserOut.model_fields)
 
 def create_user(db: Session, user: UserCreate) -> User:
     db_user = User(
@@ -21,11 +28,18 @@ def delete_user(db: Session, user_id: int) -> bool:
         return False
     db.delete(db_user)
     db.commit()
+    evict_user_from_cache(user_id)
     return True
 
 def get_all_users(db: Session) -> list[User]:
     return db.query(User).filter(User.deleted_at.is_(None)).all()
 
+# One keyset page of users that are not deleted
+def get_users_page(db: Session, limit: int, cursor: Optional[str] = None, fields: Optional[str] = None) -> dict:
+    selected = parse_fields(fields, USER_FIELDS)
+    query = build_page_query(User, selected, [User.deleted_at.is_(None)], cursor, limit)
+    return build_page(db.execute(query).all(), selected, limit)
+
 def get_all_active_users(db: Session) -> list[User]:
     return db.query(User).filter(User.is_active == True).all()
 
@@ -35,3 +49,45 @@ def get_all_admin_approved_users(db: Session) -> list[User]:
 def get_unapproved_users(db: Session) -> list[User]:
     return db.query(User).filter(User.is_admin_approved == False).filter(User.deleted_at.is_(None)).all()
 
+# async versions used by the async routers (ASYNC_DB=true)
+async def create_user_async(db: AsyncSession, user: UserCreate) -> User:
+    db_user = User(
+        username=user.username,
+        email=user.email,
+    )
+    await db_user.set_password_async(user.password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    user_dict = db_user.__dict__
+    return user_dict
+
+async def delete_user_async(db: AsyncSession, user_id: int) -> bool:
+    db_user = await db.scalar(select(User).where(User.id == user_id))
+    if not db_user:
+        return False
+    await db.delete(db_user)
+    await db.commit()
+    evict_user_from_cache(user_id)
+    return True
+
+async def get_all_users_async(db: AsyncSession) -> list[User]:
+    result = await db.scalars(select(User).where(User.deleted_at.is_(None)))
+    return result.all()
+
+async def get_users_page_async(db: AsyncSession, limit: int, cursor: Optional[str] = None, fields: Optional[str] = None) -> dict:
+    selected = parse_fields(fields, USER_FIELDS)
+    query = build_page_query(User, selected, [User.deleted_at.is_(None)], cursor, limit)
+    return build_page((await db.execute(query)).all(), selected, limit)
+
+async def get_all_active_users_async(db: AsyncSession) -> list[User]:
+    result = await db.scalars(select(User).where(User.is_active == True))
+    return result.all()
+
+async def get_all_admin_approved_users_async(db: AsyncSession) -> list[User]:
+    result = await db.scalars(select(User).where(User.is_admin_approved == True).where(User.deleted_at.is_(None)))
+    return result.all()
+
+async def get_unapproved_users_async(db: AsyncSession) -> list[User]:
+    result = await db.scalars(select(User).where(User.is_admin_approved == False).where(User.deleted_at.is_(None)))
+    return result.all()
@@ -0,0 +1,154 @@
+# Read-replica routing: GET requests read from a healthy replica, everything else uses the primary
+import asyncio
+import logging
+import itertools
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from utils.cache import TTLCache
+from utils.metrics import DB_REPLICA_UP
+
+logger = logging.getLogger("db.routing")
+
+REPLICA_DATABASE_URLS = [url.strip() for url in settings.REPLICA_DATABASE_URLS.split(",") if url.strip()]
+
+# Token lookups and revocations must never lag: a fresh login or a logout would be misjudged
+PRIMARY_ONLY_TABLES = {"tokens", "blacklisted_tokens"}
+
+# Execution option for single reads that must see the latest commit even in a GET request
+# (the auth staleness checks): select(...).execution_options(read_primary=True)
+READ_PRIMARY = "read_primary"
+
+# user id -> True for READ_YOUR_WRITES_SECONDS after that user's last commit (process local)
+recent_writers = TTLCache(maxsize=100_000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def replication_lag(connection) -> float:
+    # seconds behind the primary; other backends only get a liveness check
+    if connection.dialect.name == "postgresql":
+        return float(connection.execute(POSTGRES_LAG_SQL).scalar() or 0)
+    connection.execute(text("SELECT 1"))
+    return 0.0
+
+
+class ReplicaSet:
+    """Round-robin over the replicas that passed their last health check."""
+
+    def __init__(self, engines: list, labels: list[str]):
+        self.engines = engines  # Engine or AsyncEngine, same order as labels
+        self.labels = labels
+        self.down = set()       # indexes of replicas skipped for reads
+        self._counter = itertools.count()
+        for index, engine in enumerate(engines):
+            DB_REPLICA_UP.labels(labels[index]).set(1)
+            event.listen(self.sync_engine(index), "handle_error", self._on_error(index))
+
+    def sync_engine(self, index: int):
+        engine = self.engines[index]
+        return getattr(engine, "sync_engine", engine)
+
+    def pick(self):
+        # sync Engine of the next healthy replica, None when all of them are down
+        healthy = [index for index in range(len(self.engines)) if index not in self.down]
+        if not healthy:
+            return None
+        return self.sync_engine(healthy[next(self._counter) % len(healthy)])
+
+    def set_health(self, index: int, up: bool, reason: str = ""):
+        if up and index in self.down:
+            logger.info("replica %s is back", self.labels[index])
+            self.down.discard(index)
+        elif not up and index not in self.down:
+            logger.warning("replica %s taken out of rotation: %s", self.labels[index], reason)
+            self.down.add(index)
+        DB_REPLICA_UP.labels(self.labels[index]).set(1 if up else 0)
+
+    def _on_error(self, index: int):
+        # lost or refused connections take the replica out until the next good health check
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.set_health(index, False, str(context.original_exception))
+        return handle_error
+
+    def check_engine(self, index: int):
+        try:
+            with self.engines[index].connect() as connection:
+                lag = replication_lag(connection)
+        except Exception as e:
+            self.set_health(index, False, str(e))
+            return
+        self.set_health(index, lag <= settings.REPLICA_MAX_LAG_SECONDS, f"{lag:.1f}s behind")
+
+    async def check_engine_async(self, index: int):
+        try:
+            async with self.engines[index].connect() as connection:
+                lag = await connection.run_sync(replication_lag)
+        except Exception as e:
+            self.set_health(index, False, str(e))
+            return
+        self.set_health(index, lag <= settings.REPLICA_MAX_LAG_SECONDS, f"{lag:.1f}s behind")
+
+    async def check(self):
+        for index, engine in enumerate(self.engines):
+            if hasattr(engine, "sync_engine"):
+                await self.check_engine_async(index)
+            else:
+                await run_in_threadpool(self.check_engine, index)
+
+
+async def monitor_replicas(replica_sets: list, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        for replicas in replica_sets:
+            try:
+                await replicas.check()
+            except Exception:
+                logger.exception("replica health check failed")
+
+
+class RoutingSession(Session):
+    """Session that sends reads to `replicas` when `info["read_only"]` is set (GET requests).
+
+    Stays on the primary for flushes and DML, for tables in PRIMARY_ONLY_TABLES, for
+    statements with the READ_PRIMARY execution option, once the session has written, and for users who committed a write in the last READ_YOUR_WRITES_SECONDS
+    (`info["user_id"]`, set by the auth dependency)."""
+
+    def __init__(self, *args, replicas: ReplicaSet = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+        if self.replicas is None or self.use_primary(mapper, clause):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.replicas.pick() or super().get_bind(mapper, clause=clause, **kwargs)
+
+    def use_primary(self, mapper, clause=None) -> bool:
+        if not self.info.get("read_only") or self.info.get("wrote") or self._flushing:
+            return True
+        if getattr(clause, "_execution_options", {}).get(READ_PRIMARY):
+            return True
+        table = getattr(mapper, "local_table", None)
+        if table is not None and table.name in PRIMARY_ONLY_TABLES:
+            return True
+        user_id = self.info.get("user_id")
+        return user_id is not None and recent_writers.get(user_id, False)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def mark_written(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def start_read_your_writes(session):
+    user_id = session.info.get("user_id")
+    if session.info.get("wrote") and user_id is not None:
+        recent_writers.set(user_id, True)
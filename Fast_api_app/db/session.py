@@ -1,21 +1,118 @@
 import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from dotenv import load_dotenv
-from fastapi import Depends
+from utils.profiling import instrument_engine
+from utils.metrics import timed_pool_class, instrument_pool
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from config import settings
+from db.routing import REPLICA_DATABASE_URLS, ReplicaSet, RoutingSession
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Serve the API through the async routers (AsyncEngine + AsyncSession)
+ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() == "true"
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async drivers for the sync URLs we already use in .env
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def get_async_database_url(url: str) -> str:
+    # ASYNC_DATABASE_URL wins, otherwise swap the driver of DATABASE_URL
+    if os.getenv("ASYNC_DATABASE_URL"):
+        return os.getenv("ASYNC_DATABASE_URL")
+    return to_async_url(url)
+
+
+def pool_options(url: str, label: str, asyncio: bool = False) -> dict:
+    # in-memory SQLite keeps its single-connection pool, everything else gets the timed QueuePool
+    if url.startswith("sqlite") and (":memory:" in url or url.split("://", 1)[-1] in ("", "/")):
+        return {}
+    return {
+        "poolclass": timed_pool_class(label, asyncio),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def make_engine(url: str, label: str):
+    engine = create_engine(url, **pool_options(url, label))
+    instrument_engine(engine)  # per-request query count / DB time, see utils/profiling.py
+    instrument_pool(engine, label)  # pool gauges for /metrics, see utils/metrics.py
+    return engine
+
+
+def make_async_engine(url: str, label: str):
+    engine = create_async_engine(url, **pool_options(url, label, asyncio=True))
+    instrument_engine(engine.sync_engine)
+    instrument_pool(engine.sync_engine, label)
+    return engine
+
+
+engine = make_engine(DATABASE_URL, "primary")
+
+# GET requests read from replicas when REPLICA_DATABASE_URLS is set, see db/routing.py
+replicas = None
+session_options = {}
+if REPLICA_DATABASE_URLS:
+    labels = [f"replica{index}" for index in range(len(REPLICA_DATABASE_URLS))]
+    replicas = ReplicaSet([make_engine(url, label) for url, label in zip(REPLICA_DATABASE_URLS, labels)], labels)
+    session_options = {"class_": RoutingSession, "replicas": replicas}
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, **session_options)
+
+async_engine = None
+async_replicas = None
+AsyncSessionLocal = None
+if ASYNC_DB:
+    async_engine = make_async_engine(get_async_database_url(DATABASE_URL), "async")
+    async_session_options = {}
+    if REPLICA_DATABASE_URLS:
+        labels = [f"async_replica{index}" for index in range(len(REPLICA_DATABASE_URLS))]
+        async_replicas = ReplicaSet(
+            [make_async_engine(to_async_url(url), label) for url, label in zip(REPLICA_DATABASE_URLS, labels)], labels,
+        )
+        async_session_options = {"sync_session_class": RoutingSession, "replicas": async_replicas}
+    # expire_on_commit=False: attributes must stay readable after commit without lazy IO
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, **async_session_options)
+
+# GET/HEAD requests may read from a replica (only with RoutingSession)
+READ_ONLY_METHODS = {"GET", "HEAD"}
+
+# Sessions only check a connection out on their first query and give it back on
+# commit/rollback/close, so requests that fail auth from the cache never touch the pool.
+# Dependency teardown runs after the response is sent, so sessions are also registered on
+# the request scope and closed by ReleaseSessionsMiddleware as soon as the response is ready.
+
+# /batch runs its operations through the app with the batch's own session on the scope
+# (services/batch_service.py); the operation's endpoint uses it and leaves it open
+BATCH_SESSION = "batch_db"
 
 # Dependency to get the database session
-def get_db():
+def get_db(request: Request):
+    if BATCH_SESSION in request.scope:
+        yield request.scope[BATCH_SESSION]
+        return
     db = SessionLocal()
+    db.info["read_only"] = request.method in READ_ONLY_METHODS
+    request.scope.setdefault("db_sessions", []).append(db)
     try:
         yield db
     finally:
@@ -24,3 +121,46 @@ def get_db():
 # Dependency to get the database session
 def get_db_session(db: Session = Depends(get_db)):
     return db
+
+# Dependency to get the async database session
+async def get_async_db(request: Request):
+    if BATCH_SESSION in request.scope:
+        yield request.scope[BATCH_SESSION]
+        return
+    async with AsyncSessionLocal() as db:
+        db.info["read_only"] = request.method in READ_ONLY_METHODS
+        request.scope.setdefault("db_sessions", []).append(db)
+        yield db
+
+# Dependency to get the async database session
+async def get_async_db_session(db: AsyncSession = Depends(get_async_db)):
+    return db
+
+
+async def release_request_sessions(scope):
+    for db in scope.pop("db_sessions", []):
+        if isinstance(db, AsyncSession):
+            await db.close()
+        else:
+            await run_in_threadpool(db.close)
+
+
+class ReleaseSessionsMiddleware:
+    """ASGI middleware: closes the request's sessions once the handler and response
+    serialization are done, before the body goes out to a possibly slow client.
+    Streaming responses must open their own sessions (see iter_product_batches)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_release(message):
+            if message["type"] == "http.response.start":
+                await release_request_sessions(scope)
+            await send(message)
+
+        await self.app(scope, receive, send_after_release)
@@ -1,12 +1,75 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from db.session import SessionLocal, engine
+from config import settings
+from db.session import SessionLocal, engine, async_engine, replicas, async_replicas, ASYNC_DB, ReleaseSessionsMiddleware
+from db.routing import monitor_replicas
 from db.base import Base
-from routers import user_router, product_router
+from routers import user_router, product_router, batch_router, async_user_router, async_product_router, async_batch_router
+from services.token_services import STATELESS_AUTH, REVOCATION_SYNC_SECONDS
+from services.revocation_service import load_revocation_filter, sync_revocation_filter
+from services.password_service import password_pool
+from services.search_service import detect_search_backend
+from services.token_write_buffer import token_write_buffer
+from services.event_hub import event_hub
+from services.maintenance_service import MAINTENANCE_INTERVAL_SECONDS, run_maintenance_periodically
+from utils.profiling import ProfilingMiddleware
+from utils.admission import AdmissionMiddleware
+from utils.metrics import MetricsMiddleware, render_metrics
 
-# Create FastAPI app instance
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Stateless auth checks revocation in memory, load the blacklist before serving
+    if STATELESS_AUTH:
+        load_revocation_filter()
+        asyncio.create_task(sync_revocation_filter(REVOCATION_SYNC_SECONDS))
+
+    # FTS5 / tsvector index when the database has one, otherwise the in-process index
+    detect_search_backend(engine)
+
+    # Take lagging or unreachable read replicas out of rotation and put them back once healthy
+    replica_sets = [replica_set for replica_set in (replicas, async_replicas) if replica_set is not None]
+    if replica_sets:
+        asyncio.create_task(monitor_replicas(replica_sets, settings.REPLICA_HEALTH_INTERVAL))
+
+    # Purge expired tokens / blacklist entries and archive old soft-deleted products
+    # (MAINTENANCE_INTERVAL_SECONDS=0 when it runs from cron instead)
+    if MAINTENANCE_INTERVAL_SECONDS > 0:
+        asyncio.create_task(run_maintenance_periodically(MAINTENANCE_INTERVAL_SECONDS))
+
+    # Login token rows are inserted in batches when TOKEN_WRITE_BEHIND_MS is set
+    token_write_buffer.start()
+
+    # Fan-out of product events to /products/events streams (EVENT_BROKER_URL relays between workers)
+    await event_hub.start()
+
+    yield
+
+    # Ends the streams still open: the server only gets here once they are done or its
+    # graceful shutdown timeout has cancelled them
+    await event_hub.stop()
+
+    password_pool.shutdown()
+
+    # Write the buffered login tokens before the process exits
+    token_write_buffer.stop()
+
+    # Pooled aiosqlite/asyncpg connections must be closed while the event loop is still running
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_replicas is not None:
+        for replica in async_replicas.engines:
+            await replica.dispose()
+
+
+# Create FastAPI app instance, started and stopped by lifespan()
+app = FastAPI(lifespan=lifespan)
+
+# Per route class concurrency limits and per client rate limits, 429/503 with Retry-After.
+# Added first so it runs inside CORS and its rejections still carry the CORS headers.
+app.add_middleware(AdmissionMiddleware)
 
 # CORS middleware setup (allowing requests from any origin)
 app.add_middleware(
@@ -17,13 +80,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Return DB connections to the pool before the response body is sent
+app.add_middleware(ReleaseSessionsMiddleware)
+
+# Sampled Server-Timing header and slow request log (PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+
+# Prometheus request count / latency per route template, scraped from /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Create database tables on startup
 Base.metadata.create_all(bind=engine)
 
-
 # Include routers
-app.include_router(user_router.router, prefix="/users", tags=["Users"])
-app.include_router(product_router.router, prefix="/products", tags=["Products"])
+if ASYNC_DB:
+    app.include_router(async_user_router.router, prefix="/users", tags=["Users"])
+    app.include_router(async_product_router.router, prefix="/products", tags=["Products"])
+    app.include_router(async_batch_router.router, tags=["Batch"])
+else:
+    app.include_router(user_router.router, prefix="/users", tags=["Users"])
+    app.include_router(product_router.router, prefix="/products", tags=["Products"])
+    app.include_router(batch_router.router, tags=["Batch"])
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
+
 
 # Default route
 @app.get("/")
@@ -33,7 +117,8 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # open /products/events streams would otherwise hold the shutdown until they disconnect
+    uvicorn.run(app, host="0.0.0.0", port=8000, timeout_graceful_shutdown=5)
 
 
 # Note: get_db_session is used from db.session module
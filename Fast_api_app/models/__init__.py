@@ -2,3 +2,5 @@ from .user import User
 from .products import Product
 from .token import Token
 from .blacklist import BlacklistedToken
+from .product_archive import ProductArchive
+from . import product_search  # full-text index DDL, runs when create_all() creates products
@@ -8,7 +8,9 @@ class BlacklistedToken(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     token = Column(String, unique=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    jti = Column(String, unique=True, nullable=True, index=True)
+    expires_at = Column(DateTime, nullable=True, index=True)  # the revoked token's own exp
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # revocation sync window
 
     def __repr__(self):
-        return f"<BlacklistedToken(id={self.id}, token='{self.token}')>"
+        return f"<BlacklistedToken(id={self.id}, jti='{self.jti}')>"
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from datetime import datetime
+
+from db.base import Base
+
+# Products soft-deleted longer than ARCHIVE_DELETED_PRODUCTS_DAYS, moved here by
+# services/maintenance_service.py so the live table and its indexes stay small
+class ProductArchive(Base):
+    __tablename__ = 'products_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # the id it had in products
+    name = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    price = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+    owner_id = Column(Integer, nullable=True, index=True)
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    deleted_at = Column(DateTime, nullable=True)
+    updated_by = Column(Integer, nullable=True)
+    deleted_by = Column(Integer, nullable=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # tombstones for the /products/changes feed
+    __table_args__ = (
+        Index("ix_products_archive_updated", "updated_at", "id"),
+        Index("ix_products_archive_owner_updated", "owner_id", "updated_at", "id"),
+    )
+
+    def __repr__(self):
+        return f"<ProductArchive(id={self.id}, name='{self.name}')>"
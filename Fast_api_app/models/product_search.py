@@ -0,0 +1,39 @@
+# Full-text index over products.name / description, maintained by the database itself:
+# - SQLite: FTS5 external content table, triggers keep it to the live (not soft-deleted) rows
+# - PostgreSQL: generated tsvector column + partial GIN index
+# Created here together with the products table (create_all) and for existing databases by
+# alembic/versions/0004_product_search.py, keep both in sync. Other backends fall back to the
+# in-process index in services/search_service.py.
+from sqlalchemy import DDL, event
+from models.products import Product
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, description, content='products', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products WHEN new.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products WHEN old.deleted_at IS NULL BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    # covers edits and soft-deletes: drop the old entry if it was live, add the new one if it still is
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description, deleted_at ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "SELECT 'delete', old.id, old.name, old.description WHERE old.deleted_at IS NULL; "
+    "INSERT INTO products_fts(rowid, name, description) "
+    "SELECT new.id, new.name, new.description WHERE new.deleted_at IS NULL; END",
+]
+
+POSTGRES_SEARCH_DDL = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector) "
+    "WHERE deleted_at IS NULL",
+]
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+# the FTS table is not part of the metadata, drop_all() has to remove it explicitly
+event.listen(Product.__table__, "before_drop", DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -11,6 +11,8 @@ class Product(Base):
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
     price = Column(Integer, nullable=False)
+    # bumped by every update, clients send it back for optimistic concurrency
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
 
     owner_id = Column(Integer, ForeignKey('users.id'))
     owner = relationship(
@@ -19,7 +21,7 @@ class Product(Base):
         foreign_keys=[owner_id]  # ✅ THIS FIXES THE ERROR
     )
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     deleted_at = Column(DateTime, nullable=True)
 
@@ -37,6 +39,34 @@ class Product(Base):
         back_populates="deleted_products"
     )
 
+    # Live rows only (deleted_at IS NULL), matching the router queries.
+    # Keep in sync with alembic/versions/0002_query_indexes.py
+    __table_args__ = (
+        Index(
+            "uq_products_name_live", "name", unique=True,
+            postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL"),
+        ),
+        Index(
+            "ix_products_owner_created_live", "owner_id", "created_at", "id",
+            postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL"),
+        ),
+        Index(
+            "ix_products_created_live", "created_at", "id",
+            postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL"),
+        ),
+        # every row, live or not: the order of the /products/changes feed
+        Index("ix_products_updated", "updated_at", "id"),
+        # the same for one owner (non-admin feeds)
+        Index("ix_products_owner_updated", "owner_id", "updated_at", "id"),
+        # soft-deleted rows only, for the archiving job
+        Index(
+            "ix_products_deleted_at", "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"), sqlite_where=text("deleted_at IS NOT NULL"),
+        ),
+        # SQLite would hand out the ids of deleted / archived rows again (products_archive keeps them)
+        {"sqlite_autoincrement": True},
+    )
+
     def __repr__(self):
         return f"<Product(id={self.id}, name='{self.name}', price={self.price})>"
 
@@ -1,10 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from passlib.context import CryptContext
 from db.base import Base
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.password_service import pwd_context, password_pool, hash_password, verify_password
 
 class User(Base):
     __tablename__ = 'users'
@@ -17,8 +15,10 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     is_admin_approved = Column(Boolean, default=False)
+    # bumped on logout / refresh / approval change, cached auth of the user is stale from then on
+    auth_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     deleted_at = Column(DateTime, nullable=True)
 
@@ -46,11 +46,37 @@ class User(Base):
     )
 
 
+    # Keep in sync with alembic/versions/0002_query_indexes.py
+    __table_args__ = (
+        Index(
+            "ix_users_approved_created_live", "is_admin_approved", "created_at",
+            postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL"),
+        ),
+        Index(
+            "ix_users_created_live", "created_at", "id",
+            postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL"),
+        ),
+        Index("ix_users_is_active", "is_active"),
+    )
+
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', email='{self.email}')>"
     
+    # bcrypt runs in the password pool, see services/password_service.py
     def set_password(self, raw_password: str):
-        self.hashed_password = pwd_context.hash(raw_password)
+        self.hashed_password = password_pool.run(hash_password, raw_password)
 
     def verify_password(self, raw_password: str):
-        return pwd_context.verify(raw_password, self.hashed_password)
+        is_valid, new_hash = password_pool.run(verify_password, raw_password, self.hashed_password)
+        if is_valid and new_hash:
+            self.hashed_password = new_hash  # BCRYPT_ROUNDS changed, saved with the caller's commit
+        return is_valid
+
+    async def set_password_async(self, raw_password: str):
+        self.hashed_password = await password_pool.run_async(hash_password, raw_password)
+
+    async def verify_password_async(self, raw_password: str):
+        is_valid, new_hash = await password_pool.run_async(verify_password, raw_password, self.hashed_password)
+        if is_valid and new_hash:
+            self.hashed_password = new_hash
+        return is_valid
@@ -0,0 +1,29 @@
+# async version of batch_router.py, mounted when ASYNC_DB=true
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_async_db_session
+from schemas.batch import BatchRequest, BatchResponse
+from services.token_services import get_current_user_async
+from services.batch_service import run_batch_async
+from models.user import User
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+# Run an ordered list of user / product operations with one auth check and one DB session
+# (mode "atomic": all or nothing, "per_op": each operation commits on its own)
+@router.post("/batch", response_model=BatchResponse)
+async def batch_endpoint(batch: BatchRequest, request: Request, db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        results, committed = await run_batch_async(request, batch, db, current_user)
+        return {
+            "data": results,
+            "committed": committed,
+            "message": "Batch committed" if committed else "Batch rolled back",
+            "status": "success" if committed else "failed"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
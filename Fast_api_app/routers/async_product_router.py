@@ -0,0 +1,294 @@
+# async version of product_router.py, mounted when ASYNC_DB=true
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_async_db_session
+from crud.product_crud import (
+    Product,
+    PRODUCT_FIELDS,
+    create_product_async,
+    get_products_page_async,
+    get_product_changes_async,
+    iter_product_batches_async,
+    update_product_fields_async,
+    get_product_state_async,
+)
+from services.token_services import get_current_user_async
+from schemas.product import ProductCreate, ProductResponse, ProductOut, DeleteProduct, ProductUpdate, ProductPage, ProductSearchPage, ProductChangesPage, BulkImportResult
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.serialization import json_result
+from services.search_service import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, MAX_SEARCH_OFFSET, search_products_async
+from services.event_hub import event_hub, sse_stream
+from services.product_service import (
+    EXPORT_MEDIA_TYPES,
+    BULK_IMPORT_CHUNK_SIZE,
+    MAX_IMPORT_CHUNK_SIZE,
+    export_chunks_async,
+    spool_upload,
+    import_products_async,
+    resolve_import_format,
+    cached_product_response_async,
+    product_changes,
+    failed_update_error,
+    product_response,
+    product_page_response,
+    product_changed,
+)
+from models.user import User
+from utils.idempotency import IdempotentRoute, idempotency_key
+from datetime import datetime
+
+
+router = APIRouter(route_class=IdempotentRoute)
+
+# Idempotency-Key header on writes: retries get the first response back (utils/idempotency.py)
+claim_idempotency_key = idempotency_key(get_current_user_async)
+
+# Create a new product
+@router.post("/add_products", response_model=ProductResponse, dependencies=[Depends(claim_idempotency_key)])
+async def add_product(product: ProductCreate, db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        # name uniqueness is enforced by uq_products_name_live
+        product_data = await create_product_async(db, product, current_user.id)
+        product_changed(product_data.id, current_user.id, "created")
+
+        return {
+            "data": product_data,
+            "message": "Product added successfully",
+            "status": "success"
+        }
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Product with this name already exists")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Import many products from a streamed CSV / NDJSON body, one INSERT and commit per chunk
+@router.post("/bulk_import", response_model=BulkImportResult)
+async def bulk_import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(BULK_IMPORT_CHUNK_SIZE, ge=1, le=MAX_IMPORT_CHUNK_SIZE),
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        format = resolve_import_format(format, request.headers.get("content-type"))
+        upload = await spool_upload(request)
+        try:
+            return await import_products_async(db, upload, format, chunk_size, current_user.id)
+        finally:
+            upload.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Get all products (keyset paginated, ?fields= selects columns)
+@router.get("/all_products", response_model=ProductPage, response_model_exclude_unset=True)
+async def get_all_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        # unchanged pages are served from the response cache, or as 304 on If-None-Match
+        cached = await cached_product_response_async(request, current_user, db)
+        if cached is not None:
+            return cached
+
+        owner_id = None if current_user.is_admin else current_user.id
+        page = await get_products_page_async(db, owner_id, limit, cursor, fields)
+        return product_page_response(request, current_user, page)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Full-text search over name / description with price and owner filters, best match first
+@router.get("/search", response_model=ProductSearchPage)
+async def search(
+    q: Optional[str] = Query(None, max_length=200),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    owner_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        # admins search every product (or one owner's), everyone else only their own
+        if not current_user.is_admin:
+            if owner_id is not None and owner_id != current_user.id:
+                raise HTTPException(status_code=403, detail="You can only search your own products")
+            owner_id = current_user.id
+        return json_result(await search_products_async(db, q, min_price, max_price, owner_id, limit, offset))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Products created, updated or deleted since the `next_since` of the previous call, oldest change first
+@router.get("/changes", response_model=ProductChangesPage, response_model_exclude_unset=True)
+async def get_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        owner_id = None if current_user.is_admin else current_user.id
+        return json_result(await get_product_changes_async(db, owner_id, since, limit))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Server-Sent Events for product writes in the user's scope (own products, all for admins)
+@router.get("/events")
+async def product_events(current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        event_hub.check_available()
+        return StreamingResponse(
+            sse_stream(None if current_user.is_admin else current_user.id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Stream all products as NDJSON or CSV, same scope as /all_products
+@router.get("/export")
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user_async)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        owner_id = None if current_user.is_admin else current_user.id
+        return StreamingResponse(
+            export_chunks_async(iter_product_batches_async(owner_id), PRODUCT_FIELDS, format),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f"attachment; filename=products.{format}"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# update the product: one conditional UPDATE ... RETURNING, send back `version` to detect lost updates
+@router.put("/update_product/{product_id}", response_model=ProductResponse, dependencies=[Depends(claim_idempotency_key)])
+async def update_product(product_id: int, product: ProductUpdate, db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        owner_id = None if current_user.is_admin else current_user.id
+        # name uniqueness is enforced by uq_products_name_live
+        updated = await update_product_fields_async(db, product_id, product_changes(product), current_user.id, owner_id, product.version)
+        if updated is None:
+            raise failed_update_error(await get_product_state_async(db, product_id), owner_id)
+        product_changed(updated.id, updated.owner_id)
+
+        return {
+            "data": updated._asdict(),
+            "message": "Product updated successfully",
+            "status": "success"
+        }
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Product with this name already exists")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Delete a product
+@router.delete("/delete_product/{product_id}", response_model= DeleteProduct, dependencies=[Depends(claim_idempotency_key)])
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        db_product = await db.scalar(select(Product).where(Product.id == product_id).where(Product.deleted_at.is_(None)))
+        if not db_product:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        if not current_user.is_admin and db_product.owner_id != current_user.id :
+            raise HTTPException(status_code=403, detail="You do not have permission to delete this product")
+
+        db_product.deleted_by = current_user.id
+        db_product.deleted_at = datetime.utcnow()
+        db.add(db_product)
+        await db.commit()
+        product_changed(db_product.id, db_product.owner_id, "deleted")
+
+        return {
+            "message": "Product deleted successfully",
+            "status": "success"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+#  Get PArticulre product by ID
+@router.get("/get_product/{product_id}", response_model= ProductCreate)
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        cached = await cached_product_response_async(request, current_user, db)
+        if cached is not None:
+            return cached
+
+        db_product = await db.scalar(select(Product).where(Product.id == product_id).where(Product.deleted_at.is_(None)))
+        if not db_product:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        if not current_user.is_admin and db_product.owner_id != current_user.id :
+            raise HTTPException(status_code=403, detail="You do not have permission to view this product")
+
+        return product_response(request, current_user, db_product)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,212 @@
+# async version of user_router.py, mounted when ASYNC_DB=true
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from db.session import get_async_db_session
+from crud.user_crud import (
+    create_user_async,
+    get_users_page_async,
+    get_unapproved_users_async,
+    get_all_admin_approved_users_async,
+)
+from schemas.user import UserCreate, UserOut, UserWithTokens, LoginRequest, RefreshRequest, ResponseModel, ApproveUser, UserPage
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.serialization import json_result
+from models.user import User
+from utils.profiling import ProfiledRoute
+from models.token import Token
+from services.token_services import create_token_pair, session_tokens, rotate_refresh_token_async, get_current_user_async, evict_user_from_cache, build_auth_version_bump, STATELESS_AUTH
+from services.token_write_buffer import token_write_buffer
+from services.revocation_service import revoke_tokens_async
+
+# Create a new APIRouter instance
+router = APIRouter(route_class=ProfiledRoute)
+
+# Create a new user
+@router.post("/register", response_model=ResponseModel)
+async def create_user_endpoint(user: UserCreate, db: AsyncSession = Depends(get_async_db_session)):
+    try:
+        existing_user = await db.scalar(select(User.id).where((User.username == user.username) | (User.email == user.email)))
+        if existing_user:
+            raise HTTPException(status_code=400, detail="Username or email already exists")
+
+        if not user.password:
+            raise HTTPException(status_code=400, detail="Password is required")
+
+        if len(user.password) < 8:
+            raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
+
+        user_data = await create_user_async(db, user)
+
+        return {
+            "data": user_data,
+            "message": "User created successfully, please wait for admin approval",
+            "status": "success"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/login", response_model=UserWithTokens)
+async def login_user(login: LoginRequest, db: AsyncSession = Depends(get_async_db_session)):
+
+    try:
+        user = await db.scalar(select(User).where((User.username == login.username) | (User.email == login.username)))
+
+        if not user or not await user.verify_password_async(login.password):
+            raise HTTPException(status_code=404, detail="User not found")
+
+        if not user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        # Create Token instance (a new session) and store in DB, or hand it to the write-behind buffer
+        token_obj = create_token_pair(user)
+        if token_write_buffer.enabled:
+            token_write_buffer.add(token_obj)
+        else:
+            db.add(token_obj)
+        # the token row and a rehashed password (verify_password) are written here, if any
+        if db.new or db.dirty:
+            await db.commit()
+            await db.refresh(user)
+
+        return {
+            "data": user,
+            "access_token": token_obj.access_token,
+            "refresh_token": token_obj.refresh_token,
+            "message": "Login successful",
+            "status": "success"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# New access + refresh token pair for a refresh token, no password check (rotation: each refresh token works once)
+@router.post("/refresh", response_model=UserWithTokens)
+async def refresh_tokens(body: RefreshRequest, db: AsyncSession = Depends(get_async_db_session)):
+    try:
+        user, token_obj = await rotate_refresh_token_async(db, body.refresh_token)
+        return {
+            "data": user,
+            "access_token": token_obj.access_token,
+            "refresh_token": token_obj.refresh_token,
+            "message": "Tokens refreshed",
+            "status": "success"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# approved user by admin
+@router.post("/{user_id}/approve", response_model=ApproveUser)
+async def approve_user(user_id: int, db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin privileges required")
+
+        user = await db.scalar(select(User).where(User.id == user_id).where(User.deleted_at.is_(None)))
+
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        if user.is_admin:
+            raise HTTPException(status_code=400, detail="Cannot approve an admin user")
+
+        user.is_admin_approved = not user.is_admin_approved
+
+        user.auth_version += 1  # cached tokens of the user are re-checked on every worker
+        await db.commit()
+        await db.refresh(user)
+        evict_user_from_cache(user.id)
+
+        return {
+            "is_admin_approved": user.is_admin_approved,
+            "message": "User approval status updated successfully",
+            "status": "success"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# get all user for the admin accees this APi (keyset paginated, ?fields= selects columns)
+@router.get("/all", response_model=UserPage, response_model_exclude_unset=True)
+async def get_all_users_endpoint(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin privileges required")
+        return json_result(await get_users_page_async(db, limit, cursor, fields))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# user logout
+@router.post("/logout", response_model=dict)
+async def logout_user(db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        # logins not written yet are dropped from the write-behind buffer
+        pending = await run_in_threadpool(token_write_buffer.discard_where, lambda token: token.user_id == current_user.id)
+        if STATELESS_AUTH:
+            # tokens are not looked up per request, blacklist their jti instead
+            rows = (await db.execute(select(Token.access_token, Token.refresh_token).where(Token.user_id == current_user.id))).all()
+            await revoke_tokens_async(db, [token for row in rows for token in row] + session_tokens(pending))
+
+        # Delete all tokens for the current user
+        await db.execute(delete(Token).where(Token.user_id == current_user.id))
+        await db.execute(build_auth_version_bump(current_user.id))
+        await db.commit()
+        evict_user_from_cache(current_user.id)
+        return {
+            "message": "User logged out successfully",
+            "status": "success"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Get all approved users
+@router.get("/approved_user", response_model=list[UserOut])
+async def get_all_approved_users(db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin privileges required")
+
+        users = await get_all_admin_approved_users_async(db)
+        return users
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Get all unapproved users
+@router.get("/unapproved_users", response_model=list[UserOut])
+async def get_unapproved_users(db: AsyncSession = Depends(get_async_db_session), current_user: User = Depends(get_current_user_async)):
+    try:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin privileges required")
+
+        users = await get_unapproved_users_async(db)
+        return users
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+#  Get current user details
+@router.get("/current_user_details", response_model=UserOut)
+async def get_current_user_details(current_user: User = Depends(get_current_user_async)):
+    try:
+        return current_user
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
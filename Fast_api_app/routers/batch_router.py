@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from db.session import get_db_session
+from schemas.batch import BatchRequest, BatchResponse
+from services.token_services import get_current_user
+from services.batch_service import run_batch
+from models.user import User
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+# Run an ordered list of user / product operations with one auth check and one DB session
+# (mode "atomic": all or nothing, "per_op": each operation commits on its own)
+@router.post("/batch", response_model=BatchResponse)
+async def batch_endpoint(batch: BatchRequest, request: Request, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+    try:
+        results, committed = await run_batch(request, batch, db, current_user)
+        return {
+            "data": results,
+            "committed": committed,
+            "message": "Batch committed" if committed else "Batch rolled back",
+            "status": "success" if committed else "failed"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,97 +1,238 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from utils.helpers import has_exception
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from db.session import get_db_session
 from crud.product_crud import *
 from services.token_services import create_access_token, create_refresh_token, get_current_user 
-from schemas.product import ProductCreate, ProductResponse, ProductOut, DeleteProduct, ProductUpdate
+from schemas.product import ProductCreate, ProductResponse, ProductOut, DeleteProduct, ProductUpdate, ProductPage, ProductSearchPage, ProductChangesPage, BulkImportResult
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.serialization import json_result
+from services.search_service import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, MAX_SEARCH_OFFSET, search_products
+from services.event_hub import event_hub, sse_stream
+from services.product_service import (
+    EXPORT_MEDIA_TYPES,
+    BULK_IMPORT_CHUNK_SIZE,
+    MAX_IMPORT_CHUNK_SIZE,
+    export_chunks,
+    spool_upload,
+    import_products,
+    resolve_import_format,
+    cached_product_response,
+    product_changes,
+    failed_update_error,
+    product_response,
+    product_page_response,
+    product_changed,
+)
 from models.user import User
+from utils.idempotency import IdempotentRoute, idempotency_key
 from datetime import datetime
 
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
+
+# Idempotency-Key header on writes: retries get the first response back (utils/idempotency.py)
+claim_idempotency_key = idempotency_key(get_current_user)
 
 # Create a new product
-@router.post("/add_products", response_model=ProductResponse)
+@router.post("/add_products", response_model=ProductResponse, dependencies=[Depends(claim_idempotency_key)])
 def add_product(product: ProductCreate, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     try:
         if not current_user.is_admin_approved:
             raise HTTPException(status_code=403, detail="User not approved by admin")
-        
-        if db.query(Product).filter(Product.name == product.name).filter(Product.deleted_at.is_(None)).first():
-            raise HTTPException(status_code=400, detail="Product with this name already exists")
 
+        # name uniqueness is enforced by uq_products_name_live
         product_data = create_product(db, product, current_user.id)
+        product_changed(product_data.id, current_user.id, "created")
 
         return {
             "data": product_data,
             "message": "Product added successfully",
             "status": "success"
         }
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Product with this name already exists")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Get all products
-@router.get("/all_products", response_model=list[ProductOut])
-def get_all_products(db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+# Import many products from a streamed CSV / NDJSON body, one INSERT and commit per chunk
+@router.post("/bulk_import", response_model=BulkImportResult)
+async def bulk_import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(BULK_IMPORT_CHUNK_SIZE, ge=1, le=MAX_IMPORT_CHUNK_SIZE),
+    db: Session = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
     try:
         if not current_user.is_admin_approved:
             raise HTTPException(status_code=403, detail="User not approved by admin")
         
-        products = []        
-        if current_user.is_admin:
-            products = db.query(Product).filter(Product.deleted_at.is_(None)).all()
-        else:
-            products = db.query(Product).filter(Product.owner_id == current_user.id).filter(Product.deleted_at.is_(None)).all()
-      
-        return products
+        format = resolve_import_format(format, request.headers.get("content-type"))
+        upload = await spool_upload(request)
+        try:
+            # sync session, keep the DB work off the event loop
+            return await run_in_threadpool(import_products, db, upload, format, chunk_size, current_user.id)
+        finally:
+            upload.close()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 
-# update the product
-@router.put("/update_product/{product_id}", response_model=ProductResponse)
-def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+# Get all products (keyset paginated, ?fields= selects columns)
+@router.get("/all_products", response_model=ProductPage, response_model_exclude_unset=True)
+def get_all_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
     try:
         if not current_user.is_admin_approved:
             raise HTTPException(status_code=403, detail="User not approved by admin")
         
-        db_product = db.query(Product).filter(Product.id == product_id).filter(Product.deleted_at.is_(None)).first()
-        if not db_product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        
-        if not current_user.is_admin and db_product.owner_id != current_user.id :
-            raise HTTPException(status_code=403, detail="You do not have permission to update this product")
-        
-        # check prduct name exist 
-        existing_product = db.query(Product).filter(
-                Product.name == product.name,
-                Product.id != product_id  
-            ).filter(Product.deleted_at.is_(None)).first()
-
-        if existing_product:
-            raise HTTPException(status_code=400, detail="Product with this name already exists")
-        
-        db_product.name = product.name if product.name else db_product.name
-        db_product.description = product.description if product.description else db_product.description
-        db_product.price = product.price if product.price else db_product.price
-        db_product.updated_by = current_user.id 
-        db_product.updated_at = datetime.utcnow()
-        db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
+        # unchanged pages are served from the response cache, or as 304 on If-None-Match
+        cached = cached_product_response(request, current_user, db)
+        if cached is not None:
+            return cached
+
+        owner_id = None if current_user.is_admin else current_user.id
+        page = get_products_page(db, owner_id, limit, cursor, fields)
+        return product_page_response(request, current_user, page)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+
+# Full-text search over name / description with price and owner filters, best match first
+@router.get("/search", response_model=ProductSearchPage)
+def search(
+    q: Optional[str] = Query(None, max_length=200),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    owner_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    db: Session = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        # admins search every product (or one owner's), everyone else only their own
+        if not current_user.is_admin:
+            if owner_id is not None and owner_id != current_user.id:
+                raise HTTPException(status_code=403, detail="You can only search your own products")
+            owner_id = current_user.id
+        return json_result(search_products(db, q, min_price, max_price, owner_id, limit, offset))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Products created, updated or deleted since the `next_since` of the previous call, oldest change first
+@router.get("/changes", response_model=ProductChangesPage, response_model_exclude_unset=True)
+def get_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        owner_id = None if current_user.is_admin else current_user.id
+        return json_result(get_product_changes(db, owner_id, since, limit))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Server-Sent Events for product writes in the user's scope (own products, all for admins)
+@router.get("/events")
+async def product_events(current_user: User = Depends(get_current_user)):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        event_hub.check_available()
+        return StreamingResponse(
+            sse_stream(None if current_user.is_admin else current_user.id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Stream all products as NDJSON or CSV, same scope as /all_products
+@router.get("/export")
+def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
         
+        owner_id = None if current_user.is_admin else current_user.id
+        return StreamingResponse(
+            export_chunks(iter_product_batches(owner_id), PRODUCT_FIELDS, format),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f"attachment; filename=products.{format}"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+
+# update the product: one conditional UPDATE ... RETURNING, send back `version` to detect lost updates
+@router.put("/update_product/{product_id}", response_model=ProductResponse, dependencies=[Depends(claim_idempotency_key)])
+def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+    try:
+        if not current_user.is_admin_approved:
+            raise HTTPException(status_code=403, detail="User not approved by admin")
+
+        owner_id = None if current_user.is_admin else current_user.id
+        # name uniqueness is enforced by uq_products_name_live
+        updated = update_product_fields(db, product_id, product_changes(product), current_user.id, owner_id, product.version)
+        if updated is None:
+            raise failed_update_error(get_product_state(db, product_id), owner_id)
+        product_changed(updated.id, updated.owner_id)
+
         return {
-            "data": db_product,
+            "data": updated._asdict(),
             "message": "Product updated successfully",
             "status": "success"
         }
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Product with this name already exists")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 
 # Delete a product
-@router.delete("/delete_product/{product_id}", response_model= DeleteProduct)
+@router.delete("/delete_product/{product_id}", response_model= DeleteProduct, dependencies=[Depends(claim_idempotency_key)])
 def delete_product(product_id: int, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     try:
         if not current_user.is_admin_approved:
@@ -108,11 +249,14 @@ def delete_product(product_id: int, db: Session = Depends(get_db_session), curre
         db_product.deleted_at = datetime.utcnow()
         db.add(db_product)
         db.commit()
+        product_changed(db_product.id, db_product.owner_id, "deleted")
         
         return {
             "message": "Product deleted successfully",
             "status": "success"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -120,11 +264,15 @@ def delete_product(product_id: int, db: Session = Depends(get_db_session), curre
 
 #  Get PArticulre product by ID
 @router.get("/get_product/{product_id}", response_model= ProductCreate)
-def get_product(product_id: int, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+def get_product(product_id: int, request: Request, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     try:
         if not current_user.is_admin_approved:
             raise HTTPException(status_code=403, detail="User not approved by admin")
        
+        cached = cached_product_response(request, current_user, db)
+        if cached is not None:
+            return cached
+
         db_product = db.query(Product).filter(Product.id == product_id).filter(Product.deleted_at.is_(None)).first()
         if not db_product:
             raise HTTPException(status_code=404, detail="Product not found")
@@ -132,7 +280,9 @@ def get_product(product_id: int, db: Session = Depends(get_db_session), current_
         if not current_user.is_admin and db_product.owner_id != current_user.id :
             raise HTTPException(status_code=403, detail="You do not have permission to view this product")
         
-        return db_product
+        return product_response(request, current_user, db_product)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
@@ -1,21 +1,27 @@
 # carte ur routs user_router.py
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from utils.helpers import has_exception
 from sqlalchemy.orm import Session
 from db.session import get_db_session
 from crud.user_crud import (
     create_user,
-    get_all_users,
+    get_users_page,
     get_unapproved_users,
     get_all_admin_approved_users,
 )
-from schemas.user import UserCreate, UserOut, UserWithTokens, LoginRequest, ResponseModel, ApproveUser
+from schemas.user import UserCreate, UserOut, UserWithTokens, LoginRequest, RefreshRequest, ResponseModel, ApproveUser, UserPage
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.serialization import json_result
 from models.user import User
+from utils.profiling import ProfiledRoute
 from models.token import Token
-from services.token_services import create_access_token, create_refresh_token, get_current_user 
+from services.token_services import create_token_pair, session_tokens, rotate_refresh_token, get_current_user, evict_user_from_cache, build_auth_version_bump, STATELESS_AUTH
+from services.token_write_buffer import token_write_buffer
+from services.revocation_service import revoke_tokens
 
 # Create a new APIRouter instance
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # Create a new user
 @router.post("/register", response_model=ResponseModel)
@@ -38,6 +44,8 @@ def create_user_endpoint(user: UserCreate, db: Session = Depends(get_db_session)
             "message": "User created successfully, please wait for admin approval",
             "status": "success"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
@@ -54,27 +62,48 @@ def login_user(login: LoginRequest, db: Session = Depends(get_db_session)):
         if not user.is_admin_approved:
             raise HTTPException(status_code=403, detail="User not approved by admin")
 
-        access_token = create_access_token(data={"sub": user.username, "user_id": user.id})
-        refresh_token = create_refresh_token(data={"sub": user.username, "user_id": user.id})
-
-        # Create Token instance and store in DB
-        token_obj = Token(user_id=user.id, access_token=access_token, refresh_token=refresh_token)
-        db.add(token_obj)
-        db.commit()
-        db.refresh(user)
+        # Create Token instance (a new session) and store in DB, or hand it to the write-behind buffer
+        token_obj = create_token_pair(user)
+        if token_write_buffer.enabled:
+            token_write_buffer.add(token_obj)
+        else:
+            db.add(token_obj)
+        # the token row and a rehashed password (verify_password) are written here, if any
+        if db.new or db.dirty:
+            db.commit()
+            db.refresh(user)
 
         return {
             "data": user,
-            "access_token": access_token,
-            "refresh_token": refresh_token,
+            "access_token": token_obj.access_token,
+            "refresh_token": token_obj.refresh_token,
             "message": "Login successful",
             "status": "success"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# New access + refresh token pair for a refresh token, no password check (rotation: each refresh token works once)
+@router.post("/refresh", response_model=UserWithTokens)
+def refresh_tokens(body: RefreshRequest, db: Session = Depends(get_db_session)):
+    try:
+        user, token_obj = rotate_refresh_token(db, body.refresh_token)
+        return {
+            "data": user,
+            "access_token": token_obj.access_token,
+            "refresh_token": token_obj.refresh_token,
+            "message": "Tokens refreshed",
+            "status": "success"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # approved user by admin
 @router.post("/{user_id}/approve", response_model=ApproveUser)
 def approve_user(user_id: int, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
@@ -95,8 +124,10 @@ def approve_user(user_id: int, db: Session = Depends(get_db_session), current_us
         else:
             user.is_admin_approved = True
         
+        user.auth_version += 1  # cached tokens of the user are re-checked on every worker
         db.commit()
         db.refresh(user)    
+        evict_user_from_cache(user.id)
         
         return {
             "is_admin_approved": user.is_admin_approved,
@@ -107,17 +138,21 @@ def approve_user(user_id: int, db: Session = Depends(get_db_session), current_us
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# get all user for the admin accees this APi 
-@router.get("/all", response_model=list[UserOut])
+# get all user for the admin accees this APi (keyset paginated, ?fields= selects columns)
+@router.get("/all", response_model=UserPage, response_model_exclude_unset=True)
 def get_all_users_endpoint(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db_session),
-    current_user: User = Depends(get_current_user)  
+    current_user: User = Depends(get_current_user)
 ):
     try:
         if not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Admin privileges required")
-        users = get_all_users(db)
-        return users
+        return json_result(get_users_page(db, limit, cursor, fields))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -125,10 +160,18 @@ def get_all_users_endpoint(
 @router.post("/logout", response_model=dict)
 def logout_user(db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     try:
+        # logins not written yet are dropped from the write-behind buffer
+        pending = token_write_buffer.discard_where(lambda token: token.user_id == current_user.id)
+        if STATELESS_AUTH:
+            # tokens are not looked up per request, blacklist their jti instead
+            rows = db.query(Token.access_token, Token.refresh_token).filter(Token.user_id == current_user.id).all()
+            revoke_tokens(db, [token for row in rows for token in row] + session_tokens(pending))
+        
         # Delete all tokens for the current user
         db.query(Token).filter(Token.user_id == current_user.id).delete()
+        db.execute(build_auth_version_bump(current_user.id))
         db.commit()
-        db.refresh(current_user)
+        evict_user_from_cache(current_user.id)
         return {
             "message": "User logged out successfully",
             "status": "success"
@@ -151,7 +194,7 @@ def get_all_approved_users(db: Session = Depends(get_db_session), current_user:
 
 # Get all unapproved users
 @router.get("/unapproved_users", response_model=list[UserOut])
-def get_unapproved_users(db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+def get_unapproved_users_endpoint(db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     try:
         if not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Admin privileges required")
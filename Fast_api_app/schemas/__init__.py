@@ -2,3 +2,4 @@ from .user import *
 from .product import *
 from .token import *
 from .blacklist import *
+from .batch import *
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Any, List, Literal, Optional
+
+# One sub-request of /batch, e.g. {"method": "PUT", "path": "/products/update_product/7", "body": {"price": 10}}
+class BatchOperation(BaseModel):
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"]
+    path: str  # as it would be called, query string included
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    mode: Literal["atomic", "per_op"] = "atomic"
+    operations: List[BatchOperation]
+
+# Status and JSON body the operation would have answered as a request of its own
+class BatchResult(BaseModel):
+    status: int
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    data: List[BatchResult]
+    committed: bool  # atomic: whether the batch's transaction was committed
+    message: str
+    status: str
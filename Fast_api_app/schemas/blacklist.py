@@ -1,8 +1,11 @@
 from pydantic import BaseModel
+from typing import Optional
 from datetime import datetime
 
 class BlacklistedTokenBase(BaseModel):
     token: str
+    jti: Optional[str] = None
+    expires_at: Optional[datetime] = None
 
 class BlacklistedTokenCreate(BlacklistedTokenBase):
     pass
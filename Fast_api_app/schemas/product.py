@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class ProductBase(BaseModel):
@@ -13,6 +13,7 @@ class ProductCreate(ProductBase):
 class ProductOut(ProductBase):
     id: int
     owner_id: int
+    version: int
     created_at: datetime
     updated_at: datetime
     deleted_at: Optional[datetime] = None
@@ -34,3 +35,58 @@ class ProductUpdate(BaseModel):
     name: Optional[str] = None
     price: Optional[int]  = None 
     description: Optional[str]  = None
+    version: Optional[int] = None  # the version that was read, 409 if the product changed since
+
+# Row of a paginated listing, only the fields asked for with ?fields= are set
+class ProductFieldsOut(BaseModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[int] = None
+    owner_id: Optional[int] = None
+    version: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+class ProductPage(BaseModel):
+    data: List[ProductFieldsOut]
+    next_cursor: Optional[str] = None
+
+class ProductSearchHit(ProductOut):
+    rank: float  # relevance, higher is better; 0 without a text query
+
+class ProductSearchPage(BaseModel):
+    data: List[ProductSearchHit]
+    next_offset: Optional[int] = None
+
+# Entry of /products/changes: the whole product, or a tombstone (id, owner_id, updated_at,
+# deleted_at) with deleted=true once it was deleted
+class ProductChange(BaseModel):
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[int] = None
+    owner_id: Optional[int] = None
+    version: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: datetime
+    deleted_at: Optional[datetime] = None
+    deleted: bool
+
+class ProductChangesPage(BaseModel):
+    data: List[ProductChange]
+    next_since: Optional[str] = None
+    has_more: bool
+
+class RejectedRow(BaseModel):
+    row: int
+    name: Optional[str] = None
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    rejected_count: int
+    rejected: List[RejectedRow]
+    message: str
+    status: str
@@ -22,6 +22,22 @@ class UserOut(UserBase):
     class Config:
         from_attributes = True
 
+# Row of a paginated listing, only the fields asked for with ?fields= are set
+class UserFieldsOut(BaseModel):
+    id: Optional[int] = None
+    username: Optional[str] = None
+    email: Optional[EmailStr] = None
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
+    is_admin_approved: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+class UserPage(BaseModel):
+    data: List[UserFieldsOut]
+    next_cursor: Optional[str] = None
+
 class UserWithTokens(BaseModel):
     data: UserOut
     # tokens: List[TokenOut] = []
@@ -36,6 +52,10 @@ class LoginRequest(BaseModel):
     password: str
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class ResponseModel(BaseModel):
     data: UserOut
     message: str
@@ -0,0 +1,224 @@
+"""/batch: many user and product operations in one HTTP round trip.
+
+Each operation is sent through the app's router as a request of its own, so it gets its
+route's usual validation, permission checks, response_model and exception handling. The
+batch authenticates once and shares one DB session: both go on the operation's scope,
+where get_current_user(_async) and get_db / get_async_db pick them up. Each operation
+also takes a token from the caller's admission bucket of its route class.
+
+mode "atomic": the session is joined to an outer transaction with
+join_transaction_mode="create_savepoint", so every db.commit() of an endpoint only
+releases a SAVEPOINT. The first failing operation rolls everything back and the rest
+are not run (424). Cache invalidation and product events wait for the real commit.
+mode "per_op": the endpoints commit as usual. A failing operation is rolled back alone
+and the next one runs.
+"""
+import os
+import json
+from urllib.parse import urlsplit
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import SessionLocal, AsyncSessionLocal, engine, async_engine, BATCH_SESSION
+from schemas.batch import BatchRequest
+from services.product_service import deferred_product_changes, settle_product_changes
+from services.token_services import BATCH_USER
+from utils.admission import charge_operation
+
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", 100))
+
+BATCH_PREFIXES = ("/users/", "/products/")
+# streams, and the routes that issue or drop the very token the batch runs with
+BATCH_EXCLUDED_PATHS = {
+    "/users/login",
+    "/users/register",
+    "/users/refresh",
+    "/users/logout",
+    "/products/events",
+    "/products/export",
+    "/products/bulk_import",
+}
+NOT_RUN = {"status": 424, "body": {"detail": "Not run, an earlier operation failed"}}
+RATE_LIMITED = {"status": 429, "body": {"detail": "Too many requests"}}
+
+
+def check_batch(batch: BatchRequest):
+    if not batch.operations:
+        raise HTTPException(status_code=400, detail="No operations")
+    if len(batch.operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_OPERATIONS} operations per batch")
+
+
+def operation_scope(request: Request, operation, db, user) -> dict:
+    # the batch's own request as if the operation had been sent on its own (auth header included)
+    url = urlsplit(operation.path)
+    headers = [(name, value) for name, value in request.scope["headers"] if name == b"authorization"]
+    headers.append((b"content-type", b"application/json"))
+    scope = {
+        **request.scope,
+        "method": operation.method,
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": headers,
+        "state": {},
+        BATCH_SESSION: db,
+        BATCH_USER: user,
+    }
+    for key in ("db_sessions", "endpoint", "route", "path_params"):
+        scope.pop(key, None)
+    return scope
+
+
+def response_result(status: int, body: bytes) -> dict:
+    if not body:
+        return {"status": status, "body": None}
+    try:
+        return {"status": status, "body": json.loads(body)}
+    except ValueError:
+        return {"status": status, "body": body.decode(errors="replace")}
+
+
+async def run_operation(request: Request, operation, db, user) -> dict:
+    # what the route would have answered: {"status", "body"}
+    if not operation.path.startswith(BATCH_PREFIXES):
+        return {"status": 404, "body": {"detail": "Not Found"}}
+    scope = operation_scope(request, operation, db, user)
+    if scope["path"].rstrip("/") in BATCH_EXCLUDED_PATHS:
+        return {"status": 400, "body": {"detail": f"{scope['path']} cannot be used in a batch"}}
+    if charge_operation(request.scope, scope):
+        return RATE_LIMITED
+
+    body = json.dumps(operation.body).encode() if operation.body is not None else b""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    # the router, not the whole app: the batch request already went through the middleware
+    try:
+        await request.app.router(scope, receive, send)
+    except StarletteHTTPException as e:
+        response = await http_exception_handler(Request(scope, receive), e)
+    except RequestValidationError as e:
+        response = await request_validation_exception_handler(Request(scope, receive), e)
+    except Exception as e:
+        return {"status": 500, "body": {"detail": str(e)}}
+    else:
+        body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body")
+        return response_result(messages[0]["status"], body)
+    return response_result(response.status_code, response.body)
+
+
+def failed(result: dict) -> bool:
+    return result["status"] >= 400
+
+
+def begins_lazily(connection) -> bool:
+    # pysqlite / aiosqlite only send BEGIN before the first DML statement: an endpoint's
+    # SAVEPOINT would open the real transaction and its RELEASE would commit it
+    return connection.dialect.name == "sqlite"
+
+
+def open_atomic_session(user) -> Session:
+    connection = engine.connect()
+    connection.begin()
+    if begins_lazily(connection):
+        connection.exec_driver_sql("BEGIN")
+    db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    db.info["user_id"] = user.id  # read-your-writes once it commits (db/routing.py)
+    return db
+
+
+def close_atomic_session(db: Session, commit: bool):
+    connection = db.bind
+    try:
+        db.close()
+        if commit:
+            connection.commit()
+        else:
+            connection.rollback()
+    finally:
+        connection.close()
+
+
+async def open_atomic_session_async(user) -> AsyncSession:
+    connection = await async_engine.connect()
+    await connection.begin()
+    if begins_lazily(connection):
+        await connection.exec_driver_sql("BEGIN")
+    db = AsyncSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    db.info["user_id"] = user.id
+    return db
+
+
+async def close_atomic_session_async(db: AsyncSession, commit: bool):
+    connection = db.bind
+    try:
+        await db.close()
+        if commit:
+            await connection.commit()
+        else:
+            await connection.rollback()
+    finally:
+        await connection.close()
+
+
+async def run_operations(request: Request, batch: BatchRequest, db, user, rollback) -> list[dict]:
+    # per_op: `rollback` (the session's) after each failed operation
+    results = []
+    for operation in batch.operations:
+        result = await run_operation(request, operation, db, user)
+        results.append(result)
+        if failed(result):
+            if batch.mode == "atomic":
+                results += [NOT_RUN] * (len(batch.operations) - len(results))
+                break
+            await rollback()
+    return results
+
+
+async def run_batch(request: Request, batch: BatchRequest, db: Session, user) -> tuple[list[dict], bool]:
+    # (results, committed); `db` is the request's session, used as is in per_op mode
+    check_batch(batch)
+    if batch.mode == "per_op":
+        return await run_operations(request, batch, db, user, lambda: run_in_threadpool(db.rollback)), True
+
+    atomic_db = await run_in_threadpool(open_atomic_session, user)
+    changes = []
+    token = deferred_product_changes.set(changes)
+    committed = False
+    try:
+        results = await run_operations(request, batch, atomic_db, user, None)
+        committed = not any(failed(result) for result in results)
+    finally:
+        deferred_product_changes.reset(token)
+        await run_in_threadpool(close_atomic_session, atomic_db, committed)
+        settle_product_changes(changes, committed)
+    return results, committed
+
+
+async def run_batch_async(request: Request, batch: BatchRequest, db: AsyncSession, user) -> tuple[list[dict], bool]:
+    check_batch(batch)
+    if batch.mode == "per_op":
+        return await run_operations(request, batch, db, user, db.rollback), True
+
+    atomic_db = await open_atomic_session_async(user)
+    changes = []
+    token = deferred_product_changes.set(changes)
+    committed = False
+    try:
+        results = await run_operations(request, batch, atomic_db, user, None)
+        committed = not any(failed(result) for result in results)
+    finally:
+        deferred_product_changes.reset(token)
+        await close_atomic_session_async(atomic_db, committed)
+        settle_product_changes(changes, committed)
+    return results, committed
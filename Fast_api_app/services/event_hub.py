@@ -0,0 +1,263 @@
+"""Push channel for product changes: Server-Sent Events fed by an in-process fan-out hub.
+
+product_changed() publishes every committed write to the broker, the broker hands it to
+the hub of each worker, the hub copies it into the bounded queue of every subscriber whose
+scope (one owner, or everything for admins) it matches. A subscriber whose queue is full
+is dropped: it gets a final `dropped` event and resyncs through /products/changes.
+
+Brokers: in-process (default, one worker) or a relay every worker connects to
+(EVENT_BROKER_URL=tcp://host:port), a local stand-in for Redis / NATS pub-sub:
+
+    python -m services.event_hub --listen 127.0.0.1:7001
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from utils.metrics import EVENT_SUBSCRIBERS, EVENTS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+EVENT_BROKER_URL = os.getenv("EVENT_BROKER_URL", "")  # "" = in-process, tcp://host:port = relay
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", 1000))  # per worker
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+RELAY_RECONNECT_SECONDS = 1
+RELAY_MAX_BUFFER = 1024 * 1024  # bytes queued for one relay client before it is cut off
+
+
+def product_event(event_type: str, product_id: Optional[int], owner_id: int) -> dict:
+    # product_id is None for bulk imports
+    return {"type": event_type, "id": product_id, "owner_id": owner_id, "at": datetime.utcnow().isoformat()}
+
+
+class Subscription:
+    def __init__(self, owner_id: Optional[int], maxsize: int):
+        self.owner_id = owner_id  # None: every product (admins)
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+        self.closed = False
+
+    def wants(self, event: dict) -> bool:
+        return self.owner_id is None or event["owner_id"] == self.owner_id
+
+    def offer(self, event: dict):
+        if self.dropped or self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # the full queue wakes the consumer, which then sees the flag and stops
+            self.dropped = True
+            EVENTS_DROPPED.inc()
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class LocalBroker:
+    """One worker: published events go straight to its own hub."""
+
+    async def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, event: dict):
+        self.deliver(event)
+
+    async def stop(self):
+        pass
+
+
+class RelayBroker:
+    """Every worker keeps a connection to the relay, which sends each published event
+    (one JSON line) to all of them, the publisher included. While the relay is
+    unreachable events are delivered to this worker only."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.writer = None
+        self._task = None
+
+    async def start(self, deliver):
+        self.deliver = deliver
+        self.loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_connection(self.host, self.port)
+                logger.info("connected to event relay %s:%s", self.host, self.port)
+                async for line in reader:
+                    self.deliver(json.loads(line))
+            except (OSError, ValueError) as e:
+                logger.warning("event relay %s:%s: %s", self.host, self.port, e)
+            self.writer = None
+            await asyncio.sleep(RELAY_RECONNECT_SECONDS)
+
+    def publish(self, event: dict):
+        # any thread: sync handlers publish from the threadpool
+        self.loop.call_soon_threadsafe(self._send, event)
+
+    def _send(self, event: dict):
+        if self.writer is None or self.writer.is_closing():
+            self.deliver(event)
+            return
+        self.writer.write(json.dumps(event).encode() + b"\n")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def make_broker(url: str):
+    if not url:
+        return LocalBroker()
+    if not url.startswith("tcp://"):
+        raise ValueError(f"Unsupported EVENT_BROKER_URL: {url}")
+    host, _, port = url.removeprefix("tcp://").rpartition(":")
+    return RelayBroker(host, int(port))
+
+
+class EventHub:
+    """Subscribers of this worker. Everything but publish() runs on the event loop."""
+
+    def __init__(self, broker, queue_size: int, max_subscribers: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.loop = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        await self.broker.start(self.deliver)
+
+    async def stop(self):
+        await self.broker.stop()
+        self.close_subscribers()
+        self.loop = None
+
+    def close_subscribers(self):
+        for subscription in list(self.subscribers):
+            subscription.close()
+
+    def publish(self, event: dict):
+        if self.loop is not None:
+            self.broker.publish(event)
+
+    def deliver(self, event: dict):
+        # from the broker, on any thread
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: dict):
+        for subscription in self.subscribers:
+            if subscription.wants(event):
+                subscription.offer(event)
+
+    def check_available(self):
+        # called by the route before the response starts, so a refusal is a plain 503
+        if self.loop is None:
+            raise HTTPException(status_code=503, detail="Event stream is not available")
+        if len(self.subscribers) >= self.max_subscribers:
+            raise HTTPException(status_code=503, detail="Too many event subscribers, please retry", headers={"Retry-After": "5"})
+
+    def subscribe(self, owner_id: Optional[int]) -> Subscription:
+        self.check_available()
+        subscription = Subscription(owner_id, self.queue_size)
+        self.subscribers.add(subscription)
+        EVENT_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self.subscribers:
+            self.subscribers.discard(subscription)
+            EVENT_SUBSCRIBERS.dec()
+
+
+event_hub = EventHub(make_broker(EVENT_BROKER_URL), EVENTS_QUEUE_SIZE, EVENTS_MAX_SUBSCRIBERS)
+
+
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def sse_stream(owner_id: Optional[int], heartbeat: float = EVENTS_HEARTBEAT_SECONDS):
+    # ends on client disconnect (Starlette cancels it), shutdown or when the subscriber is dropped.
+    # The subscription lives exactly as long as the stream runs: a stream that never starts
+    # (client gone before the first chunk) never subscribes, and however it ends, cancelled in
+    # queue.get() included, the finally removes it.
+    subscription = event_hub.subscribe(owner_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"  # keeps proxies from closing an idle stream
+                continue
+            if subscription.dropped:
+                yield sse_message("dropped", {"detail": "Too slow, resync with /products/changes"})
+                return
+            if event is None or subscription.closed:
+                return
+            yield sse_message("product", event)
+    finally:
+        event_hub.unsubscribe(subscription)
+
+
+async def run_relay(host: str, port: int):
+    clients = set()
+
+    async def handle(reader, writer):
+        clients.add(writer)
+        try:
+            async for line in reader:
+                for client in list(clients):
+                    # a worker that stopped reading is cut off, it reconnects
+                    if client.transport.get_write_buffer_size() > RELAY_MAX_BUFFER:
+                        clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(line)
+        except OSError:
+            pass
+        finally:
+            clients.discard(writer)
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info("event relay listening on %s:%s", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listen", default="127.0.0.1:7001", help="host:port of the relay")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    host, _, port = args.listen.rpartition(":")
+    try:
+        asyncio.run(run_relay(host, int(port)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
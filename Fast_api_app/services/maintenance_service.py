@@ -0,0 +1,138 @@
+"""Database maintenance: purge expired tokens and blacklist entries, archive old soft-deleted products.
+
+Runs every MAINTENANCE_INTERVAL_SECONDS inside the app (startup task), or once from cron:
+
+    python -m services.maintenance_service --batch-size 1000 --pause 0.1 --archive-after-days 30
+
+Rows go in batches of MAINTENANCE_BATCH_SIZE, one commit per batch and a pause in between,
+so the tables stay writable for logins while a large backlog is cleared.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, and_, delete, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from db.session import SessionLocal
+from models.token import Token
+from models.blacklist import BlacklistedToken
+from models.products import Product
+from models.product_archive import ProductArchive
+from services.token_services import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_MINUTES
+from utils.metrics import MAINTENANCE_ROWS
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", 3600))  # 0 disables the in-process job
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", 1000))
+MAINTENANCE_BATCH_PAUSE_SECONDS = float(os.getenv("MAINTENANCE_BATCH_PAUSE_SECONDS", 0.1))
+ARCHIVE_DELETED_PRODUCTS_DAYS = int(os.getenv("ARCHIVE_DELETED_PRODUCTS_DAYS", 0))  # 0 keeps them in products
+
+# a tokens row is useless once both of its tokens have expired
+TOKEN_LIFETIME = timedelta(minutes=max(ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_MINUTES))
+
+# products_archive columns copied from products, archived_at is set by the job
+ARCHIVED_COLUMNS = [column.name for column in ProductArchive.__table__.columns if column.name != "archived_at"]
+
+
+def expired_token_condition(now: datetime):
+    # rows without created_at cannot be dated and are purged too: at worst that ends a session
+    return or_(Token.created_at < now - TOKEN_LIFETIME, Token.created_at.is_(None))
+
+
+def expired_blacklist_condition(now: datetime):
+    # rows without expires_at (tokens without exp / jti) fall back to the token lifetime;
+    # rows without either are kept, dropping them could make a revoked token valid again
+    return or_(
+        BlacklistedToken.expires_at < now,
+        and_(BlacklistedToken.expires_at.is_(None), BlacklistedToken.created_at < now - TOKEN_LIFETIME),
+    )
+
+
+def build_archive_query(ids: list[int], now: datetime):
+    columns = [Product.__table__.c[name] for name in ARCHIVED_COLUMNS]
+    return insert(ProductArchive).from_select(
+        ARCHIVED_COLUMNS + ["archived_at"],
+        select(*columns, literal(now, DateTime)).where(Product.id.in_(ids)),
+    )
+
+
+def process_in_batches(db: Session, model, condition, batch_size: int, pause: float, archive_at: datetime = None) -> int:
+    # ids first, then one DELETE per batch: portable (no DELETE ... LIMIT) and short transactions.
+    # No ORDER BY: any batch will do, and ordering by id would make SQLite walk the whole table
+    # in rowid order instead of the index on the cutoff column
+    removed = 0
+    while True:
+        ids = db.scalars(select(model.id).where(condition).limit(batch_size)).all()
+        if not ids:
+            break
+        if archive_at is not None:
+            db.execute(build_archive_query(ids, archive_at))
+        db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        removed += len(ids)
+        MAINTENANCE_ROWS.labels(model.__tablename__).inc(len(ids))
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+    return removed
+
+
+def run_maintenance(
+    db: Session,
+    batch_size: int = MAINTENANCE_BATCH_SIZE,
+    pause: float = MAINTENANCE_BATCH_PAUSE_SECONDS,
+    archive_after_days: int = ARCHIVE_DELETED_PRODUCTS_DAYS,
+) -> dict:
+    """One pass over every table, returns the number of rows removed per table."""
+    now = datetime.utcnow()
+    removed = {
+        "tokens": process_in_batches(db, Token, expired_token_condition(now), batch_size, pause),
+        "blacklisted_tokens": process_in_batches(db, BlacklistedToken, expired_blacklist_condition(now), batch_size, pause),
+        "archived_products": 0,
+    }
+    if archive_after_days > 0:
+        # already invisible to every endpoint, the search index and the response cache
+        condition = Product.deleted_at < now - timedelta(days=archive_after_days)
+        removed["archived_products"] = process_in_batches(db, Product, condition, batch_size, pause, archive_at=now)
+    return removed
+
+
+def run_maintenance_once(**options) -> dict:
+    db = SessionLocal()
+    try:
+        removed = run_maintenance(db, **options)
+    finally:
+        db.close()
+    logger.info("maintenance: %s", ", ".join(f"{count} {name}" for name, count in removed.items()))
+    return removed
+
+
+async def run_maintenance_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(run_maintenance_once)
+        except Exception:
+            logger.exception("maintenance pass failed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=MAINTENANCE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=MAINTENANCE_BATCH_PAUSE_SECONDS, help="seconds between batches")
+    parser.add_argument("--archive-after-days", type=int, default=ARCHIVE_DELETED_PRODUCTS_DAYS,
+                        help="move products soft-deleted this long ago to products_archive (0 = off)")
+    args = parser.parse_args(argv)
+
+    removed = run_maintenance_once(batch_size=args.batch_size, pause=args.pause, archive_after_days=args.archive_after_days)
+    for name, count in removed.items():
+        print(f"{name}: {count}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# bcrypt hashing/verification in a dedicated process pool
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from utils.metrics import PASSWORD_POOL_PENDING, PASSWORD_POOL_REJECTED
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", os.cpu_count() or 1))  # 0 runs inline
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", 64))
+
+# Hashes made with a different cost are reported by verify_and_update and rehashed
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# These run inside the worker processes, keep them top level so they can be pickled
+def hash_password(raw_password: str) -> str:
+    return pwd_context.hash(raw_password)
+
+def verify_password(raw_password: str, hashed_password: str) -> tuple[bool, str]:
+    # (is_valid, new_hash or None when no rehash is needed)
+    return pwd_context.verify_and_update(raw_password, hashed_password)
+
+
+class PasswordPool:
+    """Bounded ProcessPoolExecutor, fails fast with 503 when too much work is queued.
+
+    A worker process that dies breaks its executor for good: the pool then starts a new
+    one and runs the job once more, so logins keep working without a restart."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: a forked child would copy the app's threads' held locks
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        # the executor to use instead of the broken one, started once by whichever thread comes first
+        with self._lock:
+            if self._executor is executor:
+                logger.warning("password pool worker died, starting a new pool")
+                self._executor = None
+                executor.shutdown(wait=False)
+            return self._get_executor()
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self.pending -= 1
+        PASSWORD_POOL_PENDING.dec()
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            return self._replace_broken(executor).submit(fn, *args)
+
+    def _start(self, fn, args, limit: bool) -> Future:
+        with self._lock:
+            if limit and self.pending >= self.max_pending:
+                PASSWORD_POOL_REJECTED.inc()
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        PASSWORD_POOL_PENDING.inc()
+        try:
+            future = self._submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def submit(self, fn, *args) -> Future:
+        return self._start(fn, args, limit=True)
+
+    def _retry(self, fn, args) -> Future:
+        # its worker died while running it: once more on the new pool, the job was already admitted
+        # (and its slot may not be released yet when result() raises)
+        return self._start(fn, args, limit=False)
+
+    def run(self, fn, *args):
+        # for sync handlers: blocks the calling thread, not the GIL
+        if self.workers <= 0:
+            return fn(*args)
+        try:
+            return self.submit(fn, *args).result()
+        except BrokenProcessPool:
+            return self._retry(fn, args).result()
+
+    async def run_async(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        try:
+            return await asyncio.wrap_future(self.submit(fn, *args))
+        except BrokenProcessPool:
+            return await asyncio.wrap_future(self._retry(fn, args))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_pool = PasswordPool(PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING)
@@ -0,0 +1,275 @@
+import os
+import csv
+import io
+import json
+import tempfile
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, Request, Response
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from schemas.product import ProductCreate, ProductPage, ProductUpdate
+from crud.product_crud import (
+    CHANGES_SETTLE_SECONDS,
+    build_product_version_query,
+    build_products_version_query,
+    bulk_create_products,
+    bulk_create_products_async,
+)
+from utils.response_cache import ResponseCache, weak_etag
+from utils.serialization import FAST_JSON, dumps
+from services.search_service import search_index
+from services.event_hub import event_hub, product_event
+
+# ?format= of /products/export -> response media type
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_batch(rows: list, fields: list[str], format: str) -> str:
+    # one chunk of the export body for a batch of rows
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([[_csv_value(getattr(row, field)) for field in fields] for row in rows])
+        return buffer.getvalue()
+    return "".join(json.dumps(row._asdict(), default=_json_default) + "\n" for row in rows)
+
+
+def export_chunks(batches, fields: list[str], format: str):
+    if format == "csv":
+        yield ",".join(fields) + "\r\n"
+    for rows in batches:
+        yield encode_batch(rows, fields, format)
+
+
+async def export_chunks_async(batches, fields: list[str], format: str):
+    if format == "csv":
+        yield ",".join(fields) + "\r\n"
+    async for rows in batches:
+        yield encode_batch(rows, fields, format)
+
+
+BULK_IMPORT_CHUNK_SIZE = 1000
+MAX_IMPORT_CHUNK_SIZE = 10000
+MAX_REPORTED_REJECTIONS = 1000
+UPLOAD_SPOOL_BYTES = 8 * 1024 * 1024  # bigger uploads spill to a temp file
+
+
+async def spool_upload(request: Request):
+    # Read the streamed body without holding it all in memory
+    upload = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    async for chunk in request.stream():
+        upload.write(chunk)
+    upload.seek(0)
+    return upload
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors())
+
+
+def iter_import_records(upload, format: str):
+    # (row number, raw dict or None, parse error or None)
+    text = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+    for row, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Expected a JSON object"
+            continue
+        yield row, record, None
+
+
+def iter_import_chunks(upload, format: str, chunk_size: int):
+    # lists of ((row, ProductCreate) valid rows, rejected rows), chunk_size valid rows at most
+    products, rejected = [], []
+    for row, record, error in iter_import_records(upload, format):
+        if record is not None:
+            if record.get("description") == "":
+                record["description"] = None
+            try:
+                products.append((row, ProductCreate.model_validate(record)))
+            except ValidationError as e:
+                error = _validation_message(e)
+        if error:
+            rejected.append({"row": row, "name": (record or {}).get("name"), "error": error})
+        if len(products) >= chunk_size:
+            yield products, rejected
+            products, rejected = [], []
+    if products or rejected:
+        yield products, rejected
+
+
+def _import_summary(inserted: int, rejected: list[dict], rejected_count: int) -> dict:
+    return {
+        "inserted": inserted,
+        "rejected_count": rejected_count,
+        "rejected": rejected,
+        "message": f"{inserted} products imported, {rejected_count} rejected",
+        "status": "success",
+    }
+
+
+def import_products(db: Session, upload, format: str, chunk_size: int, owner_id: int) -> dict:
+    inserted, rejected_count, rejected, seen_names = 0, 0, [], set()
+    for products, chunk_rejected in iter_import_chunks(upload, format, chunk_size):
+        if products:
+            count, duplicates = bulk_create_products(db, products, owner_id, seen_names)
+            db.commit()  # one commit per chunk
+            product_changed(None, owner_id, "imported")
+            inserted += count
+            chunk_rejected = sorted(chunk_rejected + duplicates, key=lambda item: item["row"])
+        rejected_count += len(chunk_rejected)
+        rejected.extend(chunk_rejected[:MAX_REPORTED_REJECTIONS - len(rejected)])
+    return _import_summary(inserted, rejected, rejected_count)
+
+
+async def import_products_async(db: AsyncSession, upload, format: str, chunk_size: int, owner_id: int) -> dict:
+    inserted, rejected_count, rejected, seen_names = 0, 0, [], set()
+    # parsing and validating a chunk is CPU work: it runs in the threadpool, the inserts on the loop
+    chunks = iter_import_chunks(upload, format, chunk_size)
+    while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+        products, chunk_rejected = chunk
+        if products:
+            count, duplicates = await bulk_create_products_async(db, products, owner_id, seen_names)
+            await db.commit()
+            product_changed(None, owner_id, "imported")
+            inserted += count
+            chunk_rejected = sorted(chunk_rejected + duplicates, key=lambda item: item["row"])
+        rejected_count += len(chunk_rejected)
+        rejected.extend(chunk_rejected[:MAX_REPORTED_REJECTIONS - len(rejected)])
+    return _import_summary(inserted, rejected, rejected_count)
+
+
+def resolve_import_format(format: Optional[str], content_type: Optional[str]) -> str:
+    if format:
+        return format
+    return "csv" if content_type and "csv" in content_type else "ndjson"
+
+
+# update_product: same rules as before, empty / zero values leave the column unchanged
+def product_changes(product: ProductUpdate) -> dict:
+    return {field: value for field, value in product.model_dump(exclude={"version"}).items() if value}
+
+
+def failed_update_error(current, owner_id: Optional[int]) -> HTTPException:
+    # why the conditional UPDATE matched no row; current is (owner_id, version) or None
+    if current is None:
+        return HTTPException(status_code=404, detail="Product not found")
+    if owner_id is not None and current.owner_id != owner_id:
+        return HTTPException(status_code=403, detail="You do not have permission to update this product")
+    return HTTPException(
+        status_code=409,
+        detail=f"Product was modified by someone else, current version is {current.version}",
+    )
+
+
+# Response cache for product reads, dropped by every write that touches the product or its owner
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 4096))  # 0 disables it
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 60))
+
+product_response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+
+
+def product_cache_scope(user) -> Optional[int]:
+    # what the user may read: admins every product, everyone else their own
+    return None if user.is_admin else user.id
+
+
+def cache_version_query(request: Request, user):
+    product_id = request.path_params.get("product_id")
+    if product_id is not None:
+        return build_product_version_query(int(product_id))
+    return build_products_version_query(product_cache_scope(user))
+
+
+def lookup_product_response(request: Request, user, version) -> Optional[Response]:
+    # Only data whose last write is CHANGES_SETTLE_SECONDS old is cached: a write still
+    # committing then cannot land with an updated_at below the version it was stored under
+    # (the same bound as the changes feed)
+    settled = version is None or version <= datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+    return product_response_cache.lookup(request, product_cache_scope(user), version, cacheable=settled)
+
+
+def cached_product_response(request: Request, user, db: Session) -> Optional[Response]:
+    # cached body, or a 304 when If-None-Match still matches; None on a miss or a stale entry
+    return lookup_product_response(request, user, db.scalar(cache_version_query(request, user)))
+
+
+async def cached_product_response_async(request: Request, user, db: AsyncSession) -> Optional[Response]:
+    return lookup_product_response(request, user, await db.scalar(cache_version_query(request, user)))
+
+
+PRODUCT_BODY_FIELDS = list(ProductCreate.model_fields)
+
+
+def product_response(request: Request, user, db_product) -> Response:
+    if FAST_JSON:
+        body = dumps({field: getattr(db_product, field) for field in PRODUCT_BODY_FIELDS})
+    else:
+        body = ProductCreate.model_validate(db_product, from_attributes=True).model_dump_json().encode()
+    etag = weak_etag(db_product.id, db_product.updated_at)
+    return product_response_cache.store(request, product_cache_scope(user), body, etag, {("product", db_product.id)})
+
+
+def product_page_response(request: Request, user, page: dict) -> Response:
+    scope = product_cache_scope(user)
+    if FAST_JSON:
+        body = dumps(page)  # rows from build_page already have the ProductPage shape
+    else:
+        body = ProductPage.model_validate(page).model_dump_json(exclude_unset=True).encode()
+    return product_response_cache.store(request, scope, body, weak_etag(body), {("owner", scope)})
+
+
+# Set while an all-or-nothing /batch runs: its "commits" are savepoints, so product_changed()
+# only records the change and settle_product_changes() handles them once the batch ends
+deferred_product_changes: ContextVar[Optional[list]] = ContextVar("deferred_product_changes", default=None)
+
+
+def product_changed(product_id: Optional[int], owner_id: int, event_type: str = "updated"):
+    # after every committed product write; product_id is None for bulk inserts
+    # drop the cached product, its owner's listings and the admin listings
+    product_response_cache.invalidate(("product", product_id), ("owner", owner_id), ("owner", None))
+    deferred = deferred_product_changes.get()
+    if deferred is not None:
+        deferred.append((product_id, owner_id, event_type))
+        return
+    search_index.mark_dirty(product_id)
+    # push it to /products/events subscribers (created | updated | deleted | imported)
+    event_hub.publish(product_event(event_type, product_id, owner_id))
+
+
+def settle_product_changes(changes: list, committed: bool):
+    # the changes recorded during an all-or-nothing /batch
+    for product_id, owner_id, event_type in changes:
+        if committed:
+            product_changed(product_id, owner_id, event_type)
+        else:
+            # reads later in the batch may have cached the rolled back rows
+            product_response_cache.invalidate(("product", product_id), ("owner", owner_id), ("owner", None))
@@ -0,0 +1,139 @@
+# In-memory revocation filter for stateless JWT auth (STATELESS_AUTH=true)
+import os
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from jose import jwt
+from jose.exceptions import JWTError
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from models.blacklist import BlacklistedToken
+from db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# created_at is stamped before the row's transaction commits, and by the clock of the worker
+# that wrote it: each sync re-reads this much before the newest row seen (slower commits or
+# larger clock skew between workers are missed until a restart)
+REVOCATION_SYNC_OVERLAP_SECONDS = float(os.getenv("REVOCATION_SYNC_OVERLAP_SECONDS", 60))
+
+
+class RevocationFilter:
+    """Set of revoked token ids (jti) kept until the token would have expired anyway."""
+
+    def __init__(self, overlap: float = REVOCATION_SYNC_OVERLAP_SECONDS):
+        self._revoked = {}       # jti -> exp (unix timestamp, None = never expires)
+        self._last_seen = None   # newest blacklisted_tokens.created_at already loaded
+        self.overlap = timedelta(seconds=overlap)
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def add(self, jti: str, exp: float = None):
+        with self._lock:
+            self._revoked[jti] = exp
+
+    def prune(self) -> int:
+        # Expired tokens fail signature/exp checks anyway, no need to remember them
+        now = time.time()
+        with self._lock:
+            expired = [jti for jti, exp in self._revoked.items() if exp is not None and exp <= now]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(expired)
+
+    def load(self, db: Session) -> int:
+        # Incremental: rows added since the previous load (by any worker), overlap included.
+        # Not by id: a row committed late can have a lower id than rows already loaded.
+        query = (
+            select(BlacklistedToken.jti, BlacklistedToken.expires_at, BlacklistedToken.created_at)
+            .where(BlacklistedToken.jti.is_not(None))
+            .where(or_(BlacklistedToken.expires_at.is_(None), BlacklistedToken.expires_at > datetime.utcnow()))
+        )
+        if self._last_seen is not None:
+            query = query.where(BlacklistedToken.created_at > self._last_seen - self.overlap)
+        added = 0
+        for row in db.execute(query).all():
+            if row.jti not in self._revoked:
+                self.add(row.jti, row.expires_at.timestamp() if row.expires_at else None)
+                added += 1
+            if row.created_at is not None and (self._last_seen is None or row.created_at > self._last_seen):
+                self._last_seen = row.created_at
+        self.prune()
+        return added
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+revocation_filter = RevocationFilter()
+
+
+def get_unverified_claims(token: str) -> dict:
+    try:
+        return jwt.get_unverified_claims(token)
+    except JWTError:
+        return {}
+
+
+def build_blacklist_rows(tokens: list[str]) -> list[BlacklistedToken]:
+    rows = []
+    for token in tokens:
+        claims = get_unverified_claims(token)
+        if "jti" not in claims:
+            continue
+        exp = claims.get("exp")
+        rows.append(BlacklistedToken(
+            token=token,
+            jti=claims["jti"],
+            expires_at=datetime.utcfromtimestamp(exp) if exp else None,
+        ))
+    return rows
+
+
+def revoke_tokens(db: Session, tokens: list[str]) -> int:
+    """Blacklist the given tokens and add them to the local filter. Caller commits."""
+    rows = build_blacklist_rows(tokens)
+    if not rows:
+        return 0
+    already = set(db.scalars(select(BlacklistedToken.jti).where(BlacklistedToken.jti.in_([row.jti for row in rows]))))
+    rows = [row for row in rows if row.jti not in already]
+    db.add_all(rows)
+    for row in rows:
+        revocation_filter.add(row.jti, row.expires_at.timestamp() if row.expires_at else None)
+    return len(rows)
+
+
+async def revoke_tokens_async(db: AsyncSession, tokens: list[str]) -> int:
+    rows = build_blacklist_rows(tokens)
+    if not rows:
+        return 0
+    already = set(await db.scalars(select(BlacklistedToken.jti).where(BlacklistedToken.jti.in_([row.jti for row in rows]))))
+    rows = [row for row in rows if row.jti not in already]
+    db.add_all(rows)
+    for row in rows:
+        revocation_filter.add(row.jti, row.expires_at.timestamp() if row.expires_at else None)
+    return len(rows)
+
+
+def load_revocation_filter() -> int:
+    db = SessionLocal()
+    try:
+        return revocation_filter.load(db)
+    finally:
+        db.close()
+
+
+async def sync_revocation_filter(interval: float):
+    # Picks up tokens revoked by other workers
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(load_revocation_filter)
+        except Exception:
+            logger.exception("Failed to sync revoked tokens")
@@ -0,0 +1,237 @@
+# Product search: SQLite FTS5 / PostgreSQL tsvector index, in-process inverted index elsewhere
+import os
+import re
+import math
+import threading
+from collections import Counter
+from typing import Optional
+from sqlalchemy import column, func, inspect, literal, literal_column, or_, select, table
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.products import Product
+from crud.product_crud import PRODUCT_FIELDS
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")  # auto | fts5 | postgres | memory
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_OFFSET = 10000
+NAME_WEIGHT = 10.0  # a match in the name counts as much as this many in the description
+
+TOKEN_RE = re.compile(r"\w+")
+PRODUCTS_FTS = table("products_fts", column("rowid"))
+TS_CONFIG = literal_column("'english'::regconfig")  # same configuration as the search_vector column
+
+
+def tokenize(value: Optional[str]) -> list[str]:
+    return TOKEN_RE.findall(value.lower()) if value else []
+
+
+_backend = None
+
+
+def detect_search_backend(engine) -> str:
+    # the index created by models/product_search.py or migration 0004, else the in-process one
+    global _backend
+    if SEARCH_BACKEND != "auto":
+        _backend = SEARCH_BACKEND
+    elif engine.dialect.name == "sqlite" and inspect(engine).has_table("products_fts"):
+        _backend = "fts5"
+    elif engine.dialect.name == "postgresql" and "search_vector" in {c["name"] for c in inspect(engine).get_columns("products")}:
+        _backend = "postgres"
+    else:
+        _backend = "memory"
+    return _backend
+
+
+def get_search_backend() -> str:
+    if _backend is None:
+        from db.session import engine
+        return detect_search_backend(engine)
+    return _backend
+
+
+class InvertedIndex:
+    """BM25 over name + description of the live products, for databases without full-text search.
+
+    Writes only mark products dirty (services.product_service.product_changed); each search
+    first reloads the dirty rows and every row above the highest id seen so far, so the index
+    follows creates, bulk imports, updates and soft-deletes incrementally. Process local."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = {}      # term -> {product_id: weighted term frequency}
+        self.docs = {}          # product_id -> (terms, length, price, owner_id)
+        self.total_length = 0.0
+        self.dirty = set()
+        self.max_id = 0
+        self._lock = threading.Lock()
+
+    def mark_dirty(self, product_id: Optional[int]):
+        # None: new rows only, the max_id scan picks them up
+        if product_id is not None:
+            with self._lock:
+                self.dirty.add(product_id)
+
+    def take_pending(self) -> tuple[set, int]:
+        with self._lock:
+            ids, self.dirty = self.dirty, set()
+            return ids, self.max_id
+
+    def restore_pending(self, ids: set):
+        with self._lock:
+            self.dirty |= ids
+
+    def build_sync_query(self, ids: set, max_id: int):
+        condition = Product.id > max_id
+        if ids:
+            condition = or_(condition, Product.id.in_(ids))
+        return select(
+            Product.id, Product.name, Product.description, Product.price, Product.owner_id, Product.deleted_at,
+        ).where(condition)
+
+    def apply(self, ids: set, rows: list):
+        with self._lock:
+            for row in rows:
+                self._remove(row.id)
+                if row.deleted_at is None:
+                    self._add(row)
+                self.max_id = max(self.max_id, row.id)
+            for product_id in ids - {row.id for row in rows}:
+                self._remove(product_id)
+
+    def _add(self, row):
+        terms = Counter()
+        for term in tokenize(row.name):
+            terms[term] += NAME_WEIGHT
+        for term in tokenize(row.description):
+            terms[term] += 1
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[row.id] = frequency
+        length = sum(terms.values())
+        self.docs[row.id] = (tuple(terms), length, row.price, row.owner_id)
+        self.total_length += length
+
+    def _remove(self, product_id: int):
+        doc = self.docs.pop(product_id, None)
+        if doc is None:
+            return
+        terms, length, _, _ = doc
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= length
+
+    def search(self, terms: list[str], min_price=None, max_price=None, owner_id=None) -> list[tuple[int, float]]:
+        # every term must match, best score first
+        with self._lock:
+            postings = [self.postings.get(term) for term in set(terms)]
+            if not postings or not all(postings):
+                return []
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            count = len(self.docs)
+            average_length = self.total_length / count
+            idf = [math.log(1 + (count - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+            results = []
+            for product_id in candidates:
+                _, length, price, owner = self.docs[product_id]
+                if (min_price is not None and price < min_price) or (max_price is not None and price > max_price):
+                    continue
+                if owner_id is not None and owner != owner_id:
+                    continue
+                norm = self.K1 * (1 - self.B + self.B * length / average_length)
+                score = sum(
+                    weight * p[product_id] * (self.K1 + 1) / (p[product_id] + norm)
+                    for weight, p in zip(idf, postings)
+                )
+                results.append((product_id, score))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results
+
+
+search_index = InvertedIndex()
+
+
+def search_filters(min_price: Optional[int], max_price: Optional[int], owner_id: Optional[int]) -> list:
+    filters = [Product.deleted_at.is_(None)]
+    if min_price is not None:
+        filters.append(Product.price >= min_price)
+    if max_price is not None:
+        filters.append(Product.price <= max_price)
+    if owner_id is not None:
+        filters.append(Product.owner_id == owner_id)
+    return filters
+
+
+def build_search_query(backend: str, terms: list[str], filters: list, limit: int, offset: int):
+    # one page (+1 row to detect more) ranked by relevance; without terms newest first
+    columns = [getattr(Product, field) for field in PRODUCT_FIELDS]
+    if not terms:
+        query = select(*columns, literal(0.0).label("rank")).where(*filters).order_by(Product.created_at.desc(), Product.id.desc())
+    elif backend == "fts5":
+        bm25 = func.bm25(literal_column("products_fts"), NAME_WEIGHT, 1.0)  # lower is better
+        match = " ".join(f'"{term}"' for term in terms)
+        query = (
+            select(*columns, (-bm25).label("rank"))
+            .select_from(Product.__table__.join(PRODUCTS_FTS, PRODUCTS_FTS.c.rowid == Product.id))
+            .where(literal_column("products_fts").op("MATCH")(match), *filters)
+            .order_by(bm25, Product.id)
+        )
+    else:
+        vector = literal_column("products.search_vector")
+        tsquery = func.plainto_tsquery(TS_CONFIG, " ".join(terms))
+        rank = func.ts_rank(vector, tsquery)
+        query = select(*columns, rank.label("rank")).where(vector.op("@@")(tsquery), *filters).order_by(rank.desc(), Product.id)
+    return query.limit(limit + 1).offset(offset)
+
+
+def build_rows_query(ids: list[int]):
+    columns = [getattr(Product, field) for field in PRODUCT_FIELDS]
+    return select(*columns).where(Product.id.in_(ids), Product.deleted_at.is_(None))
+
+
+def ranked_hits(ranked: list, rows: list) -> list[dict]:
+    by_id = {row.id: row for row in rows}
+    return [{**by_id[product_id]._asdict(), "rank": score} for product_id, score in ranked if product_id in by_id]
+
+
+def build_search_page(hits: list[dict], limit: int, offset: int) -> dict:
+    return {"data": hits[:limit], "next_offset": offset + limit if len(hits) > limit else None}
+
+
+def search_products(db: Session, q: Optional[str], min_price: Optional[int], max_price: Optional[int], owner_id: Optional[int], limit: int, offset: int) -> dict:
+    backend, terms = get_search_backend(), tokenize(q)
+    if backend != "memory" or not terms:
+        rows = db.execute(build_search_query(backend, terms, search_filters(min_price, max_price, owner_id), limit, offset)).all()
+        return build_search_page([row._asdict() for row in rows], limit, offset)
+
+    ids, max_id = search_index.take_pending()
+    try:
+        search_index.apply(ids, db.execute(search_index.build_sync_query(ids, max_id)).all())
+    except Exception:
+        search_index.restore_pending(ids)
+        raise
+    ranked = search_index.search(terms, min_price, max_price, owner_id)[offset:offset + limit + 1]
+    rows = db.execute(build_rows_query([product_id for product_id, _ in ranked])).all() if ranked else []
+    return build_search_page(ranked_hits(ranked, rows), limit, offset)
+
+
+async def search_products_async(db: AsyncSession, q: Optional[str], min_price: Optional[int], max_price: Optional[int], owner_id: Optional[int], limit: int, offset: int) -> dict:
+    backend, terms = get_search_backend(), tokenize(q)
+    if backend != "memory" or not terms:
+        rows = (await db.execute(build_search_query(backend, terms, search_filters(min_price, max_price, owner_id), limit, offset))).all()
+        return build_search_page([row._asdict() for row in rows], limit, offset)
+
+    ids, max_id = search_index.take_pending()
+    try:
+        search_index.apply(ids, (await db.execute(search_index.build_sync_query(ids, max_id))).all())
+    except Exception:
+        search_index.restore_pending(ids)
+        raise
+    ranked = search_index.search(terms, min_price, max_price, owner_id)[offset:offset + limit + 1]
+    rows = (await db.execute(build_rows_query([product_id for product_id, _ in ranked]))).all() if ranked else []
+    return build_search_page(ranked_hits(ranked, rows), limit, offset)
@@ -1,14 +1,29 @@
 import os
+import time
+import hashlib
+import logging
+import uuid
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
 from dotenv import load_dotenv
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import select, delete, update
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
 from models.user import User
 from models.token import Token
-from db.session import get_db_session
+from models.blacklist import BlacklistedToken
+from schemas.user import UserOut
+from db.session import get_db_session, get_async_db_session
+from utils.cache import TTLCache
+from utils.profiling import profiled
+from services.revocation_service import revocation_filter, revoke_tokens, revoke_tokens_async
+from services.token_write_buffer import token_write_buffer
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -18,17 +33,40 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
 REFRESH_TOKEN_EXPIRE_MINUTES = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", 1440))  # 1 day default
 SECRET_KEY = os.getenv("SECRET_KEY", "testsecretkey")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 1024))  # 0 disables the cache
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+# Trust signature + exp and check revocation in memory instead of the tokens table
+STATELESS_AUTH = os.getenv("STATELESS_AUTH", "false").lower() == "true"
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", 5))
+# How long a stateless cache hit is trusted without reading the user (see get_stateless_user)
+STATELESS_AUTH_CACHE_TTL_SECONDS = float(os.getenv("STATELESS_AUTH_CACHE_TTL_SECONDS", 5))
+
+# token digest -> (UserOut snapshot of the authenticated user, users.auth_version it was read at).
+# Process local: a hit is only trusted while users.auth_version is unchanged, and every
+# logout / refresh / approval change bumps it, so the other workers see those right away.
+auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
 
 def create_access_token(data: dict):
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    data.update({"exp": expire})
+    data.update({"exp": expire, "jti": uuid.uuid4().hex, "type": "access"})
     return jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(data: dict):
     expire = datetime.now(timezone.utc) + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
-    data.update({"exp": expire})
+    data.update({"exp": expire, "jti": uuid.uuid4().hex, "type": "refresh"})
     return jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_token_pair(user: User, session_id: str = None) -> Token:
+    # Token row for a login (new session) or a refresh (same session_id); caller adds and commits
+    session_id = session_id or uuid.uuid4().hex
+    claims = {"sub": user.username, "user_id": user.id, "sid": session_id}
+    return Token(
+        user_id=user.id,
+        session_id=session_id,
+        access_token=create_access_token(dict(claims)),
+        refresh_token=create_refresh_token(dict(claims)),
+    )
+
 def decode_jwt_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -42,14 +80,132 @@ def decode_jwt_token(token: str):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db_session)) -> User:
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def cache_user(token: str, user: User, payload: dict, max_age: float = None) -> UserOut:
+    # detached snapshot, safe to share between requests and sessions
+    snapshot = UserOut.model_validate(user)
+    # never keep an entry past the token's own expiry
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    if max_age is not None:
+        ttl = max_age if ttl is None else min(ttl, max_age)
+    auth_cache.set(token_digest(token), (snapshot, user.auth_version), ttl=ttl)
+    return snapshot
+
+def evict_user_from_cache(user_id: int) -> int:
+    return auth_cache.evict_where(lambda entry: entry[0].id == user_id)
+
+def build_auth_version_bump(user_id: int):
+    # drops the user's cached tokens on every worker; caller commits (updated_at is left alone)
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values(auth_version=User.auth_version + 1, updated_at=User.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+# Auth reads go to the primary even in GET requests: a lagging replica would hide a logout,
+# refresh or approval change made through another worker (db/routing.py)
+def build_auth_version_query(user_id: int):
+    return select(User.auth_version).where(User.id == user_id).execution_options(read_primary=True)
+
+def build_auth_user_query(user_id: int):
+    return select(User).where(User.id == user_id).execution_options(read_primary=True)
+
+def get_cached_user(token: str, db: Session):
+    # primary key lookup instead of the token and user queries; None when the entry is stale
+    entry = auth_cache.get(token_digest(token))
+    if entry is None:
+        return None
+    user, auth_version = entry
+    if db.scalar(build_auth_version_query(user.id)) != auth_version:
+        auth_cache.pop(token_digest(token))
+        return None
+    return user
+
+async def get_cached_user_async(token: str, db: AsyncSession):
+    entry = auth_cache.get(token_digest(token))
+    if entry is None:
+        return None
+    user, auth_version = entry
+    if await db.scalar(build_auth_version_query(user.id)) != auth_version:
+        auth_cache.pop(token_digest(token))
+        return None
+    return user
+
+def verify_stateless_token(token: str) -> dict:
+    payload = decode_jwt_token(token)
+
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    if "user_id" not in payload or "jti" not in payload:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+    if revocation_filter.is_revoked(payload["jti"]):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+
+    return payload
+
+# STATELESS_AUTH: no tokens table lookup, the user is read only on a cache miss.
+# A hit is not checked against the database, so changes made through another worker apply
+# late, by at most:
+#   logout / refresh (revoked jti)             REVOCATION_SYNC_SECONDS, the revocation filter sync
+#   unapproval, deleted user, auth_version     STATELESS_AUTH_CACHE_TTL_SECONDS, the cache entry's age
+# The worker that makes the change evicts its own entries and applies it at once.
+def get_stateless_user(token: str, db: Session) -> UserOut:
+    payload = verify_stateless_token(token)
+
+    cached = auth_cache.get(token_digest(token))
+    if cached:
+        return cached[0]
+
+    user = db.scalar(build_auth_user_query(payload["user_id"]))
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    return cache_user(token, user, payload, max_age=STATELESS_AUTH_CACHE_TTL_SECONDS)
+
+async def get_stateless_user_async(token: str, db: AsyncSession) -> UserOut:
+    payload = verify_stateless_token(token)
+
+    cached = auth_cache.get(token_digest(token))
+    if cached:
+        return cached[0]
+
+    user = await db.scalar(build_auth_user_query(payload["user_id"]))
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    return cache_user(token, user, payload, max_age=STATELESS_AUTH_CACHE_TTL_SECONDS)
+
+# /batch authenticates once and puts the user on the scope of each of its operations
+BATCH_USER = "batch_user"
+
+@profiled("auth")
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db_session)) -> UserOut:
+    user = request.scope.get(BATCH_USER) or authenticate_token(token, db)
+    # keeps this user's reads on the primary right after their own writes, see db/routing.py
+    db.info["user_id"] = user.id
+    return user
+
+def authenticate_token(token: str, db: Session) -> UserOut:
     
     try:
         if not token:
             raise HTTPException(status_code=401, detail="Not authenticated")
         
+        if STATELESS_AUTH:
+            return get_stateless_user(token, db)
+        
+        cached_user = get_cached_user(token, db)
+        if cached_user:
+            return cached_user
+        
         token_exist = db.query(Token).filter((Token.access_token == token) | (Token.refresh_token == token)).first()
-        if not token_exist:
+        # fresh logins may still wait in the write-behind buffer
+        if not token_exist and not token_write_buffer.contains(token):
             raise HTTPException(status_code=401, detail="Invalid token")
         
         payload = decode_jwt_token(token)
@@ -60,16 +216,177 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         if "user_id" not in payload:
             raise HTTPException(status_code=401, detail="Invalid token payload")
         
-        user = db.query(User).filter(User.id == payload["user_id"]).first()
+        user = db.scalar(build_auth_user_query(payload["user_id"]))
         
         if not user:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        return user
+        return cache_user(token, user, payload)
     
     except HTTPException as e:
         raise  HTTPException(status_code=e.status_code, detail=e.detail)
 
+# async version of get_current_user used by the async routers
+@profiled("auth")
+async def get_current_user_async(request: Request, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db_session)) -> UserOut:
+    user = request.scope.get(BATCH_USER) or await authenticate_token_async(token, db)
+    db.info["user_id"] = user.id
+    return user
+
+async def authenticate_token_async(token: str, db: AsyncSession) -> UserOut:
+
+    try:
+        if not token:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+        if STATELESS_AUTH:
+            return await get_stateless_user_async(token, db)
+
+        cached_user = await get_cached_user_async(token, db)
+        if cached_user:
+            return cached_user
+
+        token_exist = await db.scalar(select(Token.id).where((Token.access_token == token) | (Token.refresh_token == token)))
+        if not token_exist and not token_write_buffer.contains(token):
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        payload = decode_jwt_token(token)
+
+        if not payload:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        if "user_id" not in payload:
+            raise HTTPException(status_code=401, detail="Invalid token payload")
+
+        user = await db.scalar(build_auth_user_query(payload["user_id"]))
+
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        return cache_user(token, user, payload)
+
+    except HTTPException as e:
+        raise  HTTPException(status_code=e.status_code, detail=e.detail)
+
+# Refresh token rotation: each refresh token works once. /users/refresh swaps the session's
+# Token row for a new pair and blacklists the old tokens; presenting a blacklisted refresh
+# token again means it was copied, so the whole session (every row with its sid) is revoked.
+def verify_refresh_token(token: str) -> dict:
+    payload = decode_jwt_token(token)
+
+    if not payload or payload.get("type", "refresh") != "refresh":
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    if "user_id" not in payload or "jti" not in payload:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+    return payload
+
+def build_rotate_query(refresh_token: str):
+    # deleting the row is the compare-and-swap, concurrent refreshes with one token get one row back
+    return delete(Token).where(Token.refresh_token == refresh_token).returning(Token.access_token, Token.session_id)
+
+def session_filter(payload: dict):
+    # tokens issued before session ids existed: every session of the user
+    if payload.get("sid"):
+        return (Token.user_id == payload["user_id"]) & (Token.session_id == payload["sid"])
+    return Token.user_id == payload["user_id"]
+
+def check_refresh_user(user: User):
+    if not user or user.deleted_at is not None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    if not user.is_admin_approved:
+        raise HTTPException(status_code=403, detail="User not approved by admin")
+
+def forget_tokens(*tokens: str):
+    for token in tokens:
+        auth_cache.pop(token_digest(token))
+
+def discard_session(payload: dict) -> list[Token]:
+    # rows of the session still waiting in the write-behind buffer
+    sid = payload.get("sid")
+    return token_write_buffer.discard_where(
+        lambda token: token.user_id == payload["user_id"] and (not sid or token.session_id == sid)
+    )
+
+def session_tokens(tokens: list[Token]) -> list[str]:
+    return [value for token in tokens for value in (token.access_token, token.refresh_token)]
+
+def restore_pending(current):
+    # rotation failed after taking a buffered row, put it back
+    if isinstance(current, Token):
+        token_write_buffer.add(current)
+
+def reuse_detected(payload: dict) -> HTTPException:
+    logger.warning("refresh token reuse for user %s, session %s revoked", payload["user_id"], payload.get("sid"))
+    evict_user_from_cache(payload["user_id"])
+    return HTTPException(status_code=401, detail="Refresh token reuse detected, session revoked")
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> tuple[User, Token]:
+    payload = verify_refresh_token(refresh_token)
+
+    # a login row still in the write-behind buffer, else the one in the table
+    current = token_write_buffer.take(refresh_token) or db.execute(build_rotate_query(refresh_token)).first()
+    if current is None:
+        db.rollback()
+        if not db.scalar(select(BlacklistedToken.id).where(BlacklistedToken.jti == payload["jti"])):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        rows = db.execute(delete(Token).where(session_filter(payload)).returning(Token.access_token, Token.refresh_token)).all()
+        revoke_tokens(db, [token for row in rows for token in row] + session_tokens(discard_session(payload)))
+        db.execute(build_auth_version_bump(payload["user_id"]))
+        db.commit()
+        raise reuse_detected(payload)
+
+    user = db.get(User, payload["user_id"])
+    try:
+        check_refresh_user(user)
+    except HTTPException:
+        db.rollback()
+        restore_pending(current)
+        raise
+
+    # old pair stays unusable in both auth modes: row gone, jti blacklisted for reuse detection
+    revoke_tokens(db, [current.access_token, refresh_token])
+    db.execute(build_auth_version_bump(user.id))
+    token = create_token_pair(user, current.session_id)
+    db.add(token)
+    db.commit()
+    forget_tokens(current.access_token, refresh_token)
+    return user, token
+
+async def rotate_refresh_token_async(db: AsyncSession, refresh_token: str) -> tuple[User, Token]:
+    payload = verify_refresh_token(refresh_token)
+
+    # take() may wait for a flush in progress, keep that off the event loop
+    current = await run_in_threadpool(token_write_buffer.take, refresh_token) or (await db.execute(build_rotate_query(refresh_token))).first()
+    if current is None:
+        await db.rollback()
+        if not await db.scalar(select(BlacklistedToken.id).where(BlacklistedToken.jti == payload["jti"])):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        rows = (await db.execute(delete(Token).where(session_filter(payload)).returning(Token.access_token, Token.refresh_token))).all()
+        pending = await run_in_threadpool(discard_session, payload)
+        await revoke_tokens_async(db, [token for row in rows for token in row] + session_tokens(pending))
+        await db.execute(build_auth_version_bump(payload["user_id"]))
+        await db.commit()
+        raise reuse_detected(payload)
+
+    user = await db.get(User, payload["user_id"])
+    try:
+        check_refresh_user(user)
+    except HTTPException:
+        await db.rollback()
+        restore_pending(current)
+        raise
+
+    await revoke_tokens_async(db, [current.access_token, refresh_token])
+    await db.execute(build_auth_version_bump(user.id))
+    token = create_token_pair(user, current.session_id)
+    db.add(token)
+    await db.commit()
+    forget_tokens(current.access_token, refresh_token)
+    return user, token
+
 if __name__ == "__main__":
     user_data = {"sub": "user@example.com", "role": "admin"}
 
@@ -0,0 +1,149 @@
+# Write-behind for the tokens rows made by /users/login (TOKEN_WRITE_BEHIND_MS > 0)
+import os
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from db.session import SessionLocal
+from models.token import Token
+from utils.metrics import TOKEN_BUFFER_PENDING
+
+logger = logging.getLogger(__name__)
+
+TOKEN_WRITE_BEHIND_MS = int(os.getenv("TOKEN_WRITE_BEHIND_MS", 0))  # 0 inserts the row before login returns
+TOKEN_WRITE_BEHIND_BATCH = int(os.getenv("TOKEN_WRITE_BEHIND_BATCH", 500))
+
+TOKEN_COLUMNS = ("user_id", "session_id", "access_token", "refresh_token", "created_at")
+
+
+class TokenWriteBuffer:
+    """Token rows waiting to be inserted, flushed by a background thread every `interval`
+    seconds or as soon as `max_batch` rows are waiting, in one multi-row INSERT.
+
+    Until their flush commits, rows are only visible in this process: authentication
+    checks `contains()`, refresh and logout remove them with `take()` / `discard_where()`.
+    Those two wait for a flush that is inserting the rows they want, so a row is either
+    still here or already in the database, never both. Rows still waiting when the
+    process dies are lost (those clients log in again); `stop()` flushes them first."""
+
+    def __init__(self, interval: float, max_batch: int):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = {}       # access token -> Token (transient, not in any session)
+        self._refresh = {}       # refresh token -> access token
+        self._in_flight = set()  # access tokens of the batch being inserted
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def add(self, token: Token):
+        token.created_at = token.created_at or datetime.utcnow()
+        with self._cond:
+            self._pending[token.access_token] = token
+            self._refresh[token.refresh_token] = token.access_token
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+        TOKEN_BUFFER_PENDING.inc()
+
+    def contains(self, token: str) -> bool:
+        with self._cond:
+            return token in self._pending or token in self._refresh
+
+    def _remove(self, access_token: str) -> Token:
+        token = self._pending.pop(access_token)
+        self._refresh.pop(token.refresh_token, None)
+        TOKEN_BUFFER_PENDING.dec()
+        return token
+
+    def take(self, refresh_token: str) -> Optional[Token]:
+        # the waiting row holding this refresh token, None if it is not (or no longer) here
+        with self._cond:
+            self._cond.wait_for(lambda: self._refresh.get(refresh_token) not in self._in_flight)
+            access_token = self._refresh.get(refresh_token)
+            return self._remove(access_token) if access_token else None
+
+    def discard_where(self, predicate: Callable[[Token], bool]) -> list[Token]:
+        with self._cond:
+            self._cond.wait_for(lambda: not any(predicate(self._pending[key]) for key in self._in_flight))
+            matching = [key for key, token in self._pending.items() if predicate(token)]
+            return [self._remove(key) for key in matching]
+
+    def flush(self) -> int:
+        with self._cond:
+            batch = list(self._pending.values())
+            self._in_flight = set(self._pending)
+        if not batch:
+            return 0
+        try:
+            done = write_tokens(batch)
+        except Exception:
+            logger.exception("token flush failed, %s rows kept for the next one", len(batch))
+            done = []
+        with self._cond:
+            for token in done:
+                self._remove(token.access_token)
+            self._in_flight = set()
+            self._cond.notify_all()
+        return len(done)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or len(self._pending) >= self.max_batch, timeout=self.interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="token-write-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        # last flush happens in the thread before it exits
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        thread.join()
+        if self._pending:
+            logger.error("%s token rows could not be written before shutdown", len(self._pending))
+
+
+def write_tokens(tokens: list[Token]) -> list[Token]:
+    # the rows that are done: inserted, or dropped because they can never be inserted
+    rows = [{column: getattr(token, column) for column in TOKEN_COLUMNS} for token in tokens]
+    db = SessionLocal()
+    try:
+        try:
+            db.execute(insert(Token), rows)
+            db.commit()
+            return tokens
+        except IntegrityError:
+            db.rollback()
+        # one bad row (user deleted meanwhile) must not hold back the others
+        done = []
+        for token, row in zip(tokens, rows):
+            try:
+                db.execute(insert(Token), [row])
+                db.commit()
+            except IntegrityError as e:
+                db.rollback()
+                logger.warning("dropping token row of user %s: %s", token.user_id, e.orig)
+            done.append(token)
+        return done
+    finally:
+        db.close()
+
+
+token_write_buffer = TokenWriteBuffer(TOKEN_WRITE_BEHIND_MS / 1000, TOKEN_WRITE_BEHIND_BATCH)
@@ -0,0 +1,97 @@
+# Test setup: the app against a throwaway SQLite database. Settings are read when the
+# modules are imported, so the environment is set before anything imports the app.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEST_DIR = tempfile.mkdtemp(prefix="fast_api_app_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+TEST_ENV = {
+    "PASSWORD_POOL_WORKERS": "0",         # hash in the request thread
+    "BCRYPT_ROUNDS": "4",
+    "PROFILE_SAMPLE_RATE": "0",
+    "MAINTENANCE_INTERVAL_SECONDS": "0",
+    "CHANGES_SETTLE_SECONDS": "0",
+    "ADMISSION_CONTROL": "false",         # tests of utils/admission.py build their own middleware
+}
+for name, value in TEST_ENV.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from db.base import Base
+from db.session import SessionLocal, engine
+from db.routing import recent_writers
+from models.user import User
+from services.password_service import hash_password
+from services.product_service import product_response_cache
+from services.token_services import auth_cache
+from utils.idempotency import idempotency_store
+
+PASSWORD = "testpass123"
+
+
+def reset_state():
+    # empty tables and the per worker caches that could outlive them
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for cache in (auth_cache, product_response_cache, recent_writers, idempotency_store._done):
+        cache.clear()
+
+
+@pytest.fixture
+def client():
+    reset_state()
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db(client):
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def make_user(client):
+    """make_user("alice", is_admin=False, approved=True) -> id, stored with PASSWORD."""
+    hashed_password = hash_password(PASSWORD)
+
+    def make(username: str, is_admin: bool = False, approved: bool = True) -> int:
+        db = SessionLocal()
+        try:
+            user = User(
+                username=username,
+                email=f"{username}@example.com",
+                hashed_password=hashed_password,
+                is_admin=is_admin,
+                is_admin_approved=approved,
+            )
+            db.add(user)
+            db.commit()
+            return user.id
+        finally:
+            db.close()
+
+    return make
+
+
+@pytest.fixture
+def login(client):
+    """login("alice") -> the login response body, with headers ready to send."""
+
+    def log_in(username: str) -> dict:
+        response = client.post("/users/login", json={"username": username, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        body["headers"] = {"Authorization": f"Bearer {body['access_token']}"}
+        return body
+
+    return log_in
@@ -0,0 +1,66 @@
+# AdmissionMiddleware around a stub app; budgets come from ADMISSION_<CLASS>_<KNOB>.
+import asyncio
+from utils.admission import AdmissionMiddleware
+
+
+class StubApp:
+    """Answers 200; /products/export streams until `finish` is set."""
+
+    def __init__(self):
+        self.finish = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        if scope["path"] == "/products/export":
+            await self.finish.wait()
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def call(middleware, path: str, method: str = "GET") -> tuple[int, dict]:
+    messages = []
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": ("10.0.0.1", 1234)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    return messages[0]["status"], {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+
+
+def test_exports_do_not_take_read_slots(monkeypatch):
+    for name, value in {"READ_CONCURRENCY": "1", "READ_QUEUE": "0", "STREAM_CONCURRENCY": "1", "STREAM_QUEUE": "0"}.items():
+        monkeypatch.setenv(f"ADMISSION_{name}", value)
+
+    async def scenario():
+        app = StubApp()
+        middleware = AdmissionMiddleware(app, enabled=True)
+        export = asyncio.ensure_future(call(middleware, "/products/export"))
+        await asyncio.sleep(0)
+
+        # the running export holds the only stream slot, not the read one
+        assert (await call(middleware, "/products/all_products"))[0] == 200
+        assert (await call(middleware, "/products/export"))[0] == 503
+        app.finish.set()
+        assert (await export)[0] == 200
+        assert (await call(middleware, "/products/export"))[0] == 200
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_answers_429_with_retry_after(monkeypatch):
+    monkeypatch.setenv("ADMISSION_WRITE_RATE", "0.5")
+    monkeypatch.setenv("ADMISSION_WRITE_BURST", "2")
+
+    async def scenario():
+        middleware = AdmissionMiddleware(StubApp(), enabled=True)
+        statuses = [(await call(middleware, "/products/add_products", "POST"))[0] for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        status, headers = await call(middleware, "/products/add_products", "POST")
+        assert status == 429 and headers["retry-after"] == "2"
+        # other classes have their own buckets
+        assert (await call(middleware, "/products/all_products"))[0] == 200
+
+    asyncio.run(scenario())
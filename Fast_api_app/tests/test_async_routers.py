@@ -0,0 +1,27 @@
+# ASYNC_DB=true serves the same API through the async routers. ASYNC_DB is read when the
+# app is imported, so the whole suite runs again in a subprocess against them.
+import os
+import subprocess
+import sys
+import pytest
+from db.session import ASYNC_DB
+from main import app
+
+
+def test_routers_match_the_mode():
+    modules = {route.endpoint.__module__ for route in app.routes if route.path.startswith(("/users/", "/products/", "/batch"))}
+    expected = {"routers.async_user_router", "routers.async_product_router", "routers.async_batch_router"}
+    assert modules == (expected if ASYNC_DB else {name.replace("async_", "") for name in expected})
+
+
+@pytest.mark.skipif(ASYNC_DB, reason="already running with the async routers")
+def test_suite_passes_with_the_async_routers():
+    tests = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", tests],
+        cwd=os.path.dirname(tests),
+        env={**os.environ, "ASYNC_DB": "true"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
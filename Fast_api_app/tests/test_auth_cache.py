@@ -0,0 +1,98 @@
+# The auth cache is per worker: writes made by another worker (simulated here by changing
+# the database behind the app's back) must still apply to the next request, or with
+# STATELESS_AUTH within the documented delay.
+import time
+import pytest
+from sqlalchemy import delete, update
+from db.session import SessionLocal
+from models.token import Token
+from models.user import User
+from routers import user_router, async_user_router
+from services import token_services
+from services.revocation_service import build_blacklist_rows, load_revocation_filter
+from services.token_services import build_auth_version_bump
+
+STATELESS_CACHE_TTL = 0.3
+
+
+def other_worker(*statements):
+    db = SessionLocal()
+    try:
+        for statement in statements:
+            if isinstance(statement, list):  # rows to add
+                db.add_all(statement)
+            else:
+                db.execute(statement)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_logout_on_another_worker_drops_cached_token(client, make_user, login):
+    user_id = make_user("alice")
+    headers = login("alice")["headers"]
+    assert client.get("/users/current_user_details", headers=headers).status_code == 200
+
+    # token rows gone but no version bump: the cached entry is still trusted
+    other_worker(delete(Token).where(Token.user_id == user_id))
+    assert client.get("/users/current_user_details", headers=headers).status_code == 200
+
+    other_worker(build_auth_version_bump(user_id))
+    assert client.get("/users/current_user_details", headers=headers).status_code == 401
+
+
+def test_unapproval_on_another_worker_applies_at_once(client, make_user, login):
+    user_id = make_user("bob")
+    headers = login("bob")["headers"]
+    assert client.get("/products/all_products", headers=headers).status_code == 200
+
+    other_worker(update(User).where(User.id == user_id).values(is_admin_approved=False, auth_version=User.auth_version + 1))
+    assert client.get("/products/all_products", headers=headers).status_code == 403
+
+
+def test_refresh_invalidates_the_old_access_token(client, make_user, login):
+    make_user("carol")
+    tokens = login("carol")
+    assert client.get("/users/current_user_details", headers=tokens["headers"]).status_code == 200
+
+    refreshed = client.post("/users/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 200
+    assert client.get("/users/current_user_details", headers=tokens["headers"]).status_code == 401
+    new_headers = {"Authorization": f"Bearer {refreshed.json()['access_token']}"}
+    assert client.get("/users/current_user_details", headers=new_headers).status_code == 200
+
+
+@pytest.fixture
+def stateless_auth(monkeypatch):
+    for module in (token_services, user_router, async_user_router):
+        monkeypatch.setattr(module, "STATELESS_AUTH", True)
+    monkeypatch.setattr(token_services, "STATELESS_AUTH_CACHE_TTL_SECONDS", STATELESS_CACHE_TTL)
+
+
+def test_stateless_unapproval_on_another_worker_applies_within_the_cache_ttl(client, make_user, login, stateless_auth):
+    user_id = make_user("dave")
+    headers = login("dave")["headers"]
+    assert client.get("/products/all_products", headers=headers).status_code == 200
+
+    other_worker(update(User).where(User.id == user_id).values(is_admin_approved=False, auth_version=User.auth_version + 1))
+    assert client.get("/products/all_products", headers=headers).status_code == 200  # cached, not re-read
+    time.sleep(STATELESS_CACHE_TTL + 0.1)
+    assert client.get("/products/all_products", headers=headers).status_code == 403
+
+
+def test_stateless_logout_applies_at_once_here_and_after_the_sync_elsewhere(client, make_user, login, stateless_auth):
+    make_user("erin")
+    here = login("erin")
+    assert client.get("/users/current_user_details", headers=here["headers"]).status_code == 200
+
+    assert client.post("/users/logout", headers=here["headers"]).status_code == 200
+    assert client.get("/users/current_user_details", headers=here["headers"]).status_code == 401
+
+    # another worker's logout: its blacklist rows reach this worker with the next filter sync
+    make_user("frank")
+    tokens = login("frank")
+    assert client.get("/users/current_user_details", headers=tokens["headers"]).status_code == 200
+    other_worker(build_blacklist_rows([tokens["access_token"], tokens["refresh_token"]]))
+    assert client.get("/users/current_user_details", headers=tokens["headers"]).status_code == 200
+    load_revocation_filter()
+    assert client.get("/users/current_user_details", headers=tokens["headers"]).status_code == 401
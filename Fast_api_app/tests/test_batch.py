@@ -0,0 +1,79 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from main import app
+from models.products import Product
+from utils.admission import AdmissionMiddleware
+
+
+def add(name: str, price: int = 1) -> dict:
+    return {"method": "POST", "path": "/products/add_products", "body": {"name": name, "price": price}}
+
+
+def product_names(db) -> list[str]:
+    return sorted(db.scalars(select(Product.name)))
+
+
+def test_atomic_batch_rolls_back_every_operation(client, db, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    operations = [add("lamp"), {"method": "PUT", "path": "/products/update_product/999", "body": {"price": 2}}, add("chair")]
+
+    response = client.post("/batch", json={"mode": "atomic", "operations": operations}, headers=headers).json()
+
+    assert [result["status"] for result in response["data"]] == [200, 404, 424]
+    assert response["committed"] is False
+    assert product_names(db) == []
+
+
+def test_atomic_batch_commits_and_later_operations_see_earlier_writes(client, db, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    operations = [add("lamp"), add("chair"), {"method": "GET", "path": "/products/all_products?fields=name"}]
+
+    response = client.post("/batch", json={"operations": operations}, headers=headers).json()
+
+    assert response["committed"] is True
+    assert [product["name"] for product in response["data"][2]["body"]["data"]] == ["lamp", "chair"]
+    assert product_names(db) == ["chair", "lamp"]
+
+
+def test_per_op_batch_keeps_the_operations_that_succeeded(client, db, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    operations = [add("lamp"), add("lamp"), add("chair")]
+
+    response = client.post("/batch", json={"mode": "per_op", "operations": operations}, headers=headers).json()
+
+    assert [result["status"] for result in response["data"]] == [200, 400, 200]
+    assert product_names(db) == ["chair", "lamp"]
+
+
+def test_operations_get_the_answer_of_a_request_of_their_own(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    operations = [
+        {"method": "POST", "path": "/products/add_products", "body": {"name": "no price"}},
+        {"method": "GET", "path": "/products/nowhere"},
+        {"method": "DELETE", "path": "/products/all_products"},
+        {"method": "POST", "path": "/users/logout"},
+        {"method": "GET", "path": "/users/all"},
+    ]
+
+    response = client.post("/batch", json={"mode": "per_op", "operations": operations}, headers=headers).json()
+
+    assert [result["status"] for result in response["data"]] == [422, 404, 405, 400, 403]
+    assert response["data"][0]["body"]["detail"][0]["loc"] == ["body", "price"]
+
+
+def test_each_operation_is_rate_limited(client, make_user, login, monkeypatch):
+    monkeypatch.setenv("ADMISSION_READ_RATE", "0.1")
+    monkeypatch.setenv("ADMISSION_READ_BURST", "2")
+    make_user("alice")
+    headers = login("alice")["headers"]
+    read = {"method": "GET", "path": "/users/current_user_details"}
+
+    with TestClient(AdmissionMiddleware(app, enabled=True)) as limited:
+        response = limited.post("/batch", json={"mode": "per_op", "operations": [read] * 3}, headers=headers).json()
+        assert [result["status"] for result in response["data"]] == [200, 200, 429]
+        # the same bucket as requests sent on their own
+        assert limited.get("/users/current_user_details", headers=headers).status_code == 429
@@ -0,0 +1,45 @@
+# The benchmark tooling itself: the CI gate of compare.py, the numbers run.py reports and
+# a seeded dataset that is the same from one run to the next.
+import os
+from sqlalchemy import create_engine, func, select
+from benchmarks.compare import compare
+from benchmarks.run import summarize
+from benchmarks.seed import seed_database
+from models.products import Product
+from models.user import User
+from conftest import TEST_DIR
+
+
+def scenario(rps: float, p95: float, errors: int = 0) -> dict:
+    return {"rps": rps, "p50_ms": 1.0, "p95_ms": p95, "p99_ms": p95, "errors": errors}
+
+
+def test_compare_flags_only_changes_above_the_threshold():
+    baseline = {"scenarios": {"list": scenario(100, 10), "get": scenario(100, 10)}}
+    candidate = {"scenarios": {"list": scenario(95, 10.5), "get": scenario(80, 10, errors=2)}}
+
+    _, regressions = compare(baseline, candidate, threshold=0.10)
+
+    assert [regression.split(":")[0] for regression in regressions] == ["get rps", "get errors"]
+
+
+def test_summarize_reports_percentiles_in_ms():
+    summary = summarize([i / 1000 for i in range(1, 101)], errors=0, wall=2.0)
+    assert (summary["requests"], summary["rps"], summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (100, 50.0, 50.0, 95.0, 99.0)
+
+
+def test_seed_database_is_reproducible():
+    engine = create_engine(f"sqlite:///{os.path.join(TEST_DIR, 'benchmark.db')}")
+    try:
+        first = seed_database(engine, users=5, products=20, tokens=3, seed=7)
+        with engine.connect() as connection:
+            prices = connection.scalars(select(Product.price).order_by(Product.id)).all()
+            assert connection.scalar(select(func.count()).select_from(User)) == 5
+        second = seed_database(engine, users=5, products=20, tokens=3, seed=7)
+        with engine.connect() as connection:
+            assert connection.scalars(select(Product.price).order_by(Product.id)).all() == prices
+    finally:
+        engine.dispose()
+    assert first["usernames"][0] == "admin"
+    assert first["owned_products"] == second["owned_products"]
+    assert len(first["tokens"]) == 3
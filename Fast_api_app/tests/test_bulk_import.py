@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime
+from models.products import Product
+from services import product_service
+
+
+def ndjson(*names: str) -> str:
+    return "\n".join(f'{{"name": "{name}", "price": 1}}' for name in names)
+
+
+def import_body(client, headers, body: str, **params):
+    response = client.post("/products/bulk_import", content=body, params=params, headers={**headers, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_taken_names_are_rejected_rows_not_errors(client, db, make_user, login):
+    owner_id = make_user("alice")
+    headers = login("alice")["headers"]
+    # live name, committed by someone else: the insert skips it instead of failing the import
+    db.add(Product(name="taken", price=1, owner_id=owner_id))
+    # soft-deleted names may be reused
+    db.add(Product(name="retired", price=1, owner_id=owner_id, deleted_at=datetime.utcnow()))
+    db.commit()
+
+    result = import_body(client, headers, ndjson("a", "taken", "b", "a", "retired", "c"), chunk_size=2)
+
+    assert result["inserted"] == 4
+    assert [(item["row"], item["name"]) for item in result["rejected"]] == [(2, "taken"), (4, "a")]
+    names = [product["name"] for product in client.get("/products/all_products", headers=headers).json()["data"]]
+    assert sorted(names) == ["a", "b", "c", "retired", "taken"]
+
+
+def test_invalid_rows_are_reported_with_the_rest_imported(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    body = ndjson("ok") + '\n{"name": "no price"}\nnot json\n' + ndjson("fine")
+
+    result = import_body(client, headers, body)
+
+    assert result["inserted"] == 2
+    assert [item["row"] for item in result["rejected"]] == [2, 3]
+
+
+def test_rows_are_parsed_off_the_event_loop(client, make_user, login, monkeypatch):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    on_loop = []
+    validate = product_service.ProductCreate.model_validate
+
+    def recording_validate(record):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:  # a threadpool thread
+            on_loop.append(False)
+        return validate(record)
+
+    monkeypatch.setattr(product_service.ProductCreate, "model_validate", recording_validate)
+    result = import_body(client, headers, ndjson("a", "b", "c"), chunk_size=2)
+
+    assert result["inserted"] == 3
+    assert on_loop == [False, False, False]
@@ -0,0 +1,76 @@
+# /products/changes: a consumer paging with next_since sees every write once, deletes as
+# tombstones (archived products included), and nothing inside the settle window.
+from datetime import datetime, timedelta
+from crud import product_crud
+from models.products import Product
+from services.maintenance_service import run_maintenance
+
+
+def add_product(client, headers, name: str) -> dict:
+    response = client.post("/products/add_products", json={"name": name, "description": name, "price": 10}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def read_changes(client, headers, since=None, limit: int = 2) -> tuple[list[dict], str]:
+    # every page up to the end of the feed, and the cursor to continue from
+    changes = []
+    while True:
+        page = client.get("/products/changes", params={"limit": limit, **({"since": since} if since else {})}, headers=headers).json()
+        changes += page["data"]
+        since = page["next_since"]
+        if not page["has_more"]:
+            return changes, since
+
+
+def test_consumer_sees_every_write_once(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    lamp, chair, desk = (add_product(client, headers, name) for name in ("lamp", "chair", "desk"))
+
+    changes, since = read_changes(client, headers)
+    assert [change["name"] for change in changes] == ["lamp", "chair", "desk"]
+    assert read_changes(client, headers, since) == ([], since)
+
+    assert client.put(f"/products/update_product/{chair['id']}", json={"price": 11}, headers=headers).status_code == 200
+    assert client.delete(f"/products/delete_product/{lamp['id']}", headers=headers).status_code == 200
+    changes, since = read_changes(client, headers, since)
+
+    assert changes[0]["id"] == chair["id"] and changes[0]["price"] == 11 and changes[0]["deleted"] is False
+    tombstone = changes[1]
+    assert tombstone["id"] == lamp["id"] and tombstone["deleted"] is True and tombstone["deleted_at"]
+    assert "name" not in tombstone
+    assert len(changes) == 2
+
+
+def test_owner_only_sees_own_changes(client, make_user, login):
+    make_user("alice")
+    make_user("bob")
+    make_user("admin", is_admin=True)
+    add_product(client, login("alice")["headers"], "lamp")
+    add_product(client, login("bob")["headers"], "chair")
+
+    assert [change["name"] for change in read_changes(client, login("bob")["headers"])[0]] == ["chair"]
+    assert len(read_changes(client, login("admin")["headers"])[0]) == 2
+
+
+def test_archived_products_keep_their_tombstone(client, make_user, login, db):
+    owner_id = make_user("alice")
+    headers = login("alice")["headers"]
+    db.add(Product(name="old", price=1, owner_id=owner_id, deleted_at=datetime.utcnow() - timedelta(days=10)))
+    db.commit()
+    assert run_maintenance(db, pause=0, archive_after_days=1)["archived_products"] == 1
+
+    changes, _ = read_changes(client, headers)
+    assert [(change["deleted"], "name" in change) for change in changes] == [(True, False)]
+
+
+def test_unsettled_writes_are_held_back(client, make_user, login, monkeypatch):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    add_product(client, headers, "lamp")
+
+    monkeypatch.setattr(product_crud, "CHANGES_SETTLE_SECONDS", 60)
+    assert read_changes(client, headers) == ([], None)
+    monkeypatch.setattr(product_crud, "CHANGES_SETTLE_SECONDS", 0)
+    assert len(read_changes(client, headers)[0]) == 1
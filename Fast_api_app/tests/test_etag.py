@@ -0,0 +1,95 @@
+# Product reads carry weak ETags: If-None-Match answers 304 until a write changes what
+# the caller would see.
+from datetime import datetime
+from sqlalchemy import update
+from models.products import Product
+from services import product_service
+from services.product_service import product_response_cache
+
+def add_product(client, headers, name: str, price: int = 10) -> dict:
+    response = client.post("/products/add_products", json={"name": name, "description": name, "price": price}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def revalidate(client, path: str, headers: dict, etag: str):
+    return client.get(path, headers={**headers, "If-None-Match": etag})
+
+
+def test_product_is_revalidated_until_it_changes(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    product = add_product(client, headers, "lamp")
+    path = f"/products/get_product/{product['id']}"
+
+    first = client.get(path, headers=headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    not_modified = revalidate(client, path, headers, etag)
+    assert (not_modified.status_code, not_modified.content, not_modified.headers["ETag"]) == (304, b"", etag)
+    assert revalidate(client, path, headers, etag.removeprefix("W/")).status_code == 304
+    assert revalidate(client, path, headers, '"other", ' + etag).status_code == 304
+
+    updated = client.put(f"/products/update_product/{product['id']}", json={"price": 11, "version": product["version"]}, headers=headers)
+    assert updated.status_code == 200
+    changed = revalidate(client, path, headers, etag)
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.json()["price"] == 11
+
+
+def test_list_page_changes_with_new_products_and_per_caller(client, make_user, login):
+    make_user("alice")
+    make_user("bob")
+    alice = login("alice")["headers"]
+    bob = login("bob")["headers"]
+    add_product(client, alice, "lamp")
+
+    etag = client.get("/products/all_products", headers=alice).headers["ETag"]
+    assert revalidate(client, "/products/all_products", alice, etag).status_code == 304
+
+    # bob owns nothing: alice's cached page is not his
+    assert client.get("/products/all_products", headers=bob).json()["data"] == []
+
+    add_product(client, alice, "chair")
+    page = revalidate(client, "/products/all_products", alice, etag)
+    assert page.status_code == 200
+    assert sorted(item["name"] for item in page.json()["data"]) == ["chair", "lamp"]
+
+
+def test_writes_on_another_worker_are_seen_at_once(client, make_user, login, db):
+    owner_id = make_user("alice")
+    headers = login("alice")["headers"]
+    product = add_product(client, headers, "lamp")
+    path = f"/products/get_product/{product['id']}"
+    product_etag = client.get(path, headers=headers).headers["ETag"]
+    page_etag = client.get("/products/all_products", headers=headers).headers["ETag"]
+    assert revalidate(client, path, headers, product_etag).status_code == 304
+
+    # what update_product and add_products do on another worker, whose cache is not this one
+    db.execute(update(Product).where(Product.id == product["id"]).values(price=99, updated_at=datetime.utcnow()))
+    db.add(Product(name="chair", price=5, owner_id=owner_id))
+    db.commit()
+
+    changed = revalidate(client, path, headers, product_etag)
+    assert changed.status_code == 200 and changed.json()["price"] == 99
+    page = revalidate(client, "/products/all_products", headers, page_etag)
+    assert page.status_code == 200
+    assert sorted(item["name"] for item in page.json()["data"]) == ["chair", "lamp"]
+
+
+def test_unsettled_data_is_not_cached(client, make_user, login, monkeypatch):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    add_product(client, headers, "lamp")
+
+    monkeypatch.setattr(product_service, "CHANGES_SETTLE_SECONDS", 60)
+    first = client.get("/products/all_products", headers=headers)
+    assert len(product_response_cache._entries) == 0
+    # still answered with an ETag, and revalidated from the database
+    assert revalidate(client, "/products/all_products", headers, first.headers["ETag"]).status_code == 304
+
+    monkeypatch.setattr(product_service, "CHANGES_SETTLE_SECONDS", 0)
+    client.get("/products/all_products", headers=headers)
+    assert len(product_response_cache._entries) == 1
@@ -0,0 +1,158 @@
+# The product event hub: scoped fan-out, slow subscribers dropped, subscriptions that end
+# with their stream and with the app, the relay between workers; and the events the product
+# routes publish.
+import signal
+import asyncio
+import socket
+import pytest
+from fastapi import HTTPException
+from services import event_hub as event_hub_module
+from main import app, lifespan
+from services.event_hub import EventHub, LocalBroker, RelayBroker, event_hub, product_event, run_relay, sse_stream
+
+
+async def open_stream(owner_id):
+    # subscribed once the retry line is out
+    stream = sse_stream(owner_id, heartbeat=5)
+    assert await stream.__anext__() == "retry: 3000\n\n"
+    return stream
+
+
+async def read_stream(stream, count: int) -> list[str]:
+    messages = [await asyncio.wait_for(stream.__anext__(), 1) for _ in range(count)]
+    await stream.aclose()
+    return messages
+
+
+def test_events_reach_the_subscribers_in_scope(monkeypatch):
+    async def scenario():
+        hub = EventHub(LocalBroker(), queue_size=10, max_subscribers=2)
+        monkeypatch.setattr(event_hub_module, "event_hub", hub)  # the hub sse_stream subscribes to
+        await hub.start()
+        owner, admin = await open_stream(1), await open_stream(None)
+        with pytest.raises(HTTPException) as full:
+            hub.check_available()
+        assert full.value.status_code == 503
+
+        hub.publish(product_event("created", 10, 1))
+        hub.publish(product_event("created", 20, 2))
+        await asyncio.sleep(0)
+        owner_messages = await read_stream(owner, 1)
+        admin_messages = await read_stream(admin, 2)
+        await hub.stop()
+        return owner_messages, admin_messages, hub.subscribers
+
+    owner_messages, admin_messages, subscribers = asyncio.run(scenario())
+    assert owner_messages[0].startswith("event: product\ndata: ") and '"id": 10' in owner_messages[0]
+    assert ['"id": 10' in admin_messages[0], '"id": 20' in admin_messages[1]] == [True, True]
+    assert subscribers == set()
+
+
+def test_slow_subscriber_is_dropped(monkeypatch):
+    async def scenario():
+        hub = EventHub(LocalBroker(), queue_size=2, max_subscribers=10)
+        monkeypatch.setattr(event_hub_module, "event_hub", hub)
+        await hub.start()
+        slow = await open_stream(None)
+        for product_id in range(3):
+            hub.publish(product_event("updated", product_id, 1))
+        await asyncio.sleep(0)
+        messages = [message async for message in slow]
+        await hub.stop()
+        return messages, hub.subscribers
+
+    messages, subscribers = asyncio.run(scenario())
+    assert len(messages) == 1 and messages[0].startswith("event: dropped\n")  # the queued events are not worth sending
+    assert subscribers == set()
+
+
+def test_stream_cancelled_while_waiting_unsubscribes(monkeypatch):
+    async def scenario():
+        hub = EventHub(LocalBroker(), queue_size=10, max_subscribers=10)
+        monkeypatch.setattr(event_hub_module, "event_hub", hub)
+        await hub.start()
+        never_started = sse_stream(None)
+        await never_started.aclose()
+        subscribed_before_start = len(hub.subscribers)
+
+        async def consume():
+            async for _ in sse_stream(None, heartbeat=5):
+                pass
+
+        client = asyncio.create_task(consume())  # a disconnect cancels it, as Starlette does
+        while not hub.subscribers:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # parked in queue.get()
+        client.cancel()
+        await asyncio.gather(client, return_exceptions=True)
+        await hub.stop()
+        return subscribed_before_start, hub.subscribers
+
+    assert asyncio.run(scenario()) == (0, set())
+
+
+def test_app_shutdown_ends_open_streams_without_touching_signals():
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+
+    async def scenario():
+        async with lifespan(app):
+            stream = await open_stream(None)
+            reader = asyncio.create_task(read_stream(stream, 1))
+            await asyncio.sleep(0.05)
+        return await asyncio.wait_for(asyncio.gather(reader, return_exceptions=True), 1), event_hub.subscribers
+
+    (ended,), subscribers = asyncio.run(scenario())
+    assert isinstance(ended, StopAsyncIteration) and subscribers == set()
+    assert {signum: signal.getsignal(signum) for signum in handlers} == handlers
+
+
+def test_relay_delivers_to_every_worker():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    async def scenario():
+        relay = asyncio.create_task(run_relay("127.0.0.1", port))
+        await asyncio.sleep(0.1)
+        hubs = [EventHub(RelayBroker("127.0.0.1", port), queue_size=10, max_subscribers=10) for _ in range(2)]
+        for hub in hubs:
+            await hub.start()
+        while any(hub.broker.writer is None for hub in hubs):
+            await asyncio.sleep(0.01)
+        subscriptions = [hub.subscribe(None) for hub in hubs]
+        hubs[0].publish(product_event("deleted", 7, 1))
+        received = [await asyncio.wait_for(subscription.queue.get(), 2) for subscription in subscriptions]
+        for hub in hubs:
+            await hub.stop()
+        relay.cancel()
+        return received
+
+    received = asyncio.run(scenario())
+    assert [(event["type"], event["id"]) for event in received] == [("deleted", 7), ("deleted", 7)]
+
+
+def test_product_writes_are_published(client, make_user, login, monkeypatch):
+    published = []
+    monkeypatch.setattr(event_hub, "publish", published.append)
+    owner_id = make_user("alice")
+    headers = login("alice")["headers"]
+
+    created = client.post("/products/add_products", json={"name": "lamp", "price": 10}, headers=headers).json()["data"]
+    client.put(f"/products/update_product/{created['id']}", json={"price": 11}, headers=headers)
+    client.delete(f"/products/delete_product/{created['id']}", headers=headers)
+    client.post("/products/bulk_import", content='{"name": "chair", "price": 1}', headers={**headers, "Content-Type": "application/x-ndjson"})
+
+    assert [(event["type"], event["id"], event["owner_id"]) for event in published] == [
+        ("created", created["id"], owner_id),
+        ("updated", created["id"], owner_id),
+        ("deleted", created["id"], owner_id),
+        ("imported", None, owner_id),
+    ]
+
+
+def test_events_route_refuses_before_streaming(client, monkeypatch):
+    checked = []
+    monkeypatch.setattr(event_hub, "check_available", lambda: checked.append(True))
+    assert client.get("/products/events").status_code == 401
+    assert client.get("/products/events", headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert checked == []
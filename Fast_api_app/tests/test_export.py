@@ -0,0 +1,52 @@
+# /products/export streams every live product in keyset batches, and holds no connection
+# while a batch is being sent.
+import csv
+import io
+import json
+import pytest
+from crud import product_crud
+from crud.product_crud import PRODUCT_FIELDS, iter_product_batches
+from db.session import engine
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(product_crud, "EXPORT_BATCH_SIZE", 2)
+
+
+def add_products(client, headers, *names: str) -> list[int]:
+    body = "\n".join(json.dumps({"name": name, "description": f"{name}, \"quoted\"", "price": 3}) for name in names)
+    response = client.post("/products/bulk_import", content=body, headers={**headers, "Content-Type": "application/x-ndjson"})
+    assert response.json()["inserted"] == len(names), response.text
+    return [product["id"] for product in client.get("/products/all_products", headers=headers).json()["data"]]
+
+
+def test_ndjson_and_csv_hold_the_same_rows(small_batches, client, make_user, login):
+    make_user("alice")
+    make_user("bob")
+    alice = login("alice")["headers"]
+    ids = add_products(client, alice, "a", "b", "c", "d", "e")
+    add_products(client, login("bob")["headers"], "other")
+    assert client.delete(f"/products/delete_product/{ids[0]}", headers=alice).status_code == 200
+
+    ndjson = client.get("/products/export", params={"format": "ndjson"}, headers=alice)
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [row["name"] for row in rows] == ["b", "c", "d", "e"]
+    assert list(rows[0]) == PRODUCT_FIELDS
+
+    exported = client.get("/products/export", params={"format": "csv"}, headers=alice)
+    assert exported.headers["content-disposition"] == "attachment; filename=products.csv"
+    records = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [(record["name"], record["description"]) for record in records] == [(row["name"], row["description"]) for row in rows]
+
+
+def test_no_connection_is_held_between_batches(small_batches, client, make_user, login):
+    owner_id = make_user("alice")
+    add_products(client, login("alice")["headers"], "a", "b", "c", "d", "e")
+
+    sizes = []
+    for batch in iter_product_batches(owner_id):
+        assert engine.pool.checkedout() == 0
+        sizes.append(len(batch))
+    assert sizes == [2, 2, 1]
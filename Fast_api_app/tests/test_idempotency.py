@@ -0,0 +1,77 @@
+# Idempotency-Key on product writes: a retry gets the first response back without running
+# the endpoint again; the same key with another request is refused.
+import asyncio
+import pytest
+from fastapi import HTTPException, Response
+from models.products import Product
+from utils.idempotency import IdempotencyStore, REPLAYED_HEADER
+
+
+def add_product(client, headers, key: str, **body):
+    return client.post("/products/add_products", json={"name": "lamp", "price": 10, **body}, headers={**headers, "Idempotency-Key": key})
+
+
+def test_retry_replays_the_first_response(client, make_user, login, db):
+    make_user("alice")
+    headers = login("alice")["headers"]
+
+    first = add_product(client, headers, "k1")
+    retry = add_product(client, headers, "k1")
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert REPLAYED_HEADER not in first.headers and retry.headers[REPLAYED_HEADER] == "true"
+    assert db.query(Product).count() == 1
+
+    # a new key is a new request: the duplicate name is now refused
+    assert add_product(client, headers, "k2").status_code == 400
+
+
+def test_key_reused_for_another_request(client, make_user, login):
+    make_user("alice")
+    make_user("bob")
+    alice = login("alice")["headers"]
+
+    assert add_product(client, alice, "k1").status_code == 200
+    assert add_product(client, alice, "k1", price=11).status_code == 422
+    # keys are per user
+    bob = add_product(client, login("bob")["headers"], "k1", name="chair")
+    assert bob.status_code == 200 and REPLAYED_HEADER not in bob.headers
+
+
+def test_errors_are_replayed_too(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    product_id = add_product(client, headers, "create").json()["data"]["id"]
+
+    def delete(key: str):
+        return client.delete(f"/products/delete_product/{product_id}", headers={**headers, "Idempotency-Key": key})
+
+
+    assert delete("d1").status_code == 200
+    replayed = delete("d1")
+    assert replayed.status_code == 200 and replayed.headers[REPLAYED_HEADER] == "true"
+    assert delete("d2").status_code == 404
+    assert delete("d2").headers[REPLAYED_HEADER] == "true"
+
+
+def test_duplicate_waits_for_the_first_request():
+    async def scenario():
+        store = IdempotencyStore(maxsize=10, ttl=60)
+        assert await store.claim("key", "body", wait=1) is None
+        duplicate = asyncio.ensure_future(store.claim("key", "body", wait=1))
+        await asyncio.sleep(0.01)
+        assert not duplicate.done()
+        store.finish("key", Response(content=b"done", status_code=201))
+        stored = await duplicate
+
+        assert await store.claim("slow", "body", wait=1) is None
+        with pytest.raises(HTTPException) as in_progress:
+            await store.claim("slow", "body", wait=0.01)
+        # a failed first attempt stores nothing, the next one runs
+        store.finish("slow", None)
+        return stored, in_progress.value.status_code, await store.claim("slow", "body", wait=1)
+
+    stored, in_progress, rerun = asyncio.run(scenario())
+    assert (stored.status_code, stored.body) == (201, b"done")
+    assert in_progress == 409
+    assert rerun is None
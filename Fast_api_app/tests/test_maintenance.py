@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, insert, select
+from db.session import engine
+from models.blacklist import BlacklistedToken
+from models.products import Product
+from models.product_archive import ProductArchive
+from models.token import Token
+from services import maintenance_service
+from services.maintenance_service import TOKEN_LIFETIME, run_maintenance
+
+
+def add_deleted_product(db, owner_id: int, name: str) -> int:
+    product = Product(name=name, price=1, owner_id=owner_id, deleted_at=datetime.utcnow() - timedelta(days=10))
+    db.add(product)
+    db.commit()
+    return product.id
+
+
+def test_archived_ids_are_not_handed_out_again(db, make_user):
+    owner_id = make_user("alice")
+    first = add_deleted_product(db, owner_id, "first")
+    assert run_maintenance(db, pause=0, archive_after_days=1)["archived_products"] == 1
+
+    # the newest id just left products, SQLite must not reuse it
+    second = add_deleted_product(db, owner_id, "second")
+    assert second > first
+    assert run_maintenance(db, pause=0, archive_after_days=1)["archived_products"] == 1
+    assert db.scalars(select(ProductArchive.id).order_by(ProductArchive.id)).all() == [first, second]
+
+
+def test_recently_deleted_products_stay(db, make_user):
+    owner_id = make_user("alice")
+    db.add(Product(name="fresh", price=1, owner_id=owner_id, deleted_at=datetime.utcnow()))
+    db.commit()
+    assert run_maintenance(db, pause=0, archive_after_days=1)["archived_products"] == 0
+
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return NOW
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    monkeypatch.setattr(maintenance_service, "datetime", FrozenDatetime)
+    return NOW
+
+
+def add_tokens(db, user_id: int, *created_at):
+    # the table, not the ORM entity: a bulk ORM insert would fill created_at=None with its default
+    db.execute(insert(Token.__table__), [
+        {"user_id": user_id, "access_token": f"access-{i}", "refresh_token": f"refresh-{i}", "created_at": value}
+        for i, value in enumerate(created_at)
+    ])
+    db.commit()
+
+
+def remaining(db, column) -> list:
+    db.expire_all()
+    return sorted(db.scalars(select(column)).all(), key=str)
+
+
+def test_tokens_are_purged_once_past_their_lifetime(db, make_user, frozen_now):
+    cutoff = frozen_now - TOKEN_LIFETIME
+    add_tokens(db, make_user("alice"), cutoff - timedelta(seconds=1), cutoff, cutoff + timedelta(seconds=1), frozen_now, None)
+
+    assert run_maintenance(db, pause=0)["tokens"] == 2
+    # the cutoff itself is not expired yet; rows without created_at go
+    assert remaining(db, Token.created_at) == [cutoff, cutoff + timedelta(seconds=1), frozen_now]
+
+
+def test_blacklist_entries_go_with_their_token_expiry(db, frozen_now):
+    cutoff = frozen_now - TOKEN_LIFETIME
+    db.execute(insert(BlacklistedToken.__table__), [
+        {"token": "expired", "expires_at": frozen_now - timedelta(seconds=1), "created_at": frozen_now},
+        {"token": "at-expiry", "expires_at": frozen_now, "created_at": frozen_now},
+        {"token": "valid", "expires_at": frozen_now + timedelta(minutes=5), "created_at": cutoff - timedelta(days=1)},
+        {"token": "no-exp-old", "expires_at": None, "created_at": cutoff - timedelta(seconds=1)},
+        {"token": "no-exp-recent", "expires_at": None, "created_at": cutoff},
+        {"token": "undated", "expires_at": None, "created_at": None},
+    ])
+    db.commit()
+
+    assert run_maintenance(db, pause=0)["blacklisted_tokens"] == 2
+    assert remaining(db, BlacklistedToken.token) == ["at-expiry", "no-exp-recent", "undated", "valid"]
+
+
+def test_purge_goes_in_batches(db, make_user, frozen_now, monkeypatch):
+    add_tokens(db, make_user("alice"), *[frozen_now - TOKEN_LIFETIME - timedelta(hours=1)] * 5, frozen_now)
+    deletes, pauses = [], []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE FROM tokens"):
+            deletes.append(len(parameters))
+
+    monkeypatch.setattr(maintenance_service.time, "sleep", pauses.append)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        removed = run_maintenance(db, batch_size=2, pause=0.5)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert removed["tokens"] == 5
+    assert deletes == [2, 2, 1]  # ids bound per DELETE
+    assert pauses == [0.5, 0.5]  # between full batches only
+    assert remaining(db, Token.created_at) == [frozen_now]
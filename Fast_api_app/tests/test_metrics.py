@@ -0,0 +1,38 @@
+# /metrics: requests are counted under their route template, not their raw path, and the
+# pool gauges return to where they were once the request's session is closed.
+from prometheus_client import REGISTRY
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_labelled_with_the_route_template(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    route = "/products/get_product/{product_id}"
+    before = sample("http_requests_total", method="GET", route=route, status="404")
+    latency_before = sample("http_request_duration_seconds_count", method="GET", route=route)
+
+    for product_id in (101, 102, 103):
+        assert client.get(f"/products/get_product/{product_id}", headers=headers).status_code == 404
+    assert client.get("/no/such/path").status_code == 404
+
+    assert sample("http_requests_total", method="GET", route=route, status="404") == before + 3
+    assert sample("http_request_duration_seconds_count", method="GET", route=route) == latency_before + 3
+    assert sample("http_requests_total", method="GET", route="/products/get_product/101", status="404") == 0
+    assert sample("http_requests_total", method="GET", route="unmatched", status="404") >= 1
+
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/products/get_product/{product_id}",status="404"}' in body
+    assert "db_pool_checked_out" in body
+
+
+def test_pool_checkouts_are_returned(client, make_user, login):
+    make_user("bob")
+    headers = login("bob")["headers"]
+    checked_out = sample("db_pool_checked_out", engine="primary")
+
+    assert client.get("/products/all_products", headers=headers).status_code == 200
+    assert sample("db_pool_checked_out", engine="primary") == checked_out
+    assert sample("db_pool_connections_total", engine="primary") >= 1
@@ -0,0 +1,44 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models.products import Product
+
+
+def add_products(db, owner_id: int, count: int, created_at: datetime):
+    db.execute(insert(Product), [
+        {"name": f"item {i}", "price": i, "owner_id": owner_id, "created_at": created_at}
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def test_cursor_pages_cover_every_row_once(client, db, make_user, login):
+    owner_id = make_user("alice")
+    headers = login("alice")["headers"]
+    # one timestamp for all: the id breaks the ties
+    add_products(db, owner_id, 7, datetime(2026, 1, 1))
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/products/all_products", params=params, headers=headers).json()
+        ids += [product["id"] for product in page["data"]]
+        cursor = page.get("next_cursor")
+        if not cursor:
+            break
+    assert ids == sorted(ids) and len(ids) == 7
+
+
+def test_invalid_cursor_is_rejected(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    assert client.get("/products/all_products", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+
+
+def test_created_at_is_required(client, db, make_user):
+    # a NULL created_at would sort apart from every page and could not be put in a cursor
+    owner_id = make_user("alice")
+    with pytest.raises(IntegrityError):
+        db.execute(insert(Product).values(name="bare", price=1, owner_id=owner_id, created_at=None))
+    db.rollback()
@@ -0,0 +1,79 @@
+# bcrypt runs in a bounded process pool: real workers give the same answers as inline
+# hashing, excess work is refused with 503, a dead worker is replaced, and hashes of
+# another cost are replaced.
+import time
+import threading
+import asyncio
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from models.user import User
+from services.password_service import PasswordPool, hash_password, verify_password
+from conftest import PASSWORD
+
+
+@pytest.fixture
+def pool():
+    pool = PasswordPool(workers=1, max_pending=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_process_hashes_and_verifies(pool):
+    hashed = pool.run(hash_password, "secret")
+    assert pool.run(verify_password, "secret", hashed) == (True, None)
+    assert asyncio.run(pool.run_async(verify_password, "wrong", hashed)) == (False, None)
+    assert pool.pending == 0
+
+
+def test_full_queue_is_refused(pool):
+    running = pool.submit(time.sleep, 0.5)
+    with pytest.raises(HTTPException) as busy:
+        pool.submit(hash_password, "secret")
+    assert (busy.value.status_code, busy.value.headers) == (503, {"Retry-After": "1"})
+    running.result()
+    assert pool.pending == 0
+    assert verify_password("secret", pool.run(hash_password, "secret"))[0]
+
+
+def kill_workers(pool):
+    for process in list(pool._executor._processes.values()):
+        process.kill()
+        process.join()
+
+
+def test_dead_worker_is_replaced(pool):
+    pool.run(hash_password, "secret")
+    broken = pool._executor
+    kill_workers(pool)
+    assert verify_password("secret", pool.run(hash_password, "secret"))[0]
+    assert pool._executor is not broken
+
+    kill_workers(pool)
+    hashed = asyncio.run(pool.run_async(hash_password, "secret"))
+    assert verify_password("secret", hashed)[0]
+    assert pool.pending == 0
+
+
+def test_job_running_when_its_worker_dies_is_retried(pool):
+    pool.run(hash_password, "secret")
+    done = []
+    caller = threading.Thread(target=lambda: done.append(pool.run(time.sleep, 1)))
+    caller.start()
+    time.sleep(0.5)
+    kill_workers(pool)
+    caller.join(timeout=30)
+    assert done == [None]
+    assert pool.pending == 0
+
+
+def test_login_rehashes_a_password_of_another_cost(client, make_user, db):
+    user_id = make_user("alice")
+    user = db.get(User, user_id)
+    user.hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(PASSWORD)
+    db.commit()
+
+    assert client.post("/users/login", json={"username": "alice", "password": PASSWORD}).status_code == 200
+    db.expire_all()
+    assert db.get(User, user_id).hashed_password.startswith("$2b$04$")
+    assert client.post("/users/login", json={"username": "alice", "password": "wrong"}).status_code == 404  # wrong credentials answer 404 here
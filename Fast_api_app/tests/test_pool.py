@@ -0,0 +1,58 @@
+# Sessions check a connection out lazily and give it back before the response body is
+# sent: requests refused before their first query never touch the pool.
+import asyncio
+from sqlalchemy import event, text
+from db.session import ASYNC_DB, SessionLocal, engine, async_engine, pool_options, ReleaseSessionsMiddleware
+from config import settings
+
+
+def count_checkouts():
+    checkouts = []
+    target = async_engine.sync_engine if ASYNC_DB else engine
+
+    def listener(dbapi_connection, connection_record, connection_proxy):
+        checkouts.append(1)
+
+    event.listen(target, "checkout", listener)
+    return checkouts, lambda: event.remove(target, "checkout", listener)
+
+
+def test_unauthenticated_requests_do_not_check_out(client):
+    checkouts, stop = count_checkouts()
+    try:
+        for path in ("/products/all_products", "/users/current_user_details", "/products/search?q=lamp"):
+            assert client.get(path).status_code == 401
+    finally:
+        stop()
+    assert checkouts == []
+
+
+def test_connection_is_back_before_the_body_goes_out(client):
+    checked_out = []
+
+    async def app(scope, receive, send):
+        db = SessionLocal()
+        scope.setdefault("db_sessions", []).append(db)
+        db.execute(text("SELECT 1"))
+        assert engine.pool.checkedout() == 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def send(message):
+        checked_out.append((message["type"], engine.pool.checkedout()))
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    asyncio.run(ReleaseSessionsMiddleware(app)({"type": "http", "method": "GET", "path": "/"}, receive, send))
+    assert checked_out == [("http.response.start", 0), ("http.response.body", 0)]
+
+
+def test_pool_options():
+    assert pool_options("sqlite://", "primary") == {}
+    assert pool_options("sqlite:///:memory:", "primary") == {}
+    options = pool_options("postgresql://db/app", "replica0")
+    assert options["poolclass"].metrics_label == "replica0"
+    assert (options["pool_size"], options["max_overflow"], options["pool_timeout"]) == (
+        settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_POOL_TIMEOUT,
+    )
@@ -0,0 +1,69 @@
+# Updates are one UPDATE ... WHERE version = :version RETURNING; the product is only read
+# again when nothing matched, to tell a missing, foreign or stale product apart.
+from sqlalchemy import event
+from db.session import ASYNC_DB, engine, async_engine
+
+
+def add_product(client, headers, name: str) -> dict:
+    response = client.post("/products/add_products", json={"name": name, "description": name, "price": 10}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def update(client, headers, product_id: int, **changes):
+    return client.put(f"/products/update_product/{product_id}", json=changes, headers=headers)
+
+
+def test_update_is_a_single_statement_bumping_the_version(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    product = add_product(client, headers, "lamp")
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "products" in statement:
+            statements.append(statement)
+
+    target = async_engine.sync_engine if ASYNC_DB else engine
+    event.listen(target, "before_cursor_execute", record)
+    try:
+        response = update(client, headers, product["id"], price=12, version=product["version"])
+    finally:
+        event.remove(target, "before_cursor_execute", record)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["version"] == product["version"] + 1
+    assert response.json()["data"]["price"] == 12
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE products") and "RETURNING" in statements[0]
+
+
+def test_stale_version_is_a_conflict(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    product = add_product(client, headers, "lamp")
+
+    assert update(client, headers, product["id"], price=12, version=product["version"]).status_code == 200
+    stale = update(client, headers, product["id"], price=13, version=product["version"])
+    assert stale.status_code == 409
+    assert client.get(f"/products/get_product/{product['id']}", headers=headers).json()["price"] == 12
+
+    # without a version the update is unconditional
+    assert update(client, headers, product["id"], price=14).status_code == 200
+
+
+def test_missing_foreign_and_duplicate(client, make_user, login):
+    make_user("alice")
+    make_user("bob")
+    make_user("admin", is_admin=True)
+    alice = login("alice")["headers"]
+    lamp = add_product(client, alice, "lamp")
+    chair = add_product(client, alice, "chair")
+
+    assert update(client, alice, 9999, price=1).status_code == 404
+    assert update(client, login("bob")["headers"], lamp["id"], price=1).status_code == 403
+    assert update(client, login("admin")["headers"], lamp["id"], price=1).status_code == 200
+    assert update(client, alice, chair["id"], name="lamp").status_code == 400
+
+    assert client.delete(f"/products/delete_product/{lamp['id']}", headers=alice).status_code == 200
+    assert update(client, alice, lamp["id"], price=2).status_code == 404
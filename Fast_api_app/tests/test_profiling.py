@@ -0,0 +1,31 @@
+import json
+import logging
+import re
+from fastapi.testclient import TestClient
+from main import app
+import utils.profiling as profiling
+from utils.profiling import ProfilingMiddleware
+
+
+def test_sampled_request_gets_server_timing(client, make_user, login, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "PROFILE_SLOW_REQUEST_MS", 0)
+    make_user("alice")
+    headers = login("alice")["headers"]
+
+    with TestClient(ProfilingMiddleware(app, sample_rate=1)) as profiled:
+        with caplog.at_level(logging.WARNING, logger="profiling"):
+            response = profiled.get("/products/all_products", headers=headers)
+
+    timing = response.headers["server-timing"]
+    queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+    assert queries >= 1
+    assert "auth;dur=" in timing and "handler;dur=" in timing and "total;dur=" in timing
+    logged = json.loads(caplog.records[-1].getMessage())
+    assert logged["event"] == "slow_request" and logged["path"] == "/products/all_products"
+    assert logged["queries"] == queries
+
+
+def test_unsampled_requests_are_left_alone(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    assert "server-timing" not in client.get("/products/all_products", headers=headers).headers
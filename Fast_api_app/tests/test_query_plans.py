@@ -0,0 +1,128 @@
+# Every statement the routers send must find its rows through an index: each endpoint is
+# called once on a seeded database, and EXPLAIN QUERY PLAN of what it ran may not contain
+# a full scan of any table of the models. The async routers are checked in a subprocess
+# (ASYNC_DB is read when the app is imported).
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import pytest
+from sqlalchemy import event
+from db.session import ASYNC_DB, SessionLocal, engine, async_engine, DATABASE_URL
+from services.maintenance_service import run_maintenance
+
+TABLES = ("users", "products", "products_archive", "tokens", "blacklisted_tokens")
+FULL_SCAN = re.compile(rf"^SCAN ({'|'.join(TABLES)})(_\d+)?( AS \w+)?$")
+EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+PRODUCTS = 40
+
+
+@pytest.fixture
+def statements():
+    # (sql, parameters) of every statement run on the app's engine, first parameter set of executemany
+    recorded = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(EXPLAINED):
+            if executemany and parameters and isinstance(parameters[0], (tuple, list, dict)):
+                parameters = parameters[0]
+            recorded.setdefault(statement, parameters)
+
+    target = async_engine.sync_engine if ASYNC_DB else engine
+    event.listen(target, "before_cursor_execute", record)
+    yield recorded
+    event.remove(target, "before_cursor_execute", record)
+
+
+def query_plan(sql: str, parameters) -> list[str]:
+    connection = sqlite3.connect(DATABASE_URL.split("///", 1)[1])
+    try:
+        return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ())]
+    finally:
+        connection.close()
+
+
+def call_every_endpoint(client, make_user, login):
+    make_user("admin", is_admin=True)
+    owner_id = make_user("owner")
+    admin = login("admin")["headers"]
+
+    assert client.post("/users/register", json={"username": "newbie", "email": "newbie@example.com", "password": "newbiepass"}).status_code == 200
+    owner_login = login("owner")
+    owner = owner_login["headers"]
+    assert client.post("/users/refresh", json={"refresh_token": owner_login["refresh_token"]}).status_code == 200
+    owner = login("owner")["headers"]
+
+    users = client.get("/users/all", params={"limit": 1}, headers=admin).json()
+    assert client.get("/users/all", params={"limit": 1, "cursor": users["next_cursor"]}, headers=admin).status_code == 200
+    assert client.get("/users/all", params={"fields": "id,username"}, headers=admin).status_code == 200
+    assert client.get("/users/approved_user", headers=admin).status_code == 200
+    unapproved = client.get("/users/unapproved_users", headers=admin).json()
+    assert client.post(f"/users/{unapproved[0]['id']}/approve", headers=admin).status_code == 200
+    assert client.get("/users/current_user_details", headers=owner).status_code == 200
+
+    body = "\n".join(f'{{"name": "gadget {i}", "description": "widget number {i}", "price": {i}}}' for i in range(PRODUCTS))
+    imported = client.post("/products/bulk_import", content=body, headers={**owner, "Content-Type": "application/x-ndjson"})
+    assert imported.json()["inserted"] == PRODUCTS
+    created = client.post("/products/add_products", json={"name": "lamp", "description": "desk lamp", "price": 12}, headers=owner)
+    product = created.json()["data"]
+
+    for headers in (owner, admin):
+        page = client.get("/products/all_products", params={"limit": 5}, headers=headers).json()
+        assert client.get("/products/all_products", params={"limit": 5, "cursor": page["next_cursor"]}, headers=headers).status_code == 200
+        assert client.get("/products/all_products", params={"fields": "id,name"}, headers=headers).status_code == 200
+        assert client.get("/products/search", params={"q": "widget", "min_price": 1, "max_price": 30}, headers=headers).status_code == 200
+        assert client.get("/products/search", params={"min_price": 1}, headers=headers).status_code == 200
+        changes = client.get("/products/changes", params={"limit": 5}, headers=headers).json()
+        assert client.get("/products/changes", params={"since": changes["next_since"]}, headers=headers).status_code == 200
+        for format in ("ndjson", "csv"):
+            assert client.get("/products/export", params={"format": format}, headers=headers).status_code == 200
+    assert client.get("/products/search", params={"q": "lamp", "owner_id": owner_id}, headers=admin).status_code == 200
+
+    assert client.get(f"/products/get_product/{product['id']}", headers=owner).status_code == 200
+    updated = client.put(f"/products/update_product/{product['id']}", json={"price": 13, "version": product["version"]}, headers=owner)
+    assert updated.status_code == 200
+    assert client.put(f"/products/update_product/{product['id']}", json={"price": 14, "version": product["version"]}, headers=owner).status_code == 409
+    assert client.delete(f"/products/delete_product/{product['id']}", headers=owner).status_code == 200
+    assert client.get(f"/products/get_product/{product['id']}", headers=owner).status_code == 404
+
+    batch = {"mode": "atomic", "operations": [
+        {"method": "POST", "path": "/products/add_products", "body": {"name": "chair", "price": 40}},
+        {"method": "GET", "path": "/products/all_products?limit=2"},
+    ]}
+    assert client.post("/batch", json=batch, headers=owner).json()["committed"]
+
+    assert client.post("/users/logout", headers=owner).status_code == 200
+
+    # the maintenance job shares the token tables with every login
+    db = SessionLocal()
+    try:
+        run_maintenance(db, pause=0, archive_after_days=1)
+    finally:
+        db.close()
+
+
+def test_router_queries_use_indexes(client, make_user, login, statements):
+    call_every_endpoint(client, make_user, login)
+
+    assert any("products" in sql for sql in statements)
+    scans = {}
+    for sql, parameters in statements.items():
+        lines = [line for line in query_plan(sql, parameters) if FULL_SCAN.match(line)]
+        if lines:
+            scans[sql] = lines
+    assert not scans, "\n\n".join(f"{sql}\n  {lines}" for sql, lines in scans.items())
+
+
+@pytest.mark.skipif(ASYNC_DB, reason="already running with the async routers")
+def test_async_router_queries_use_indexes():
+    environment = {**os.environ, "ASYNC_DB": "true"}
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", f"{__file__}::test_router_queries_use_indexes"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
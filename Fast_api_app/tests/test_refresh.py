@@ -0,0 +1,49 @@
+# Refresh tokens rotate on every use; presenting one that was already rotated is taken as
+# theft and revokes its whole session, but not the user's other sessions.
+from models.blacklist import BlacklistedToken
+from models.token import Token
+
+
+def refresh(client, refresh_token: str):
+    return client.post("/users/refresh", json={"refresh_token": refresh_token})
+
+
+def bearer(body: dict) -> dict:
+    return {"Authorization": f"Bearer {body['access_token']}"}
+
+
+def test_rotation_issues_a_new_pair(client, make_user, login, db):
+    make_user("alice")
+    first = login("alice")
+
+    rotated = refresh(client, first["refresh_token"])
+    assert rotated.status_code == 200
+    second = rotated.json()
+    assert second["refresh_token"] != first["refresh_token"]
+    assert client.get("/users/current_user_details", headers=bearer(second)).status_code == 200
+    assert db.query(Token).filter(Token.refresh_token == first["refresh_token"]).count() == 0
+    assert db.query(BlacklistedToken).count() == 2  # the old access and refresh token
+
+
+def test_reuse_revokes_the_session_only(client, make_user, login):
+    make_user("alice")
+    stolen = login("alice")
+    other_session = login("alice")
+    current = refresh(client, stolen["refresh_token"]).json()
+
+    reused = refresh(client, stolen["refresh_token"])
+    assert reused.status_code == 401
+    assert reused.json()["detail"] == "Refresh token reuse detected, session revoked"
+
+    assert client.get("/users/current_user_details", headers=bearer(current)).status_code == 401
+    assert refresh(client, current["refresh_token"]).status_code == 401
+    assert client.get("/users/current_user_details", headers=other_session["headers"]).status_code == 200
+    assert refresh(client, other_session["refresh_token"]).status_code == 200
+
+
+def test_access_token_is_not_a_refresh_token(client, make_user, login):
+    make_user("alice")
+    tokens = login("alice")
+    assert refresh(client, tokens["access_token"]).status_code == 401
+    assert refresh(client, "not-a-jwt").status_code == 401
+    assert client.get("/users/current_user_details", headers=tokens["headers"]).status_code == 200
@@ -0,0 +1,154 @@
+# RoutingSession against a primary and a "replica" that are two SQLite files holding
+# different users, so every read shows which database answered it.
+import os
+import sqlite3
+import pytest
+from sqlalchemy import create_engine, delete, insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from conftest import TEST_DIR
+from db import session as db_session
+from db.base import Base
+from db.routing import ReplicaSet, RoutingSession, recent_writers
+from db.session import ASYNC_DB, DATABASE_URL, SessionLocal, engine, async_engine
+from models.token import Token
+from models.user import User
+from services.token_services import build_auth_version_bump
+
+
+@pytest.fixture
+def make_session():
+    engines = {}
+    for name in ("primary", "replica"):
+        engine = create_engine(f"sqlite:///{os.path.join(TEST_DIR, f'routing_{name}.db')}")
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(insert(User).values(username=f"on_{name}", email=f"{name}@example.com", hashed_password="x"))
+            connection.execute(insert(Token).values(user_id=1, access_token=f"{name}-access", refresh_token=f"{name}-refresh"))
+        engines[name] = engine
+    replicas = ReplicaSet([engines["replica"]], ["test_replica"])
+    factory = sessionmaker(bind=engines["primary"], class_=RoutingSession, replicas=replicas)
+    recent_writers.clear()
+
+    def make(read_only: bool, user_id=None):
+        db = factory()
+        db.info["read_only"] = read_only
+        db.info["user_id"] = user_id
+        return db
+
+    make.replicas = replicas
+    yield make
+    recent_writers.clear()
+    for engine in engines.values():
+        engine.dispose()
+
+
+def username(db) -> str:
+    try:
+        return db.scalar(select(User.username).order_by(User.id))
+    finally:
+        db.close()
+
+
+def test_reads_go_to_the_replica_writes_to_the_primary(make_session):
+    assert username(make_session(read_only=True)) == "on_replica"
+    assert username(make_session(read_only=False)) == "on_primary"
+
+
+def test_read_primary_option_pins_a_read(make_session):
+    db = make_session(read_only=True)
+    try:
+        assert db.scalar(select(User.username).order_by(User.id).execution_options(read_primary=True)) == "on_primary"
+    finally:
+        db.close()
+
+
+def test_token_lookups_stay_on_the_primary(make_session):
+    db = make_session(read_only=True)
+    try:
+        assert db.scalar(select(Token.access_token)) == "primary-access"
+    finally:
+        db.close()
+
+
+def test_a_writer_reads_its_own_writes(make_session):
+    db = make_session(read_only=False, user_id=7)
+    try:
+        db.add(User(username="fresh", email="fresh@example.com", hashed_password="x"))
+        db.commit()
+    finally:
+        db.close()
+
+    assert username(make_session(read_only=True, user_id=7)) == "on_primary"
+    assert username(make_session(read_only=True, user_id=8)) == "on_replica"
+
+
+def test_replica_out_of_rotation_falls_back_to_the_primary(make_session):
+    make_session.replicas.set_health(0, False, "test")
+    assert username(make_session(read_only=True)) == "on_primary"
+
+    make_session.replicas.check_engine(0)  # reachable and SQLite reports no lag
+    assert make_session.replicas.down == set()
+    assert username(make_session(read_only=True)) == "on_replica"
+
+
+@pytest.fixture
+def lagging_replica(client, monkeypatch):
+    """Routes the app's GET reads to a copy of its database; call it to take the copy,
+    which then stays behind every later write."""
+    path = os.path.join(TEST_DIR, "lagging_replica.db")
+    replica_engine = (create_async_engine if ASYNC_DB else create_engine)(
+        f"sqlite{'+aiosqlite' if ASYNC_DB else ''}:///{path}"
+    )
+    replicas = ReplicaSet([replica_engine], ["lagging_replica"])
+    if ASYNC_DB:
+        factory = async_sessionmaker(
+            bind=async_engine, autoflush=False, expire_on_commit=False, sync_session_class=RoutingSession, replicas=replicas,
+        )
+        monkeypatch.setattr(db_session, "AsyncSessionLocal", factory)
+    else:
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, replicas=replicas)
+        monkeypatch.setattr(db_session, "SessionLocal", factory)
+
+    def snapshot():
+        source, target = sqlite3.connect(DATABASE_URL.split("///", 1)[1]), sqlite3.connect(path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    yield snapshot
+    replicas.sync_engine(0).dispose()
+
+
+def primary_write(*statements):
+    db = SessionLocal()
+    try:
+        for statement in statements:
+            db.execute(statement)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_logout_is_not_hidden_by_a_lagging_replica(lagging_replica, client, make_user, login):
+    user_id = make_user("alice")
+    headers = login("alice")["headers"]
+    lagging_replica()
+    assert client.get("/users/current_user_details", headers=headers).status_code == 200
+
+    # logout on another worker: the replica still has the old auth_version
+    primary_write(delete(Token).where(Token.user_id == user_id), build_auth_version_bump(user_id))
+    assert client.get("/users/current_user_details", headers=headers).status_code == 401
+
+
+def test_unapproval_is_not_hidden_by_a_lagging_replica(lagging_replica, client, make_user, login):
+    user_id = make_user("alice")
+    headers = login("alice")["headers"]
+    lagging_replica()
+    assert client.get("/products/all_products", headers=headers).status_code == 200
+
+    primary_write(update(User).where(User.id == user_id).values(is_admin_approved=False, auth_version=User.auth_version + 1))
+    assert client.get("/products/all_products", headers=headers).status_code == 403
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from models.blacklist import BlacklistedToken
+from services.revocation_service import RevocationFilter
+
+
+def blacklist(db, jti: str, created_at: datetime):
+    db.add(BlacklistedToken(token=f"token-{jti}", jti=jti, expires_at=datetime.utcnow() + timedelta(hours=1), created_at=created_at))
+    db.commit()
+
+
+def test_late_commit_with_older_created_at_is_loaded(db):
+    revocations = RevocationFilter(overlap=60)
+    now = datetime.utcnow()
+    blacklist(db, "first", now)
+    assert revocations.load(db) == 1
+
+    # higher id, but stamped before "first" and committed after the previous sync
+    blacklist(db, "late", now - timedelta(seconds=10))
+    assert revocations.load(db) == 1
+    assert revocations.is_revoked("late")
+
+    # the overlap is read again, known jtis are not counted twice
+    assert revocations.load(db) == 0
+    assert len(revocations) == 2
+
+
+def test_rows_older_than_the_overlap_are_not_read_again(db):
+    revocations = RevocationFilter(overlap=60)
+    now = datetime.utcnow()
+    blacklist(db, "old", now - timedelta(minutes=5))
+    blacklist(db, "new", now)
+    assert revocations.load(db) == 2
+
+    blacklist(db, "too-late", now - timedelta(minutes=2))
+    assert revocations.load(db) == 0
+    assert not revocations.is_revoked("too-late")
@@ -0,0 +1,100 @@
+# /products/search on the FTS5 index kept by triggers (models/product_search.py), and on
+# the in-process index used by databases without full-text search.
+import pytest
+from sqlalchemy import text
+from services import product_service, search_service
+from services.search_service import InvertedIndex
+
+
+@pytest.fixture(params=["fts5", "memory"])
+def backend(request, client, monkeypatch):
+    assert search_service.get_search_backend() == "fts5"
+    if request.param == "memory":
+        index = InvertedIndex()
+        monkeypatch.setattr(search_service, "_backend", "memory")
+        monkeypatch.setattr(search_service, "search_index", index)
+        monkeypatch.setattr(product_service, "search_index", index)
+    return request.param
+
+
+def add_product(client, headers, name: str, description: str, price: int = 10) -> dict:
+    response = client.post("/products/add_products", json={"name": name, "description": description, "price": price}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def search(client, headers, **params) -> list[str]:
+    response = client.get("/products/search", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return [hit["name"] for hit in response.json()["data"]]
+
+
+def test_search_follows_writes(backend, client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    lamp = add_product(client, headers, "desk lamp", "warm light")
+    add_product(client, headers, "floor lamp", "tall and bright", price=50)
+    add_product(client, headers, "chair", "goes well with a lamp")
+
+    # a match in the name ranks above one in the description
+    hits = search(client, headers, q="lamp")
+    assert sorted(hits[:2]) == ["desk lamp", "floor lamp"] and hits[2:] == ["chair"]
+    assert search(client, headers, q="lamp", max_price=20) == ["desk lamp", "chair"]
+    assert search(client, headers, q="floor lamp") == ["floor lamp"]
+
+    renamed = client.put(f"/products/update_product/{lamp['id']}", json={"name": "desk light", "description": "reading"}, headers=headers)
+    assert renamed.status_code == 200
+    assert search(client, headers, q="reading") == ["desk light"]
+    assert "desk light" not in search(client, headers, q="lamp")
+
+    assert client.delete(f"/products/delete_product/{lamp['id']}", headers=headers).status_code == 200
+    assert search(client, headers, q="reading") == []
+
+
+def test_search_is_scoped_to_the_owner(backend, client, make_user, login):
+    make_user("alice")
+    bob_id = make_user("bob")
+    make_user("admin", is_admin=True)
+    add_product(client, login("alice")["headers"], "red kettle", "steel")
+    add_product(client, login("bob")["headers"], "blue kettle", "steel")
+
+    assert search(client, login("bob")["headers"], q="kettle") == ["blue kettle"]
+    admin = login("admin")["headers"]
+    assert sorted(search(client, admin, q="kettle")) == ["blue kettle", "red kettle"]
+    assert search(client, admin, q="kettle", owner_id=bob_id) == ["blue kettle"]
+
+
+def test_fts5_stems_terms(client, make_user, login):
+    make_user("alice")
+    headers = login("alice")["headers"]
+    add_product(client, headers, "floor lamps", "standing")
+    assert search(client, headers, q="lamp") == ["floor lamps"]
+
+
+def test_triggers_index_rows_written_outside_the_app(client, db):
+    db.execute(text(
+        "INSERT INTO products (id, name, description, price, owner_id, version, created_at, updated_at) "
+        "VALUES (1, 'teapot', 'porcelain', 5, 1, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+    ))
+    db.commit()
+
+    def indexed(query: str) -> list[int]:
+        return db.execute(text("SELECT rowid FROM products_fts WHERE products_fts MATCH :q"), {"q": query}).scalars().all()
+
+    assert indexed("teapot") == [1]
+
+    db.execute(text("UPDATE products SET description = 'glass' WHERE id = 1"))
+    db.commit()
+    assert indexed("porcelain") == [] and indexed("glass") == [1]
+
+    db.execute(text("UPDATE products SET deleted_at = CURRENT_TIMESTAMP WHERE id = 1"))
+    db.commit()
+    assert indexed("teapot") == []
+
+    db.execute(text("UPDATE products SET deleted_at = NULL WHERE id = 1"))
+    db.commit()
+    assert indexed("teapot") == [1]
+
+    db.execute(text("DELETE FROM products WHERE id = 1"))
+    db.commit()
+    assert indexed("teapot") == []
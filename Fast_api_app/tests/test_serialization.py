@@ -0,0 +1,44 @@
+# FAST_JSON skips response_model validation: the bodies it writes must be the ones the
+# default path produces from the same rows.
+import json
+from datetime import datetime
+import pytest
+from utils import serialization
+from services import product_service
+from services.product_service import product_response_cache
+
+
+def bodies(client, paths: list[str], headers: dict) -> list:
+    product_response_cache.clear()
+    responses = [client.get(path, headers=headers) for path in paths]
+    assert all(response.status_code == 200 for response in responses), [response.text for response in responses]
+    return [response.json() for response in responses]
+
+
+def test_fast_path_matches_response_model(client, make_user, login, monkeypatch):
+    make_user("admin", is_admin=True)
+    headers = login("admin")["headers"]
+    created = client.post("/products/add_products", json={"name": "lamp", "description": "désk lamp", "price": 12}, headers=headers)
+    product_id = created.json()["data"]["id"]
+    client.post("/products/add_products", json={"name": "chair", "price": 40}, headers=headers)
+    paths = [
+        "/products/all_products",
+        "/products/all_products?fields=id,name",
+        f"/products/get_product/{product_id}",
+        "/products/search?q=lamp",
+        "/users/all",
+    ]
+
+    default = bodies(client, paths, headers)
+    monkeypatch.setattr(serialization, "FAST_JSON", True)
+    monkeypatch.setattr(product_service, "FAST_JSON", True)
+    assert bodies(client, paths, headers) == default
+
+
+@pytest.mark.parametrize("value", [datetime(2026, 10, 18, 9, 30, 1, 250), datetime(2026, 10, 18)])
+def test_dumps_without_orjson_writes_the_same_json(value, monkeypatch):
+    content = {"id": 1, "name": "lämp", "price": 1.5, "deleted": None, "updated_at": value, "tags": [True]}
+    fast = serialization.dumps(content)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert json.loads(serialization.dumps(content)) == json.loads(fast)
+    assert json.loads(fast)["updated_at"] == value.isoformat()
@@ -0,0 +1,60 @@
+# Login token rows written behind: usable from the buffer before the flush, and refresh or
+# logout of a buffered session never leave a row behind to be inserted later.
+import pytest
+from models.token import Token
+from services.token_write_buffer import token_write_buffer
+
+
+@pytest.fixture
+def buffered(client, monkeypatch):
+    # enabled without its thread, the test flushes by hand
+    monkeypatch.setattr(token_write_buffer, "interval", 60)
+    yield token_write_buffer
+    token_write_buffer.discard_where(lambda token: True)
+
+
+def stored_tokens(db) -> list[str]:
+    db.expire_all()
+    return [token.access_token for token in db.query(Token)]
+
+
+def test_buffered_login_is_usable_and_flushed_in_one_batch(buffered, client, make_user, login, db):
+    make_user("alice")
+    make_user("bob")
+    tokens = [login("alice"), login("bob")]
+    assert stored_tokens(db) == []
+    for body in tokens:
+        assert client.get("/users/current_user_details", headers=body["headers"]).status_code == 200
+
+    assert buffered.flush() == 2
+    assert sorted(stored_tokens(db)) == sorted(body["access_token"] for body in tokens)
+    assert not buffered.contains(tokens[0]["access_token"])
+    assert client.get("/users/current_user_details", headers=tokens[0]["headers"]).status_code == 200
+
+
+def test_refresh_and_logout_take_the_buffered_row(buffered, client, make_user, login, db):
+    make_user("alice")
+    make_user("bob")
+    alice = login("alice")
+    bob = login("bob")
+
+    refreshed = client.post("/users/refresh", json={"refresh_token": alice["refresh_token"]})
+    assert refreshed.status_code == 200
+    assert client.post("/users/logout", headers=bob["headers"]).status_code == 200
+
+    assert buffered.flush() == 0
+    assert stored_tokens(db) == [refreshed.json()["access_token"]]
+    assert client.get("/users/current_user_details", headers=alice["headers"]).status_code == 401
+    assert client.get("/users/current_user_details", headers=bob["headers"]).status_code == 401
+
+
+def test_a_row_that_cannot_be_inserted_does_not_block_the_batch(buffered, make_user, login, db):
+    user_id = make_user("alice")
+    db.add(Token(user_id=user_id, session_id="old", access_token="taken-access", refresh_token="taken-refresh"))
+    db.commit()
+    fresh = login("alice")
+    buffered.add(Token(user_id=user_id, session_id="dup", access_token="taken-access", refresh_token="other-refresh"))
+
+    assert buffered.flush() == 2
+    assert sorted(stored_tokens(db)) == sorted([fresh["access_token"], "taken-access"])
+    assert not buffered.contains("other-refresh")
@@ -0,0 +1,228 @@
+# Admission control: per route class concurrency limits with a bounded wait queue (503
+# once a request would wait too long) and per client token buckets (429), both with
+# Retry-After. State is per worker and of fixed size; it is only touched from the event
+# loop, so it needs no locks.
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Optional
+from dotenv import load_dotenv
+from jose import jwt
+from jose.exceptions import JWTError
+from starlette.responses import JSONResponse
+from services.token_services import SECRET_KEY, ALGORITHM
+from utils.metrics import ADMISSION_REJECTED, ADMISSION_WAITING
+
+load_dotenv()
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", 10000))  # token buckets kept, least recently used go first
+
+CPUS = os.cpu_count() or 1
+# Budget of each route class, every knob can be set with ADMISSION_<CLASS>_<KNOB>
+# (e.g. ADMISSION_LOGIN_RATE=0.2). concurrency 0 or rate 0 turns that limit off.
+#   concurrency  requests of the class running at once
+#   queue        requests waiting for one of those slots, the next ones get 503
+#   max_wait_ms  longest wait for a slot before the request gets 503
+#   rate, burst  token bucket per client: requests per second, and how many at once
+ROUTE_CLASS_DEFAULTS = {
+    "login": {"concurrency": 2 * CPUS, "queue": 8 * CPUS, "max_wait_ms": 2000, "rate": 0.5, "burst": 10},
+    "write": {"concurrency": 64, "queue": 256, "max_wait_ms": 1000, "rate": 20, "burst": 50},
+    "read": {"concurrency": 256, "queue": 1024, "max_wait_ms": 500, "rate": 100, "burst": 200},
+    # a slot is held until the whole body has been streamed, which can take minutes
+    "stream": {"concurrency": 8, "queue": 16, "max_wait_ms": 1000, "rate": 1, "burst": 5},
+}
+
+LOGIN_PATHS = ("/users/login", "/users/register")  # bcrypt bound
+STREAM_PATHS = ("/products/export", "/products/bulk_import")  # bodies streamed out / in
+EXEMPT_PATHS = ("/metrics", "/products/events")   # scrapes, and long lived streams (EVENTS_MAX_SUBSCRIBERS)
+BATCH_PATHS = ("/batch",)  # rate limited per operation instead, see charge_operation()
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def route_class_settings(name: str) -> dict:
+    return {
+        knob: float(os.getenv(f"ADMISSION_{name.upper()}_{knob.upper()}", default))
+        for knob, default in ROUTE_CLASS_DEFAULTS[name].items()
+    }
+
+
+def route_class(scope) -> Optional[str]:
+    # None: not admission controlled
+    path = scope["path"]
+    if path in EXEMPT_PATHS:
+        return None
+    if path in LOGIN_PATHS:
+        return "login"
+    if path in STREAM_PATHS:
+        return "stream"
+    return "read" if scope["method"] in READ_METHODS else "write"
+
+
+def client_key(scope) -> str:
+    # user_id of a validly signed bearer token (expired is fine, the route rejects it), else the address
+    for name, value in scope["headers"]:
+        if name != b"authorization":
+            continue
+        scheme, _, token = value.decode("latin-1").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+            except JWTError:
+                break
+            if claims.get("user_id") is not None:
+                return f"user:{claims['user_id']}"
+        break
+    # behind a proxy run uvicorn with --proxy-headers so this is the real client
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests run at once; up to `max_queue` more wait in FIFO order,
+    each for at most `max_wait` seconds. A freed slot goes straight to the oldest waiter."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiters = deque()
+
+    async def acquire(self) -> Optional[str]:
+        # None when admitted, else why the request is shed
+        if self.limit <= 0:
+            return None
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return None
+        if len(self.waiters) >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        ADMISSION_WAITING.labels(self.name).inc()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+            return None
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # client went away; give back a slot handed over in the meantime
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            ADMISSION_WAITING.labels(self.name).dec()
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def release(self):
+        if self.limit <= 0:
+            return
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class TokenBuckets:
+    """One token bucket per (route class, client), kept in a fixed size LRU. A client
+    evicted to make room comes back with a full bucket."""
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+
+    def take(self, key, rate: float, burst: float) -> float:
+        # 0 when the request may go, else seconds until the client has a token again
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: rate limit per client, then wait for a slot of the route class."""
+
+    def __init__(self, app, enabled: bool = ADMISSION_CONTROL, max_clients: int = ADMISSION_MAX_CLIENTS):
+        self.app = app
+        self.enabled = enabled
+        self.settings = {name: route_class_settings(name) for name in ROUTE_CLASS_DEFAULTS}
+        self.limiters = {
+            name: ConcurrencyLimiter(name, int(knobs["concurrency"]), int(knobs["queue"]), knobs["max_wait_ms"] / 1000)
+            for name, knobs in self.settings.items()
+        }
+        self.buckets = TokenBuckets(max_clients)
+
+    def take_token(self, scope) -> float:
+        # 0 when the client may go on, else seconds until its bucket of the route class has a token
+        name = route_class(scope)
+        if name is None or self.settings[name]["rate"] <= 0:
+            return 0.0
+        knobs = self.settings[name]
+        return self.buckets.take((name, client_key(scope)), knobs["rate"], knobs["burst"])
+
+    async def __call__(self, scope, receive, send):
+        name = route_class(scope) if self.enabled and scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        scope["admission"] = self  # /batch charges its operations here
+        if scope["path"] not in BATCH_PATHS:
+            retry_after = self.take_token(scope)
+            if retry_after:
+                await reject(scope, receive, send, name, "rate_limited", 429, "Too many requests", retry_after)
+                return
+
+        limiter = self.limiters[name]
+        reason = await limiter.acquire()
+        if reason is not None:
+            await reject(scope, receive, send, name, reason, 503, "Server is busy, please retry", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+def charge_operation(batch_scope, scope) -> float:
+    """A token for one operation of a /batch request (`scope`, built from `batch_scope`) from
+    the caller's bucket of the operation's route class, as if it had been sent on its own.
+    0 when it may run, else its Retry-After."""
+    admission = batch_scope.get("admission")
+    if admission is None:
+        return 0.0
+    retry_after = admission.take_token(scope)
+    if retry_after:
+        ADMISSION_REJECTED.labels(route_class(scope), "rate_limited").inc()
+    return retry_after
+
+
+async def reject(scope, receive, send, name: str, reason: str, status_code: int, detail: str, retry_after: float):
+    ADMISSION_REJECTED.labels(name, reason).inc()
+    response = JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+    await response(scope, receive, send)
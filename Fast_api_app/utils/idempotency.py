@@ -0,0 +1,133 @@
+# Idempotency-Key for write endpoints: the first response for (user, key) is kept for
+# IDEMPOTENCY_TTL_SECONDS and replayed to retries, which then skip the endpoint entirely.
+#
+# A write endpoint opts in with dependencies=[Depends(claim)] where
+# claim = idempotency_key(<the router's current user dependency>), on a router whose
+# route_class is IdempotentRoute. The store is per worker and only used from the event loop.
+import os
+import asyncio
+import hashlib
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi import Depends, Header, HTTPException, Request, Response
+from fastapi.exception_handlers import http_exception_handler
+from utils.cache import TTLCache
+from utils.profiling import ProfiledRoute
+
+load_dotenv()
+
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000))  # 0 disables replay
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))  # duplicate waiting for the first
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status_code", "body", "headers")
+
+    def __init__(self, fingerprint: str, status_code: int, body: bytes, headers: dict):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+    def to_response(self) -> Response:
+        return Response(content=self.body, status_code=self.status_code, headers={**self.headers, REPLAYED_HEADER: "true"})
+
+
+class IdempotencyStore:
+    """Finished responses in a TTL LRU, plus the requests still running so that a
+    duplicate arriving meanwhile waits for their response instead of running too."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._done = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._running = {}  # key -> (fingerprint, future resolved when it finishes)
+
+    async def claim(self, key, fingerprint: str, wait: float) -> Optional[StoredResponse]:
+        # the response to replay, or None: the caller runs the request, then calls finish()
+        while True:
+            stored = self._done.get(key)
+            if stored is None and key not in self._running:
+                self._running[key] = (fingerprint, asyncio.get_running_loop().create_future())
+                return None
+            if (stored.fingerprint if stored is not None else self._running[key][0]) != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if stored is not None:
+                return stored
+            try:
+                await asyncio.wait_for(asyncio.shield(self._running[key][1]), wait)
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            # replay what it stored, or run it here if it did not store anything
+
+    def finish(self, key, response: Optional[Response]):
+        # response None (or a 5xx): nothing is kept, the next attempt runs again
+        fingerprint, done = self._running.pop(key)
+        if response is not None and response.status_code < 500:
+            headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+            self._done.set(key, StoredResponse(fingerprint, response.status_code, response.body, headers))
+        done.set_result(None)
+
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL_SECONDS)
+
+
+class IdempotentReplay(Exception):
+    def __init__(self, stored: StoredResponse):
+        self.stored = stored
+
+
+def idempotency_key(get_user):
+    """Dependency claiming the request's Idempotency-Key for the user from `get_user`
+    (the endpoint's own auth dependency, so it is resolved once)."""
+
+    async def claim_idempotency_key(
+        request: Request,
+        key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=MAX_KEY_LENGTH),
+        current_user=Depends(get_user),
+    ):
+        if not key:
+            return
+        # the same key with another method, path or body is a client bug, not a retry
+        fingerprint = hashlib.sha256(b"\n".join((request.method.encode(), request.url.path.encode(), await request.body()))).hexdigest()
+        store_key = (current_user.id, key)
+        stored = await idempotency_store.claim(store_key, fingerprint, IDEMPOTENCY_WAIT_SECONDS)
+        if stored is not None:
+            raise IdempotentReplay(stored)
+        request.state.idempotency_key = store_key
+
+    return claim_idempotency_key
+
+
+class IdempotentRoute(ProfiledRoute):
+    """Stores the response of a request that claimed an Idempotency-Key, HTTPExceptions
+    included (a retry gets the same 4xx), and answers replays."""
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def idempotent_route_handler(request):
+            try:
+                response = await route_handler(request)
+            except IdempotentReplay as replay:
+                return replay.stored.to_response()
+            except HTTPException as e:
+                if getattr(request.state, "idempotency_key", None) is None:
+                    raise
+                response = await http_exception_handler(request, e)
+            except BaseException:
+                key = getattr(request.state, "idempotency_key", None)
+                if key is not None:
+                    idempotency_store.finish(key, None)
+                raise
+            key = getattr(request.state, "idempotency_key", None)
+            if key is not None:
+                idempotency_store.finish(key, response)
+            return response
+
+        return idempotent_route_handler
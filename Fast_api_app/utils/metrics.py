@@ -0,0 +1,165 @@
+# Prometheus metrics: per-route requests/latency, in-flight, bcrypt queue, DB pool, token buffer, event streams, admission control, maintenance
+#
+# Multi-process (gunicorn / uvicorn --workers): set PROMETHEUS_MULTIPROC_DIR to an
+# empty directory shared by the workers; /metrics then aggregates every worker.
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled", multiprocess_mode="livesum",
+)
+PASSWORD_POOL_PENDING = Gauge(
+    "password_pool_pending", "bcrypt jobs queued or running in the password pool", multiprocess_mode="livesum",
+)
+PASSWORD_POOL_REJECTED = Counter(
+    "password_pool_rejected_total", "bcrypt jobs refused with 503 because the queue was full",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "DB connections checked out of the pool", ["engine"], multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "DB connections open beyond pool_size", ["engine"], multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = Counter(
+    "db_pool_connections_total", "New DB connections opened", ["engine"],
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT", ["engine"],
+)
+DB_POOL_INVALIDATED = Counter(
+    "db_pool_invalidated_total", "Connections discarded as broken (failed pre-ping, lost connection)", ["engine"],
+)
+DB_REPLICA_UP = Gauge(
+    "db_replica_up", "1 while the replica is used for reads, 0 while it is down or lagging", ["engine"],
+    multiprocess_mode="max",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the pool (includes connecting)", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+TOKEN_BUFFER_PENDING = Gauge(
+    "token_write_buffer_pending", "Login token rows waiting for the write-behind flush", multiprocess_mode="livesum",
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "event_subscribers", "Open /products/events streams", multiprocess_mode="livesum",
+)
+EVENTS_DROPPED = Counter(
+    "event_subscribers_dropped_total", "Event streams closed because the client did not keep up",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests refused by admission control", ["route_class", "reason"],
+)
+ADMISSION_WAITING = Gauge(
+    "admission_waiting", "Requests waiting for a concurrency slot", ["route_class"], multiprocess_mode="livesum",
+)
+MAINTENANCE_ROWS = Counter(
+    "maintenance_rows_removed_total", "Rows purged or archived by the maintenance job", ["table"],
+)
+
+
+class TimedPoolMixin:
+    # _do_get is where QueuePool blocks when every connection is checked out
+    metrics_label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.metrics_label).inc()
+            raise
+        finally:
+            DB_POOL_WAIT.labels(self.metrics_label).observe(time.perf_counter() - started)
+
+
+def timed_pool_class(label: str, asyncio: bool = False):
+    # a class per engine: Pool.recreate() (engine.dispose) keeps the class, not instance attributes
+    base = AsyncAdaptedQueuePool if asyncio else QueuePool
+    return type(f"Timed{base.__name__}", (TimedPoolMixin, base), {"metrics_label": label})
+
+
+def instrument_pool(engine, label: str):
+    # sync Engine; for an AsyncEngine pass engine.sync_engine
+    def overflow():
+        pool = engine.pool
+        return pool.overflow() if hasattr(pool, "overflow") else 0
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.labels(label).inc()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.labels(label).inc()
+        DB_POOL_OVERFLOW.labels(label).set(max(overflow(), 0))
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.labels(label).dec()
+        DB_POOL_OVERFLOW.labels(label).set(max(overflow(), 0))
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_INVALIDATED.labels(label).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and status per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            # route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], path).observe(time.perf_counter() - started)
+            REQUESTS.labels(scope["method"], path, str(status_code)).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,55 @@
+# Keyset (cursor) pagination on (created_at, id) with optional column projection
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed: list[str]) -> list[str]:
+    # "name,price" -> ["name", "price"], all allowed fields when not given
+    if not fields:
+        return list(allowed)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def build_page_query(model, fields: list[str], filters: list, cursor: Optional[str], limit: int):
+    # created_at and id are always read, the next cursor is built from them
+    columns = list(dict.fromkeys(fields + ["created_at", "id"]))
+    query = select(*[getattr(model, column) for column in columns]).where(*filters)
+    if cursor:
+        query = query.where(tuple_(model.created_at, model.id) > decode_cursor(cursor))
+    # one extra row tells us whether there is a next page
+    return query.order_by(model.created_at, model.id).limit(limit + 1)
+
+
+def build_page(rows: list, fields: list[str], limit: int) -> dict:
+    # build_page_query selects `fields` first, so each row maps to its dict by position
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "data": [dict(zip(fields, row)) for row in rows],
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+    }
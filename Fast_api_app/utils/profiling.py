@@ -0,0 +1,175 @@
+# Sampled per-request profiling: SQL count/time, auth/handler/serialize time, Server-Timing header
+import os
+import time
+import json
+import random
+import logging
+import asyncio
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+load_dotenv()
+
+logger = logging.getLogger("profiling")
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.05))  # 0 disables profiling
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", 500))
+PROFILE_SLOW_QUERY_MS = float(os.getenv("PROFILE_SLOW_QUERY_MS", 100))
+MAX_LOGGED_SQL_CHARS = 500
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.timings = {}       # section name -> seconds
+        self.slow_queries = []  # (ms, sql)
+
+    def add_query(self, elapsed: float, statement: str):
+        self.statements += 1
+        self.db_time += elapsed
+        if elapsed * 1000 >= PROFILE_SLOW_QUERY_MS:
+            self.slow_queries.append((round(elapsed * 1000, 2), statement[:MAX_LOGGED_SQL_CHARS]))
+
+    def add_section(self, name: str, elapsed: float):
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        parts = [f'db;dur={self.db_time * 1000:.2f};desc="{self.statements} queries"']
+        parts += [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in self.timings.items()]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def profiled(name: str):
+    """Add the wrapped call's duration to the current request profile under `name`."""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                profile = current_profile.get()
+                if profile is None:
+                    return await func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    profile.add_section(name, time.perf_counter() - started)
+            async_wrapper.profiled_as = name
+            return async_wrapper
+
+        @wraps(func)  # keeps the signature FastAPI inspects for dependencies
+        def wrapper(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add_section(name, time.perf_counter() - started)
+        wrapper.profiled_as = name
+        return wrapper
+
+    return decorator
+
+
+class ProfiledRoute(APIRoute):
+    """Times the endpoint itself; the rest of the route (validation, dependencies
+    other than auth, response serialization) is reported as `serialize`."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        # include_router() builds the route again from the already wrapped endpoint
+        if getattr(endpoint, "profiled_as", None) != "handler":
+            endpoint = profiled("handler")(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def profiled_route_handler(request):
+            profile = current_profile.get()
+            if profile is None:
+                return await route_handler(request)
+            started = time.perf_counter()
+            try:
+                return await route_handler(request)
+            finally:
+                elapsed = time.perf_counter() - started
+                other = sum(profile.timings.get(name, 0.0) for name in ("auth", "handler"))
+                profile.add_section("serialize", max(elapsed - other, 0.0))
+
+        return profiled_route_handler
+
+
+def instrument_engine(engine):
+    # sync Engine; for an AsyncEngine pass engine.sync_engine
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        profile = current_profile.get()
+        if profile is not None:
+            profile.add_query(time.perf_counter() - started, statement)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profiles a PROFILE_SAMPLE_RATE share of requests."""
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            log_slow_request(scope, status_code, profile)
+
+
+def log_slow_request(scope, status_code: int, profile: RequestProfile):
+    total_ms = (time.perf_counter() - profile.started) * 1000
+    if total_ms < PROFILE_SLOW_REQUEST_MS:
+        return
+    logger.warning(json.dumps({
+        "event": "slow_request",
+        "method": scope["method"],
+        "path": scope["path"],
+        "status": status_code,
+        "total_ms": round(total_ms, 2),
+        "db_ms": round(profile.db_time * 1000, 2),
+        "queries": profile.statements,
+        **{f"{name}_ms": round(elapsed * 1000, 2) for name, elapsed in profile.timings.items()},
+        "slow_sql": [{"ms": ms, "sql": sql} for ms, sql in profile.slow_queries],
+    }))
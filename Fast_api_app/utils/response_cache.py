@@ -0,0 +1,86 @@
+# In-process cache of serialized JSON responses with weak ETags and tag based invalidation.
+# Entries carry the version of the data they were built from, which the caller reads from the
+# database before every lookup, so writes made through other workers are seen at once too.
+import hashlib
+import itertools
+from typing import Optional
+from fastapi import Request, Response
+from utils.cache import TTLCache
+
+# Clients may keep the body but must revalidate it (If-None-Match) before every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts) -> str:
+    return 'W/"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "tags", "version")
+
+    def __init__(self, body: bytes, etag: str, tags: set, version):
+        self.body = body
+        self.etag = etag
+        self.tags = tags
+        self.version = version
+
+    def to_response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request, self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Entries are keyed by route, path and query parameters and the caller's scope (what
+    they may see), and tagged with what they contain so writes can drop them."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # bumped by every invalidation, a response built from older reads is not stored
+        self._generations = itertools.count(1)
+        self.generation = 0
+
+    def key(self, request: Request, scope) -> tuple:
+        return (
+            request.scope["route"].path,
+            tuple(sorted(request.path_params.items())),
+            tuple(sorted(request.query_params.multi_items())),
+            scope,
+        )
+
+    def lookup(self, request: Request, scope, version, cacheable: bool = True) -> Optional[Response]:
+        # version: of the data the response is built from, as the database has it now;
+        # cacheable=False: serve a matching entry but do not store the response of this request
+        request.state.response_cache_generation = self.generation if cacheable else None
+        request.state.response_cache_version = version
+        entry = self._entries.get(self.key(request, scope))
+        if entry is None or entry.version != version:
+            return None
+        return entry.to_response(request)
+
+    def store(self, request: Request, scope, body: bytes, etag: str, tags: set) -> Response:
+        entry = CachedResponse(body, etag, tags, getattr(request.state, "response_cache_version", None))
+        if getattr(request.state, "response_cache_generation", None) == self.generation:
+            self._entries.set(self.key(request, scope), entry)
+        return entry.to_response(request)
+
+    def invalidate(self, *tags) -> int:
+        self.generation = next(self._generations)
+        tags = set(tags)
+        return self._entries.evict_where(lambda entry: not entry.tags.isdisjoint(tags))
+
+    def clear(self):
+        self.generation = next(self._generations)
+        self._entries.clear()
@@ -0,0 +1,50 @@
+# Opt-in fast JSON path (FAST_JSON=true): list endpoints encode the plain dicts built from
+# their result rows with orjson and return the Response themselves, so FastAPI skips
+# validating them against response_model again. response_model then only documents the
+# body in OpenAPI; the dicts must already have its shape (see utils/pagination.build_page).
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Any
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional, FAST_JSON needs it
+    orjson = None
+
+logger = logging.getLogger("utils.serialization")
+
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() == "true"
+if FAST_JSON and orjson is None:
+    logger.warning("FAST_JSON is set but orjson is not installed, using the default JSON path")
+    FAST_JSON = False
+
+# OPT_UTC_Z: aware UTC datetimes end in "Z" like pydantic writes them
+ORJSON_OPTIONS = orjson.OPT_UTC_Z if orjson is not None else 0
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    # dicts / lists of str, int, float, bool, None and datetime
+    if orjson is not None:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_result(content: Any):
+    # what a list endpoint returns: a ready Response on the fast path, else the dict for response_model
+    return FastJSONResponse(content) if FAST_JSON else content